@@ -0,0 +1,114 @@
+"""Keyset-paginated appointment listings for the admin dashboard.
+
+Pages are ordered newest first by ``(appointment_time, appointment_id)`` and
+continue from an opaque cursor holding the last row's key, so every page
+is one index range scan no matter how deep it is (no ``OFFSET``). The
+status, doctor and date-range filters each line up with a composite index
+in ``hospital_db.sql``. CSV exports walk the same pages, so memory stays
+bounded by one page.
+"""
+import base64
+import binascii
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+
+COLUMNS = ('appointment_id', 'consulting_id', 'patient_id', 'doctor_id', 'appointment_time',
+           'document_path', 'action', 'status')
+
+
+def parse_filters(args):
+    """Validate ``status``, ``doctor_id``, ``date_from`` and ``date_to`` query arguments.
+
+    ``date_to`` is inclusive. Raises ``ValueError`` on malformed input.
+    """
+    filters = {}
+    if args.get('status'):
+        filters['status'] = args['status']
+    if args.get('doctor_id'):
+        filters['doctor_id'] = int(args['doctor_id'])
+    if args.get('date_from'):
+        filters['date_from'] = datetime.combine(date.fromisoformat(args['date_from']), datetime.min.time())
+    if args.get('date_to'):
+        filters['date_to'] = datetime.combine(date.fromisoformat(args['date_to']) + timedelta(days=1),
+                                              datetime.min.time())
+    return filters
+
+
+def parse_limit(value, default=ADMIN_PAGE_SIZE):
+    return max(1, min(int(value or default), ADMIN_MAX_PAGE_SIZE))
+
+
+def encode_cursor(row):
+    key = [row['appointment_time'].isoformat(), row['appointment_id']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(token):
+    """Inverse of ``encode_cursor``; raises ``ValueError`` for a tampered token."""
+    try:
+        appointment_time, appointment_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return datetime.fromisoformat(appointment_time), int(appointment_id)
+    except (TypeError, json.JSONDecodeError, UnicodeError, binascii.Error):
+        raise ValueError("Invalid cursor") from None
+
+
+def page_query(filters, after=None, limit=ADMIN_PAGE_SIZE):
+    """SQL and parameters for one page; ``after`` is a decoded cursor or ``None``."""
+    where, params = [], []
+    if 'status' in filters:
+        where.append("status = %s")
+        params.append(filters['status'])
+    if 'doctor_id' in filters:
+        where.append("doctor_id = %s")
+        params.append(filters['doctor_id'])
+    if 'date_from' in filters:
+        where.append("appointment_time >= %s")
+        params.append(filters['date_from'])
+    if 'date_to' in filters:
+        where.append("appointment_time < %s")
+        params.append(filters['date_to'])
+    if after is not None:
+        # Expanded row comparison: older MariaDB only range-scans this form
+        where.append("(appointment_time < %s OR (appointment_time = %s AND appointment_id < %s))")
+        params.extend([after[0], after[0], after[1]])
+
+    sql = f"SELECT {', '.join(COLUMNS)} FROM appointment"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY appointment_time DESC, appointment_id DESC LIMIT %s"
+    params.append(limit)
+    return sql, params
+
+
+def fetch_page(cur, filters, after=None, limit=ADMIN_PAGE_SIZE):
+    """Return ``(rows, next_cursor)``; ``next_cursor`` is ``None`` on the last page."""
+    # One extra row tells us whether another page exists
+    cur.execute(*page_query(filters, after, limit + 1))
+    rows = list(cur.fetchall())
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def iter_csv(cur, filters, batch_size=EXPORT_BATCH_SIZE):
+    """Yield CSV text for every matching appointment, one page at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    after = None
+    while True:
+        cur.execute(*page_query(filters, after, batch_size))
+        rows = cur.fetchall()
+        for row in rows:
+            writer.writerow([row[column] for column in COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        if len(rows) < batch_size:
+            return
+        after = (rows[-1]['appointment_time'], rows[-1]['appointment_id'])
@@ -1,17 +1,26 @@
 from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-from flask_mysqldb import MySQL, MySQLdb  # Added MySQLdb import
-from werkzeug.security import generate_password_hash, check_password_hash
+import MySQLdb
+from werkzeug.security import generate_password_hash
 import uuid
 import os
 from flask import Flask, request, redirect, url_for, flash, session, render_template
 from werkzeug.utils import secure_filename
 import MySQLdb.cursors
+import auth
 #import pytesseract
 from PIL import Image
 import os
-from flask import send_file
-import easyocr
-import cv2
+from datetime import datetime
+from flask import send_file, abort
+import mimetypes
+import secure_storage
+import document_pipeline
+import db
+import consulting_ids
+import admin_reports
+import doctor_directory
+import dashboard_queries
+import scheduler
 import matplotlib.pyplot as plt
 import subprocess
 
@@ -29,8 +38,10 @@ app.config['MYSQL_DB'] = 'hospital'
 app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
 
 
-# Initialize MySQL
-mysql = MySQL(app)
+# Pooled MySQL: one connection and one transaction per request
+mysql = db.PooledMySQL(app)
+
+# OCR runs in the shared inference server (inference_server.py) via document_pipeline
 
 
 
@@ -67,15 +78,26 @@ def patient_register():
 @app.route('/patient/login', methods=['GET', 'POST'])
 def patient_login():
     if request.method == 'POST':
-        name = request.form['name']
+        identifier = request.form.get('email') or request.form['name']
         password = request.form['password']
 
-        cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)  # Fetch as dictionary
-        cur.execute("SELECT * FROM patient WHERE name = %s", (name,))
-        patient = cur.fetchone()
-        cur.close()
+        cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+        try:
+            # Indexed lookup (email, else name); the hash check runs on the auth pool
+            patient = auth.authenticate(cur, 'patient', identifier, password)
+        except auth.RateLimited as e:
+            flash(str(e), 'danger')
+            return render_template('patient_login.html'), 429
+        except auth.AmbiguousAccount:
+            flash('Several accounts share that name; please log in with your email.', 'warning')
+            return render_template('patient_login.html')
+        except auth.AuthBusy:
+            flash('Login is busy right now, please try again.', 'warning')
+            return render_template('patient_login.html'), 503
+        finally:
+            cur.close()
 
-        if patient and check_password_hash(patient['password'], password):  # Access password correctly
+        if patient:
             session['patient_id'] = patient['patient_id']  # Use column name
             return redirect(url_for('patient_dashboard'))
 
@@ -87,14 +109,20 @@ def patient_dashboard():
     if 'patient_id' not in session:
         return redirect(url_for('patient_login'))
 
+    page = request.args.get('page', 1, type=int)
+    specialization = request.args.get('specialization')
+    query = request.args.get('q')
+
+    # Served from the in-process doctor directory; only a version check hits MySQL
+    directory = doctor_directory.get_directory()
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    cur.execute("SELECT doctor_id, name, specialization FROM doctor")
-    doctors = cur.fetchall()
+    doctors, total = directory.search(cur, query, specialization, page)
+    specializations = directory.specializations(cur)
     cur.close()
 
-    print("Doctors fetched:", doctors)  # Debugging
-
-    return render_template('patient_dashboard.html', doctors=doctors)
+    return render_template('patient_dashboard.html', doctors=doctors, total=total, page=page,
+                           per_page=doctor_directory.DOCTOR_PAGE_SIZE, specializations=specializations,
+                           specialization=specialization, q=query)
 
 # Doctor Registration Route
 @app.route('/doctor_register', methods=['GET', 'POST'])
@@ -110,8 +138,10 @@ def doctor_register():
         cur = mysql.connection.cursor()
         cur.execute("INSERT INTO doctor (name, email, password, contact_number, specialization, availability_status) VALUES (%s, %s, %s, %s, %s, %s)",
                     (name, email, password, contact_number, specialization, availability_status))
+        doctor_directory.bump_version(cur)
         mysql.connection.commit()
         cur.close()
+        doctor_directory.get_directory().invalidate()
 
         flash('Doctor registered successfully!', 'success')
         return redirect(url_for('doctor_register'))
@@ -122,15 +152,26 @@ def doctor_register():
 @app.route('/doctor/login', methods=['GET', 'POST'])
 def doctor_login():
     if request.method == 'POST':
-        name = request.form['name']
+        identifier = request.form.get('email') or request.form['name']
         password = request.form['password']
 
         cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cur.execute("SELECT * FROM doctor WHERE name = %s", (name,))
-        doctor = cur.fetchone()
-        cur.close()
+        try:
+            # Indexed lookup (email, else name); the hash check runs on the auth pool
+            doctor = auth.authenticate(cur, 'doctor', identifier, password)
+        except auth.RateLimited as e:
+            flash(str(e), 'danger')
+            return render_template('doctor_login.html'), 429
+        except auth.AmbiguousAccount:
+            flash('Several accounts share that name; please log in with your email.', 'warning')
+            return render_template('doctor_login.html')
+        except auth.AuthBusy:
+            flash('Login is busy right now, please try again.', 'warning')
+            return render_template('doctor_login.html'), 503
+        finally:
+            cur.close()
 
-        if doctor and check_password_hash(doctor['password'], password):  # Correctly fetch hashed password
+        if doctor:
             session['doctor_id'] = doctor['doctor_id']
             return redirect(url_for('doctor_dashboard'))
 
@@ -143,30 +184,22 @@ def doctor_dashboard():
     if 'doctor_id' not in session:
         return redirect(url_for('doctor_login'))  # Redirect if not logged in
 
-    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    window = request.args.get('window', 'today')
+    try:
+        if window not in dashboard_queries.WINDOWS:
+            raise ValueError(window)
+        after = admin_reports.decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return redirect(url_for('doctor_dashboard'))
 
-    # Fetch appointments for the logged-in doctor, including gender and contact number
-    query = """
-        SELECT 
-            a.appointment_id, 
-            a.consulting_id, 
-            a.appointment_time, 
-            a.status,
-            a.document_path,
-            p.patient_id, 
-            p.name AS patient_name, 
-            p.contact_number, 
-            p.gender
-        FROM appointment a
-        JOIN patient p ON a.patient_id = p.patient_id
-        WHERE a.doctor_id = %s AND a.status = 'Approved'
-    """
-    
-    cur.execute(query, (session['doctor_id'],))
-    appointments = cur.fetchall()
+    # One covering-index range scan per page; document counts are pre-aggregated
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    appointments, next_cursor = dashboard_queries.fetch_page(cur, session['doctor_id'], window, after)
     cur.close()
 
-    return render_template('doctor_dashboard.html', appointments=appointments)
+    next_url = url_for('doctor_dashboard', window=window, cursor=next_cursor) if next_cursor else None
+    return render_template('doctor_dashboard.html', appointments=appointments, window=window,
+                           windows=dashboard_queries.WINDOWS, next_url=next_url)
 
 
 # Admin Login Route
@@ -185,19 +218,32 @@ def admin_login():
     return render_template('admin_login.html')
 
 
+def filters_args(args):
+    """The admin list filters present in ``args``, for building follow-up links."""
+    return {key: args[key] for key in ('status', 'doctor_id', 'date_from', 'date_to') if args.get(key)}
+
+
 # Admin Dashboard Route
 @app.route('/admin/dashboard')
 def admin_dashboard():
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
 
+    try:
+        filters = admin_reports.parse_filters(request.args)
+        after = admin_reports.decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        flash("Invalid filter.", "warning")
+        return redirect(url_for('admin_dashboard'))
+
     try:
         cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cur.execute("SELECT * FROM appointment")
-        complaints = cur.fetchall()
+        complaints, next_cursor = admin_reports.fetch_page(cur, filters, after)
         cur.close()
-        print("Complaints:", complaints)  # Debugging
-        return render_template('admin_dashboard.html', complaints=complaints)
+        next_url = url_for('admin_dashboard', cursor=next_cursor, **filters_args(request.args)) \
+            if next_cursor else None
+        return render_template('admin_dashboard.html', complaints=complaints, filters=request.args,
+                               next_url=next_url)
     except Exception as e:
         print("Error fetching data:", e)
         flash("Error fetching data from the database.", "danger")
@@ -216,10 +262,21 @@ def update_status():
     try:
         # Update the correct table, if it's appointment
         cur.execute('UPDATE appointment SET status = %s WHERE appointment_id = %s', (status, complaint_id))
+        if status in scheduler.RELEASED_STATUSES:
+            scheduler.get_scheduler().release(cur, complaint_id)
+        else:
+            # Reactivated appointments must get their slot back before they count as booked
+            scheduler.get_scheduler().acquire(cur, complaint_id)
         mysql.connection.commit()
         return jsonify({'message': f'Status updated to {status}'})
+    except scheduler.SlotTaken as e:
+        mysql.connection.rollback()
+        return jsonify({'error': f'{e}; the appointment keeps its previous status',
+                        'free_slots': [slot.isoformat() for slot in e.suggestions]}), 409
     except Exception as e:
         mysql.connection.rollback()
+        # release()/acquire() already moved the slot in this worker's calendar
+        scheduler.get_scheduler().invalidate()
         return jsonify({'error': str(e)}), 500
     finally:
         cur.close()
@@ -243,16 +300,16 @@ def book_appointment(doctor_id):
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
 
     # Fetch doctor details
-    cur.execute("SELECT doctor_id, name, specialization FROM doctor WHERE doctor_id = %s", (doctor_id,))
-    doctor = cur.fetchone()
+    doctor = doctor_directory.get_directory().get(cur, doctor_id)
 
     if not doctor:
         flash("Doctor not found!", "danger")
         cur.close()
         return redirect(url_for('patient_dashboard'))
 
-    # Generate a unique Consulting ID
-    consulting_id = str(uuid.uuid4())[:8]  # Generates an 8-character unique ID
+    # Time-ordered and unique across workers; see consulting_ids.py
+    consulting_id = consulting_ids.new_consulting_id()
+    slots = scheduler.get_scheduler()
 
     if request.method == 'POST':
         appointment_time = request.form.get('appointment_time')
@@ -263,21 +320,27 @@ def book_appointment(doctor_id):
             return redirect(url_for('book_appointment', doctor_id=doctor_id))
 
         try:
-            # Insert appointment with unique consulting ID
-            cur.execute(
-                "INSERT INTO appointment (consulting_id, patient_id, doctor_id, appointment_time, status) VALUES (%s, %s, %s, %s, 'Pending')",
-                (consulting_id, patient_id, doctor_id, appointment_time)
-            )
+            # The doctor_slot unique key makes the booking atomic across workers
+            slots.book(cur, doctor_id, patient_id, datetime.fromisoformat(appointment_time), consulting_id)
             mysql.connection.commit()
             flash(f"Appointment booked successfully! Consulting ID: {consulting_id}", "success")
             return redirect(url_for('patient_dashboard'))
+        except scheduler.SlotTaken as e:
+            free = ", ".join(f"{slot:%d %b %H:%M}" for slot in e.suggestions)
+            flash(f"{e}. Next free slots: {free or 'none in the next months'}", "warning")
+        except (scheduler.SchedulingError, ValueError) as e:
+            flash(f"Error booking appointment: {str(e)}", "danger")
         except Exception as e:
             print("Error:", str(e))  # Debugging
+            mysql.connection.rollback()
+            # The slot may already be in this worker's calendar
+            slots.invalidate(doctor_id)
             flash(f"Error booking appointment: {str(e)}", "danger")
-        finally:
-            cur.close()
 
-    return render_template('book_appointment.html', doctor=doctor, consulting_id=consulting_id)
+    free_slots = slots.free_slots(cur, doctor_id)
+    cur.close()
+    return render_template('book_appointment.html', doctor=doctor, consulting_id=consulting_id,
+                           free_slots=free_slots)
 
 
 
@@ -308,20 +371,29 @@ def upload_document(appointment_id):
         flash('No files selected!')
         return redirect(request.referrer)
 
-    saved_files = []
-    for file in files:
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            saved_files.append(f"uploads/{filename}")
-
-            # Insert each file path into the database
-            cur = mysql.connection.cursor()
-            cur.execute("INSERT INTO appointment_documents (appointment_id, document_path) VALUES (%s, %s)", 
-                        (appointment_id, f"uploads/{filename}"))
-            mysql.connection.commit()
-            cur.close()
+    # Files are encrypted to the content-addressed store in parallel, then
+    # all rows go in with one executemany
+    uploads = [(secure_filename(file.filename), file.stream)
+               for file in files if file and allowed_file(file.filename)]
+    stored = secure_storage.get_store().put_many(appointment_id, uploads)
+
+    cur = mysql.connection.cursor()
+    if stored:
+        # Re-uploading the same file to the same appointment adds no new row
+        stored = list({info['document_path']: info for info in stored}.values())
+        cur.execute("SELECT document_path FROM appointment_documents WHERE appointment_id = %s "
+                    "AND document_path IN %s", (appointment_id, [info['document_path'] for info in stored]))
+        attached = {row['document_path'] for row in cur.fetchall()}
+        stored = [info for info in stored if info['document_path'] not in attached]
+    if stored:
+        cur.executemany("INSERT INTO appointment_documents (appointment_id, document_path, content_hash) "
+                        "VALUES (%s, %s, %s)",
+                        [(appointment_id, info['document_path'], info['sha256']) for info in stored])
+        cur.execute("UPDATE appointment SET document_count = document_count + %s WHERE appointment_id = %s",
+                    (len(stored), appointment_id))
+        mysql.connection.commit()
+    cur.close()
+    saved_files = [info['document_path'] for info in stored]
 
     if saved_files:
         flash(f'Successfully uploaded {len(saved_files)} files.')
@@ -334,7 +406,14 @@ def upload_document(appointment_id):
 
 @app.route('/search_consulting_id', methods=['POST'])
 def search_consulting_id():
-    consulting_id = request.form.get('consulting_id')
+    consulting_id = request.form.get('consulting_id', '').strip()
+    try:
+        consulting_id = consulting_ids.normalize(consulting_id)
+    except consulting_ids.InvalidConsultingId as e:
+        # Older 8-character IDs carry no check symbol and are looked up as typed
+        if len(consulting_id) >= consulting_ids.ID_LENGTH:
+            flash(str(e), "warning")
+            return redirect(url_for('doctor_dashboard'))
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)  # Use MySQLdb cursor
     
     # Fetch appointment info by consulting ID
@@ -402,36 +481,23 @@ def process_document(appointment_id, document_path):
     if 'doctor_id' not in session:
         return redirect(url_for('doctor_login'))
 
-    # Construct full file path
-    file_path = os.path.join(app.root_path, 'static', document_path)
-
-    if os.path.exists(file_path):
-        # Initialize EasyOCR
-        reader = easyocr.Reader(['en'], gpu=False)
-
-        # Perform OCR on the image
-        ocr_result = reader.readtext(file_path)
-
-        # Collect the final extracted text
-        final_text = " ".join([text for (_, text, _) in ocr_result])
-
-        # Draw bounding boxes on the image
-        img = cv2.imread(file_path)
-        for (bbox, text, prob) in ocr_result:
-            top_left = tuple([int(val) for val in bbox[0]])
-            bottom_right = tuple([int(val) for val in bbox[2]])
-            cv2.rectangle(img, top_left, bottom_right, (0, 255, 0), 2)
-            cv2.putText(img, text, top_left, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
+    info = secure_storage.get_store().info(document_path)
 
-        # Save the annotated image
-        annotated_path = document_path.replace('.png', '_annotated.png')
-        save_path = os.path.join(app.root_path, 'static', annotated_path)
-        cv2.imwrite(save_path, img)
+    if info is not None:
+        # OCR runs in the request here (app2 queues it); the result cache still
+        # saves repeat views and documents other appointments already processed
+        result = document_pipeline.run_document_job({
+            'appointment_id': appointment_id,
+            'document_path': document_path,
+            'doc_hash': info['sha256'],
+            'adaptive': document_pipeline.resolve_adaptive(document_path),
+        })
 
         # Render the OCR result
         return render_template('ocr_result.html', 
-                               text=final_text, 
-                               image_path=url_for('static', filename=annotated_path))
+                               text=" ".join(result['texts']), 
+                               image_path=url_for('serve_document', appointment_id=appointment_id,
+                                                  document_path=result['annotated_path']))
 
     else:
         flash('File not found.', 'danger')
@@ -439,6 +505,24 @@ def process_document(appointment_id, document_path):
     return redirect(url_for('view_document', appointment_id=appointment_id))
 
 
+@app.route('/documents/<int:appointment_id>/<path:document_path>')
+def serve_document(appointment_id, document_path):
+    """Send a stored document, decrypted, to the doctor or patient viewing it."""
+    if 'doctor_id' not in session and 'patient_id' not in session:
+        return redirect(url_for('doctor_login'))
+
+    store = secure_storage.get_store()
+    info = store.info(document_path)
+    # Legacy plaintext files have no owning appointment recorded
+    if info is None or info['appointment_id'] not in (None, appointment_id):
+        abort(404)
+
+    response = send_file(store.open(document_path),
+                         mimetype=mimetypes.guess_type(document_path)[0] or 'application/octet-stream')
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
+
+
 @app.route('/encrypt12')
 def encrypt12():
     try:
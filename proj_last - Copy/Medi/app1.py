@@ -5,8 +5,8 @@ from werkzeug.utils import secure_filename
 import pymysql
 pymysql.install_as_MySQLdb()
 
-from flask_mysqldb import MySQL
 import MySQLdb.cursors
+import db
 import uuid
 import os
 import pytesseract
@@ -26,16 +26,14 @@ app.config['MYSQL_PASSWORD'] = ''  # Update if you use a password
 app.config['MYSQL_DB'] = 'hospital_db'
 app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
 
-# Initialize MySQL
-mysql = MySQL(app)
+# Pooled MySQL: one connection and one transaction per request
+mysql = db.PooledMySQL(app)
 
-# 🧪 Optional Test: Verify DB Connection
-try:
-    connection = mysql.connection
-    cursor = connection.cursor()
+# 🧪 Optional Test: Verify DB Connection (borrows from the pool, no app context needed)
+if mysql.pool.check():
     print("✅ MySQL Connection established!")
-except Exception as e:
-    print("❌ MySQL connection failed:", e)
+else:
+    print("❌ MySQL connection failed")
 
 # -------------------- ROUTES --------------------
 
@@ -1,22 +1,29 @@
 from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-from flask_mysqldb import MySQL, MySQLdb  # Added MySQLdb import
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Response, abort, stream_with_context
+import MySQLdb
+from werkzeug.security import generate_password_hash
 import uuid
 import os
 from flask import Flask, request, redirect, url_for, flash, session, render_template
 from werkzeug.utils import secure_filename
 import MySQLdb.cursors
-import pytesseract
-from PIL import Image
+import auth
 import os
+import mimetypes
+from datetime import datetime
 from flask import send_file
-import easyocr
-import cv2
-import matplotlib.pyplot as plt
-import subprocess
-from transformers import pipeline
-import re
-import textwrap
+import ocr_cache
+import secure_storage
+import document_pipeline
+import inference_client
+import jobs
+import services
+import db
+import consulting_ids
+import admin_reports
+import doctor_directory
+import dashboard_queries
+import scheduler
 
 
 
@@ -32,8 +39,11 @@ app.config['MYSQL_DB'] = 'hospital'
 app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
 
 
-# Initialize MySQL
-mysql = MySQL(app)
+# Pooled MySQL: one connection and one transaction per request
+mysql = db.PooledMySQL(app)
+
+# OCR and summarization models live in the inference server process
+# (inference_server.py), so web and job workers never load them
 
 
 
@@ -70,15 +80,26 @@ def patient_register():
 @app.route('/patient/login', methods=['GET', 'POST'])
 def patient_login():
     if request.method == 'POST':
-        name = request.form['name']
+        identifier = request.form.get('email') or request.form['name']
         password = request.form['password']
 
-        cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)  # Fetch as dictionary
-        cur.execute("SELECT * FROM patient WHERE name = %s", (name,))
-        patient = cur.fetchone()
-        cur.close()
+        cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+        try:
+            # Indexed lookup (email, else name); the hash check runs on the auth pool
+            patient = auth.authenticate(cur, 'patient', identifier, password)
+        except auth.RateLimited as e:
+            flash(str(e), 'danger')
+            return render_template('patient_login.html'), 429
+        except auth.AmbiguousAccount:
+            flash('Several accounts share that name; please log in with your email.', 'warning')
+            return render_template('patient_login.html')
+        except auth.AuthBusy:
+            flash('Login is busy right now, please try again.', 'warning')
+            return render_template('patient_login.html'), 503
+        finally:
+            cur.close()
 
-        if patient and check_password_hash(patient['password'], password):  # Access password correctly
+        if patient:
             session['patient_id'] = patient['patient_id']  # Use column name
             return redirect(url_for('patient_dashboard'))
 
@@ -90,14 +111,20 @@ def patient_dashboard():
     if 'patient_id' not in session:
         return redirect(url_for('patient_login'))
 
+    page = request.args.get('page', 1, type=int)
+    specialization = request.args.get('specialization')
+    query = request.args.get('q')
+
+    # Served from the in-process doctor directory; only a version check hits MySQL
+    directory = doctor_directory.get_directory()
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    cur.execute("SELECT doctor_id, name, specialization FROM doctor")
-    doctors = cur.fetchall()
+    doctors, total = directory.search(cur, query, specialization, page)
+    specializations = directory.specializations(cur)
     cur.close()
 
-    print("Doctors fetched:", doctors)  # Debugging
-
-    return render_template('patient_dashboard.html', doctors=doctors)
+    return render_template('patient_dashboard.html', doctors=doctors, total=total, page=page,
+                           per_page=doctor_directory.DOCTOR_PAGE_SIZE, specializations=specializations,
+                           specialization=specialization, q=query)
 
 # Doctor Registration Route
 @app.route('/doctor_register', methods=['GET', 'POST'])
@@ -113,8 +140,10 @@ def doctor_register():
         cur = mysql.connection.cursor()
         cur.execute("INSERT INTO doctor (name, email, password, contact_number, specialization, availability_status) VALUES (%s, %s, %s, %s, %s, %s)",
                     (name, email, password, contact_number, specialization, availability_status))
+        doctor_directory.bump_version(cur)
         mysql.connection.commit()
         cur.close()
+        doctor_directory.get_directory().invalidate()
 
         flash('Doctor registered successfully!', 'success')
         return redirect(url_for('doctor_register'))
@@ -125,15 +154,26 @@ def doctor_register():
 @app.route('/doctor/login', methods=['GET', 'POST'])
 def doctor_login():
     if request.method == 'POST':
-        name = request.form['name']
+        identifier = request.form.get('email') or request.form['name']
         password = request.form['password']
 
         cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cur.execute("SELECT * FROM doctor WHERE name = %s", (name,))
-        doctor = cur.fetchone()
-        cur.close()
+        try:
+            # Indexed lookup (email, else name); the hash check runs on the auth pool
+            doctor = auth.authenticate(cur, 'doctor', identifier, password)
+        except auth.RateLimited as e:
+            flash(str(e), 'danger')
+            return render_template('doctor_login.html'), 429
+        except auth.AmbiguousAccount:
+            flash('Several accounts share that name; please log in with your email.', 'warning')
+            return render_template('doctor_login.html')
+        except auth.AuthBusy:
+            flash('Login is busy right now, please try again.', 'warning')
+            return render_template('doctor_login.html'), 503
+        finally:
+            cur.close()
 
-        if doctor and check_password_hash(doctor['password'], password):  # Correctly fetch hashed password
+        if doctor:
             session['doctor_id'] = doctor['doctor_id']
             return redirect(url_for('doctor_dashboard'))
 
@@ -146,33 +186,22 @@ def doctor_dashboard():
     if 'doctor_id' not in session:
         return redirect(url_for('doctor_login'))  # Redirect if not logged in
 
-    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    window = request.args.get('window', 'today')
+    try:
+        if window not in dashboard_queries.WINDOWS:
+            raise ValueError(window)
+        after = admin_reports.decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return redirect(url_for('doctor_dashboard'))
 
-    query = """
-        SELECT 
-            a.appointment_id, 
-            a.consulting_id, 
-            a.appointment_time, 
-            a.status,
-            p.patient_id, 
-            p.name AS patient_name, 
-            p.contact_number, 
-            p.gender,
-            EXISTS (
-                SELECT 1 
-                FROM appointment_documents d 
-                WHERE d.appointment_id = a.appointment_id
-            ) AS has_document
-        FROM appointment a
-        JOIN patient p ON a.patient_id = p.patient_id
-        WHERE a.doctor_id = %s AND a.status = 'Approved'
-    """
-
-    cur.execute(query, (session['doctor_id'],))
-    appointments = cur.fetchall()
+    # One covering-index range scan per page; document counts are pre-aggregated
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    appointments, next_cursor = dashboard_queries.fetch_page(cur, session['doctor_id'], window, after)
     cur.close()
 
-    return render_template('doctor_dashboard.html', appointments=appointments)
+    next_url = url_for('doctor_dashboard', window=window, cursor=next_cursor) if next_cursor else None
+    return render_template('doctor_dashboard.html', appointments=appointments, window=window,
+                           windows=dashboard_queries.WINDOWS, next_url=next_url)
 
 
 
@@ -192,23 +221,81 @@ def admin_login():
     return render_template('admin_login.html')
 
 
+def filters_args(args):
+    """The admin list filters present in ``args``, for building follow-up links."""
+    return {key: args[key] for key in ('status', 'doctor_id', 'date_from', 'date_to') if args.get(key)}
+
+
 # Admin Dashboard Route
 @app.route('/admin/dashboard')
 def admin_dashboard():
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
 
+    try:
+        filters = admin_reports.parse_filters(request.args)
+        after = admin_reports.decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        flash("Invalid filter.", "warning")
+        return redirect(url_for('admin_dashboard'))
+
     try:
         cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cur.execute("SELECT * FROM appointment")
-        complaints = cur.fetchall()
+        complaints, next_cursor = admin_reports.fetch_page(cur, filters, after)
         cur.close()
-        print("Complaints:", complaints)  # Debugging
-        return render_template('admin_dashboard.html', complaints=complaints)
+        query = filters_args(request.args)
+        next_url = url_for('admin_dashboard', cursor=next_cursor, **query) if next_cursor else None
+        return render_template('admin_dashboard.html', complaints=complaints, filters=request.args,
+                               next_url=next_url,
+                               export_url=url_for('admin_export_appointments', **query))
     except Exception as e:
         print("Error fetching data:", e)
         flash("Error fetching data from the database.", "danger")
         return redirect(url_for('admin_login'))
+
+
+@app.route('/admin/api/appointments')
+def admin_list_appointments():
+    """Keyset-paginated appointments: ``?status=&doctor_id=&date_from=&date_to=&limit=&cursor=``."""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Not logged in'}), 401
+
+    try:
+        filters = admin_reports.parse_filters(request.args)
+        limit = admin_reports.parse_limit(request.args.get('limit'))
+        after = admin_reports.decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    rows, next_cursor = admin_reports.fetch_page(cur, filters, after, limit)
+    cur.close()
+    for row in rows:
+        row['appointment_time'] = row['appointment_time'].isoformat()
+    return jsonify({'items': rows, 'next_cursor': next_cursor, 'limit': limit})
+
+
+@app.route('/admin/appointments.csv')
+def admin_export_appointments():
+    """Stream every matching appointment as CSV without buffering the result."""
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('admin_login'))
+
+    try:
+        filters = admin_reports.parse_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+
+    def generate():
+        try:
+            yield from admin_reports.iter_csv(cur, filters)
+        finally:
+            cur.close()
+
+    return Response(stream_with_context(generate()), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=appointments.csv'})
     
 
 @app.route('/update_status', methods=['POST'])
@@ -223,10 +310,21 @@ def update_status():
     try:
         # Update the correct table, if it's appointment
         cur.execute('UPDATE appointment SET status = %s WHERE appointment_id = %s', (status, complaint_id))
+        if status in scheduler.RELEASED_STATUSES:
+            scheduler.get_scheduler().release(cur, complaint_id)
+        else:
+            # Reactivated appointments must get their slot back before they count as booked
+            scheduler.get_scheduler().acquire(cur, complaint_id)
         mysql.connection.commit()
         return jsonify({'message': f'Status updated to {status}'})
+    except scheduler.SlotTaken as e:
+        mysql.connection.rollback()
+        return jsonify({'error': f'{e}; the appointment keeps its previous status',
+                        'free_slots': [slot.isoformat() for slot in e.suggestions]}), 409
     except Exception as e:
         mysql.connection.rollback()
+        # release()/acquire() already moved the slot in this worker's calendar
+        scheduler.get_scheduler().invalidate()
         return jsonify({'error': str(e)}), 500
     finally:
         cur.close()
@@ -250,16 +348,16 @@ def book_appointment(doctor_id):
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
 
     # Fetch doctor details
-    cur.execute("SELECT doctor_id, name, specialization FROM doctor WHERE doctor_id = %s", (doctor_id,))
-    doctor = cur.fetchone()
+    doctor = doctor_directory.get_directory().get(cur, doctor_id)
 
     if not doctor:
         flash("Doctor not found!", "danger")
         cur.close()
         return redirect(url_for('patient_dashboard'))
 
-    # Generate a unique Consulting ID
-    consulting_id = str(uuid.uuid4())[:8]  # Generates an 8-character unique ID
+    # Time-ordered and unique across workers; see consulting_ids.py
+    consulting_id = consulting_ids.new_consulting_id()
+    slots = scheduler.get_scheduler()
 
     if request.method == 'POST':
         appointment_time = request.form.get('appointment_time')
@@ -270,23 +368,45 @@ def book_appointment(doctor_id):
             return redirect(url_for('book_appointment', doctor_id=doctor_id))
 
         try:
-            # Insert appointment with unique consulting ID
-            cur.execute(
-                "INSERT INTO appointment (consulting_id, patient_id, doctor_id, appointment_time, status) VALUES (%s, %s, %s, %s, 'Pending')",
-                (consulting_id, patient_id, doctor_id, appointment_time)
-            )
+            # The doctor_slot unique key makes the booking atomic across workers
+            slots.book(cur, doctor_id, patient_id, datetime.fromisoformat(appointment_time), consulting_id)
             mysql.connection.commit()
             flash(f"Appointment booked successfully! Consulting ID: {consulting_id}", "success")
             return redirect(url_for('patient_dashboard'))
+        except scheduler.SlotTaken as e:
+            free = ", ".join(f"{slot:%d %b %H:%M}" for slot in e.suggestions)
+            flash(f"{e}. Next free slots: {free or 'none in the next months'}", "warning")
+        except (scheduler.SchedulingError, ValueError) as e:
+            flash(f"Error booking appointment: {str(e)}", "danger")
         except Exception as e:
             print("Error:", str(e))  # Debugging
+            mysql.connection.rollback()
+            # The slot may already be in this worker's calendar
+            slots.invalidate(doctor_id)
             flash(f"Error booking appointment: {str(e)}", "danger")
-        finally:
-            cur.close()
 
-    return render_template('book_appointment.html', doctor=doctor, consulting_id=consulting_id)
+    free_slots = slots.free_slots(cur, doctor_id)
+    cur.close()
+    return render_template('book_appointment.html', doctor=doctor, consulting_id=consulting_id,
+                           free_slots=free_slots)
+
 
 
+@app.route('/api/doctors/<int:doctor_id>/free_slots')
+def doctor_free_slots(doctor_id):
+    """Next free slots for a doctor: ``?n=5&after=2025-05-01T09:00``, answered from the slot index."""
+    try:
+        after = datetime.fromisoformat(request.args['after']) if request.args.get('after') else None
+        n = request.args.get('n', 5, type=int)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    free = scheduler.get_scheduler().free_slots(cur, doctor_id, after, n)
+    cur.close()
+    return jsonify({'doctor_id': doctor_id, 'slot_minutes': scheduler.SCHEDULE_SLOT_MINUTES,
+                    'free_slots': [slot.isoformat() for slot in free]})
+
 
 @app.route('/doctor/logout')
 def doctor_logout():
@@ -315,20 +435,37 @@ def upload_document(appointment_id):
         flash('No files selected!')
         return redirect(request.referrer)
 
-    saved_files = []
-    for file in files:
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            saved_files.append(f"uploads/{filename}")
-
-            # Insert each file path into the database
-            cur = mysql.connection.cursor()
-            cur.execute("INSERT INTO appointment_documents (appointment_id, document_path) VALUES (%s, %s)", 
-                        (appointment_id, f"uploads/{filename}"))
-            mysql.connection.commit()
-            cur.close()
+    # Bulk ingest: files are encrypted to the content-addressed store in
+    # parallel, then all rows go in with one executemany in the request's
+    # single transaction
+    uploads = [(secure_filename(file.filename), file.stream)
+               for file in files if file and allowed_file(file.filename)]
+    stored = secure_storage.get_store().put_many(appointment_id, uploads)
+
+    cur = mysql.connection.cursor()
+    if stored:
+        # Re-uploading the same file to the same appointment adds no new row
+        stored = list({info['document_path']: info for info in stored}.values())
+        cur.execute("SELECT document_path FROM appointment_documents WHERE appointment_id = %s "
+                    "AND document_path IN %s", (appointment_id, [info['document_path'] for info in stored]))
+        attached = {row['document_path'] for row in cur.fetchall()}
+        stored = [info for info in stored if info['document_path'] not in attached]
+    if stored:
+        cur.executemany("INSERT INTO appointment_documents (appointment_id, document_path, content_hash) "
+                        "VALUES (%s, %s, %s)",
+                        [(appointment_id, info['document_path'], info['sha256']) for info in stored])
+        # Keeps the dashboard's has_document a column read instead of a subquery
+        cur.execute("UPDATE appointment SET document_count = document_count + %s WHERE appointment_id = %s",
+                    (len(stored), appointment_id))
+        mysql.connection.commit()
+    cur.close()
+    saved_files = [info['document_path'] for info in stored]
+
+    # Start OCR/summarization in the background so the first view is fast
+    if request.form.get('preprocess', '1') != '0':
+        for info in stored:
+            if info['document_path'].rsplit('.', 1)[1].lower() in document_pipeline.OCR_EXTENSIONS:
+                enqueue_document_job(appointment_id, info['document_path'], info['sha256'])
 
     if saved_files:
         flash(f'Successfully uploaded {len(saved_files)} files.')
@@ -341,7 +478,14 @@ def upload_document(appointment_id):
 
 @app.route('/search_consulting_id', methods=['POST'])
 def search_consulting_id():
-    consulting_id = request.form.get('consulting_id')
+    consulting_id = request.form.get('consulting_id', '').strip()
+    try:
+        consulting_id = consulting_ids.normalize(consulting_id)
+    except consulting_ids.InvalidConsultingId as e:
+        # Older 8-character IDs carry no check symbol and are looked up as typed
+        if len(consulting_id) >= consulting_ids.ID_LENGTH:
+            flash(str(e), "warning")
+            return redirect(url_for('doctor_dashboard'))
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)  # Use MySQLdb cursor
     
     # Fetch appointment info by consulting ID
@@ -350,7 +494,8 @@ def search_consulting_id():
     cur.close()
 
     if appointment and appointment['document_path']:
-        return redirect(url_for('static', filename=appointment['document_path']))
+        return redirect(url_for('serve_document', appointment_id=appointment['appointment_id'],
+                                document_path=appointment['document_path']))
     else:
         flash("No document found for this Consulting ID", "warning")
         return redirect(url_for('doctor_dashboard'))
@@ -363,13 +508,17 @@ def ocr_document(document_path):
         return redirect(url_for('doctor_login'))
 
     try:
-        file_path = os.path.join(app.root_path, 'static', document_path)
-        
-        if not os.path.exists(file_path):
+        store = secure_storage.get_store()
+
+        if not store.exists(document_path):
             flash("File not found.", "danger")
             return redirect(url_for('doctor_dashboard'))
-        
-        img = Image.open(file_path).convert('L')  # Grayscale for better OCR
+
+        import pytesseract
+        from PIL import Image
+
+        with store.open(document_path) as f:
+            img = Image.open(f).convert('L')  # Grayscale for better OCR
         text = pytesseract.image_to_string(img)
         
         return render_template('ocr_result.html', text=text, document_path=document_path)
@@ -404,92 +553,219 @@ def view_document(appointment_id):
 
     return redirect(url_for('doctor_dashboard'))
 
-summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-def clean_text(text):
-    """Basic OCR text cleanup."""
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'[^\w\s.,;:!?()-]', '', text)
-    return text.strip()
+_job_queue = None
+
+def get_job_queue():
+    """Start the background document job queue on first use."""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = jobs.JobQueue(document_pipeline.run_document_job)
+        _job_queue.start()
+    return _job_queue
+
+def enqueue_document_job(appointment_id, document_path, doc_hash=None, adaptive=None):
+    """Queue OCR/summarization for an uploaded document; returns the job id."""
+    doc_hash = doc_hash or secure_storage.get_store().info(document_path)['sha256']
+    adaptive = document_pipeline.resolve_adaptive(document_path, adaptive)
+    payload = {
+        'appointment_id': appointment_id,
+        'document_path': document_path,
+        'doc_hash': doc_hash,
+        'adaptive': adaptive,
+    }
+    dedupe_key = f"{appointment_id}:{doc_hash}:{document_pipeline.pipeline_version(adaptive)}"
+    return get_job_queue().submit(payload, dedupe_key=dedupe_key)
+
+def document_url(appointment_id, document_path):
+    return url_for('serve_document', appointment_id=appointment_id, document_path=document_path)
 
 @app.route('/process_document/<int:appointment_id>/<path:document_path>')
 def process_document(appointment_id, document_path):
     if 'doctor_id' not in session:
         return redirect(url_for('doctor_login'))
 
-    file_path = os.path.join(app.root_path, 'static', document_path)
+    info = secure_storage.get_store().info(document_path)
+    # ?adaptive=1 / ?adaptive=0 overrides the OCR_ADAPTIVE default
+    adaptive = document_pipeline.resolve_adaptive(document_path, request.args.get('adaptive', type=int))
+
+    if info is not None:
+        result = document_pipeline.cached_result(appointment_id, document_path, info['sha256'], adaptive)
 
-    if os.path.exists(file_path):
-        reader = easyocr.Reader(['en'], gpu=False)
-        ocr_result = reader.readtext(file_path)
+        if result is None:
+            # Too slow to run inside the request: hand it to the job queue and
+            # let the page poll the status endpoint until the result is cached
+            job_id = enqueue_document_job(appointment_id, document_path, info['sha256'], adaptive)
+            return render_template('ocr_result.html',
+                                   summary="Processing document...",
+                                   important_lines=[],
+                                   image_path=document_url(appointment_id, document_path),
+                                   job_id=job_id,
+                                   status_url=url_for('job_status', job_id=job_id))
 
-        lines = [text.strip() for (_, text, _) in ocr_result if len(text.strip()) > 5]
-        full_text = clean_text(" ".join(lines))
+        return render_template('ocr_result.html',
+                               summary=result['summary'],
+                               important_lines=result['important_lines'],
+                               image_path=document_url(appointment_id, result['annotated_path']))
+    else:
+        flash('File not found.', 'danger')
+        return redirect(url_for('view_document', appointment_id=appointment_id))
 
-        # Improved summarization logic
-        if len(full_text) > 20:
-            max_chunk_len = 800
-            chunks = textwrap.wrap(full_text, max_chunk_len, break_long_words=False, replace_whitespace=False)
+@app.route('/documents/<int:appointment_id>/<path:document_path>')
+def serve_document(appointment_id, document_path):
+    """Stream a stored document, decrypting only the byte range requested."""
+    if 'doctor_id' not in session and 'patient_id' not in session:
+        return redirect(url_for('doctor_login'))
 
-            summaries = []
-            for chunk in chunks:
-                result = summarizer(chunk, max_length=60, min_length=30, do_sample=False)
-                summaries.append(result[0]['summary_text'])
+    store = secure_storage.get_store()
+    info = store.info(document_path)
+    # Legacy plaintext files have no owning appointment recorded
+    if info is None or info['appointment_id'] not in (None, appointment_id):
+        abort(404)
+
+    size = info['size']
+    start, end, status = 0, size, 200
+    if request.range is not None:
+        byte_range = request.range.range_for_length(size)
+        if byte_range is None:
+            return Response(status=416, headers={'Content-Range': f'bytes */{size}'})
+        start, end = byte_range
+        status = 206
+
+    response = Response(stream_with_context(store.iter_range(document_path, start, end)), status,
+                        mimetype=mimetypes.guess_type(document_path)[0] or 'application/octet-stream',
+                        direct_passthrough=True)
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Content-Length'] = str(end - start)
+    response.headers['Cache-Control'] = 'private, no-store'
+    if status == 206:
+        response.headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+    return response
+
+@app.route('/jobs/process_document/<int:appointment_id>/<path:document_path>', methods=['POST'])
+def start_document_job(appointment_id, document_path):
+    if 'doctor_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
 
-            overall_summary = " ".join(summaries)
-        else:
-            overall_summary = "Not enough content to summarize."
+    if not secure_storage.get_store().exists(document_path):
+        return jsonify({'error': 'File not found'}), 404
 
-        # Take top 5 most relevant lines based on length
-        important_lines = sorted(lines, key=lambda x: len(x), reverse=True)[:5]
+    job_id = enqueue_document_job(appointment_id, document_path,
+                                  adaptive=request.args.get('adaptive', type=int))
+    return jsonify({'job_id': job_id, 'status_url': url_for('job_status', job_id=job_id)}), 202
 
-        # Annotate image
-        img = cv2.imread(file_path)
-        for (bbox, text, prob) in ocr_result:
-            top_left = tuple([int(val) for val in bbox[0]])
-            bottom_right = tuple([int(val) for val in bbox[2]])
-            cv2.rectangle(img, top_left, bottom_right, (0, 255, 0), 2)
-            cv2.putText(img, text, top_left, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    if 'doctor_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    response = {
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'error': job['error'],
+    }
+    if job['status'] == jobs.DONE:
+        result = job['result']
+        response['summary'] = result['summary']
+        response['important_lines'] = result['important_lines']
+        response['image_path'] = document_url(job['payload']['appointment_id'], result['annotated_path'])
+        response['ocr_report'] = result.get('ocr_report')
+    return jsonify(response)
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if 'doctor_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
 
-        annotated_path = document_path.rsplit('.', 1)[0] + '_annotated.png'
-        save_path = os.path.join(app.root_path, 'static', annotated_path)
-        cv2.imwrite(save_path, img)
+    if get_job_queue().cancel(job_id):
+        return jsonify({'message': 'Cancellation requested'})
+    return jsonify({'error': 'Job is not queued or running'}), 409
 
-        return render_template('ocr_result.html',
-                               summary=overall_summary,
-                               important_lines=important_lines,
-                               image_path=url_for('static', filename=annotated_path))
-    else:
-        flash('File not found.', 'danger')
-        return redirect(url_for('view_document', appointment_id=appointment_id))
+@app.route('/jobs/<job_id>/retry', methods=['POST'])
+def retry_job(job_id):
+    if 'doctor_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+
+    if get_job_queue().retry(job_id):
+        return jsonify({'message': 'Job re-queued'})
+    return jsonify({'error': 'Only failed or cancelled jobs can be retried'}), 409
     
 
 
+@app.route('/metrics/ocr')
+def ocr_metrics():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Not logged in'}), 401
+
+    try:
+        inference = inference_client.metrics()
+    except inference_client.InferenceError as e:
+        inference = {'error': str(e)}
+    return jsonify({'inference': inference,
+                    'cache': ocr_cache.get_cache().stats(),
+                    'jobs': get_job_queue().stats(),
+                    'storage': secure_storage.get_store().stats()})
+
+
+@app.route('/metrics/db')
+def db_metrics():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Not logged in'}), 401
+
+    return jsonify(mysql.pool.metrics())
+
+
+@app.route('/metrics/doctor_directory')
+def doctor_directory_metrics():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Not logged in'}), 401
+
+    return jsonify(doctor_directory.get_directory().stats())
+
+
+@app.route('/metrics/scheduler')
+def scheduler_metrics():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Not logged in'}), 401
+
+    return jsonify(scheduler.get_scheduler().stats())
+
+
+def launch_tool(name):
+    """Start a Streamlit tool service (at most once) and send the user to it."""
+    try:
+        status = services.get_manager().ensure(name)
+    except services.ServiceError as e:
+        return f"An error occurred: {e}", 503
+
+    url = f"http://{request.host.rsplit(':', 1)[0]}:{status['port']}/"
+    if status['healthy']:
+        return redirect(url)
+    return (f"{name} is starting. It will be available at <a href=\"{url}\">{url}</a> shortly.",
+            202, {'Retry-After': '5'})
+
 @app.route('/decrypt12')
 def decrypt12():
-    try:
-        # Replace 'encryption12.py' with the actual path if needed
-        subprocess.run(['streamlit', 'run', 'decrypt12.py'], check=True)
-        return "Encryption process started. Check the Streamlit interface."
-    except subprocess.CalledProcessError as e:
-        return f"An error occurred: {e}"
+    return launch_tool('decrypt12')
 
 @app.route('/encrypt12')
 def encrypt12():
-    try:
-        # Replace 'encryption12.py' with the actual path if needed
-        subprocess.run(['streamlit', 'run', 'encrypt12.py'], check=True)
-        return "Encryption process started. Check the Streamlit interface."
-    except subprocess.CalledProcessError as e:
-        return f"An error occurred: {e}"
+    return launch_tool('encrypt12')
 
 @app.route('/medicle_main')
 def medicle_main():
-    try:
-        # Replace 'encryption12.py' with the actual path if needed
-        subprocess.run(['streamlit', 'run', 'medicle_main.py'], check=True)
-        return "Encryption process started. Check the Streamlit interface."
-    except subprocess.CalledProcessError as e:
-        return f"An error occurred: {e}"
+    return launch_tool('medicle_main')
+
+@app.route('/services/health')
+def services_health():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Not logged in'}), 401
+
+    return jsonify(services.get_manager().health())
 
 
 
@@ -0,0 +1,162 @@
+"""Login helpers: indexed account lookup, off-thread hash checks, rate limiting.
+
+Accounts are found by ``email`` (unique-indexed) or, for the old login
+forms, by ``name`` through its own index, refusing names that match more
+than one account. Password hashes (scrypt/pbkdf2, which release the GIL)
+are verified on a bounded thread pool so a burst of logins queues there
+instead of stalling every request thread, and each account gets an
+in-memory token bucket so guessing is throttled per identifier.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+AUTH_HASH_WORKERS = int(os.environ.get('AUTH_HASH_WORKERS', str(os.cpu_count() or 2)))
+# Logins waiting for a hash worker beyond this are turned away rather than queued
+AUTH_MAX_PENDING = int(os.environ.get('AUTH_MAX_PENDING', str(4 * AUTH_HASH_WORKERS)))
+AUTH_HASH_TIMEOUT = float(os.environ.get('AUTH_HASH_TIMEOUT', '10'))
+LOGIN_BURST = int(os.environ.get('LOGIN_BURST', '5'))
+LOGIN_REFILL_SECONDS = float(os.environ.get('LOGIN_REFILL_SECONDS', '60'))
+LOGIN_MAX_TRACKED = 100_000
+
+ACCOUNT_TABLES = {'patient': 'patient_id', 'doctor': 'doctor_id'}
+
+
+class AuthBusy(Exception):
+    """Too many logins are already waiting for a hash worker."""
+
+
+class AmbiguousAccount(Exception):
+    """A name login matched more than one account."""
+
+
+class RateLimited(Exception):
+    """Too many login attempts for this account; ``retry_after`` is in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Too many attempts, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def find_account(cur, table, identifier):
+    """Return the ``id``/``name``/``password`` row for a login identifier, or ``None``.
+
+    Identifiers containing ``@`` are matched against the unique ``email``
+    index, anything else against the ``name`` index.
+    """
+    id_column = ACCOUNT_TABLES[table]
+    column = 'email' if '@' in identifier else 'name'
+    cur.execute(f"SELECT {id_column}, name, password FROM {table} WHERE {column} = %s LIMIT 2",
+                (identifier.strip(),))
+    rows = cur.fetchall()
+    if len(rows) > 1:
+        raise AmbiguousAccount(identifier)
+    return rows[0] if rows else None
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets: ``burst`` attempts, refilled one every ``refill_seconds``."""
+
+    def __init__(self, burst=LOGIN_BURST, refill_seconds=LOGIN_REFILL_SECONDS, max_keys=LOGIN_MAX_TRACKED):
+        self.burst = burst
+        self.rate = 1.0 / refill_seconds
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._limited = 0
+
+    def _prune(self, now):
+        # Buckets that have refilled completely carry no state worth keeping
+        full = [key for key, (tokens, stamp) in self._buckets.items()
+                if tokens + (now - stamp) * self.rate >= self.burst]
+        for key in full:
+            del self._buckets[key]
+
+    def acquire(self, key):
+        """Take one token; returns 0 if allowed, else the seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                self._limited += 1
+                return (1 - tokens) / self.rate
+            if key not in self._buckets and len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            self._buckets[key] = (tokens - 1, now)
+            return 0
+
+    def stats(self):
+        with self._lock:
+            return {'tracked': len(self._buckets), 'limited': self._limited}
+
+
+class PasswordVerifier:
+    """Runs ``check_password_hash`` on a bounded pool of worker threads."""
+
+    def __init__(self, workers=AUTH_HASH_WORKERS, max_pending=AUTH_MAX_PENDING, timeout=AUTH_HASH_TIMEOUT):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='auth-hash')
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self.timeout = timeout
+        # Checked when no account matches, so unknown identifiers cost the same as wrong passwords
+        self._dummy_hash = generate_password_hash('medi-fusion-dummy-password')
+
+    def verify(self, pwhash, password):
+        """True if ``password`` matches ``pwhash`` (``None`` checks a dummy hash and fails)."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise AuthBusy("Login service is busy")
+        try:
+            future = self._executor.submit(check_password_hash, pwhash or self._dummy_hash, password)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout) and pwhash is not None
+        except FutureTimeout:
+            raise AuthBusy("Password check timed out") from None
+
+
+_verifier = None
+_limiter = None
+_singleton_lock = threading.Lock()
+
+
+def get_verifier():
+    """Return the process-wide password verifier, creating it on first use."""
+    global _verifier
+    if _verifier is None:
+        with _singleton_lock:
+            if _verifier is None:
+                _verifier = PasswordVerifier()
+    return _verifier
+
+
+def get_limiter():
+    """Return the process-wide login rate limiter, creating it on first use."""
+    global _limiter
+    if _limiter is None:
+        with _singleton_lock:
+            if _limiter is None:
+                _limiter = TokenBucketLimiter()
+    return _limiter
+
+
+def authenticate(cur, table, identifier, password):
+    """Check a login; returns the account row or ``None``.
+
+    Raises ``AmbiguousAccount``, ``AuthBusy``, or ``RateLimited`` with the
+    seconds to wait.
+    """
+    retry_after = get_limiter().acquire((table, identifier.strip().lower()))
+    if retry_after:
+        raise RateLimited(retry_after)
+    account = find_account(cur, table, identifier)
+    if not get_verifier().verify(account['password'] if account else None, password):
+        return None
+    return account
@@ -0,0 +1,142 @@
+"""Insert throughput and index size of consulting ID schemes on MariaDB.
+
+Creates a scratch database with one copy of the ``appointment`` table per
+scheme and loads each with the same number of rows, in batches, from
+several concurrent writers. Reports rows/s, the size of the
+``consulting_id`` unique index and how many inserts failed on a duplicate
+ID. ``uuid8`` is the old ``str(uuid.uuid4())[:8]``; ``snowflake`` is
+``consulting_ids``. Random keys spread inserts over the whole index, so
+its pages split and fill to about half; time-ordered keys append to the
+right-most page.
+
+    python bench_consulting_ids.py                       # 1M rows per scheme
+    python bench_consulting_ids.py --rows 5000000 --writers 8 --keep
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+import MySQLdb
+
+import consulting_ids
+
+TABLE_DDL = """
+    CREATE TABLE `{table}` (
+      `appointment_id` int(11) NOT NULL AUTO_INCREMENT,
+      `consulting_id` varchar(20) NOT NULL,
+      `patient_id` int(11) NOT NULL,
+      `doctor_id` int(11) NOT NULL,
+      `appointment_time` datetime NOT NULL,
+      `status` enum('Pending','Approved','Rejected') DEFAULT 'Pending',
+      PRIMARY KEY (`appointment_id`),
+      UNIQUE KEY `consulting_id` (`consulting_id`)
+    ) ENGINE=InnoDB DEFAULT CHARSET=latin1
+"""
+
+
+def uuid8_ids():
+    return lambda: str(uuid.uuid4())[:8]
+
+
+def snowflake_ids(path):
+    generator = consulting_ids.ConsultingIdGenerator(path=path)
+    return generator.next_id
+
+
+def load(connect, table, make_ids, rows, writers, batch):
+    """Insert ``rows`` rows from ``writers`` threads; returns ``(seconds, duplicate_errors)``."""
+    per_writer = rows // writers
+    duplicates = [0] * writers
+
+    def write(n):
+        conn = connect()
+        cur = conn.cursor()
+        next_id = make_ids()
+        sql = (f"INSERT INTO `{table}` (consulting_id, patient_id, doctor_id, appointment_time) "
+               f"VALUES (%s, 1, 1, NOW())")
+        for offset in range(0, per_writer, batch):
+            ids = [next_id() for _ in range(min(batch, per_writer - offset))]
+            try:
+                cur.executemany(sql, [(i,) for i in ids])
+                conn.commit()
+            except MySQLdb.IntegrityError:
+                # What the booking route would surface: retry the batch row by row
+                conn.rollback()
+                for i in ids:
+                    try:
+                        cur.execute(sql, (i,))
+                    except MySQLdb.IntegrityError:
+                        duplicates[n] += 1
+                conn.commit()
+        conn.close()
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, sum(duplicates)
+
+
+def index_size(cur, db, table):
+    cur.execute(f"ANALYZE TABLE `{table}`")
+    cur.fetchall()
+    cur.execute("SELECT stat_value * @@innodb_page_size FROM mysql.innodb_index_stats "
+                "WHERE database_name = %s AND table_name = %s AND index_name = 'consulting_id' "
+                "AND stat_name = 'size'", (db, table))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--user', default='root')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--db', default='medi_id_bench')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--keep', action='store_true', help="leave the scratch database in place")
+    args = parser.parse_args()
+
+    def connect(db=args.db):
+        return MySQLdb.connect(host=args.host, user=args.user, passwd=args.password, db=db)
+
+    admin = MySQLdb.connect(host=args.host, user=args.user, passwd=args.password, autocommit=True)
+    cur = admin.cursor()
+    cur.execute(f"DROP DATABASE IF EXISTS `{args.db}`")
+    cur.execute(f"CREATE DATABASE `{args.db}`")
+    cur.execute(f"USE `{args.db}`")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        lease_path = os.path.join(tmp, 'leases.sqlite3')
+        schemes = {'uuid8': uuid8_ids, 'snowflake': lambda: snowflake_ids(lease_path)}
+
+        start = time.perf_counter()
+        generate = schemes['snowflake']()
+        for _ in range(100_000):
+            generate()
+        print(f"snowflake generator: {100_000 / (time.perf_counter() - start):,.0f} ids/s in one thread")
+
+        try:
+            print(f"{'scheme':<10} {'rows/s':>10} {'index MB':>9} {'duplicates':>10}")
+            for name, make_ids in schemes.items():
+                table = f"appointment_{name}"
+                cur.execute(TABLE_DDL.format(table=table))
+                seconds, duplicates = load(connect, table, make_ids, args.rows, args.writers, args.batch)
+                size = index_size(cur, args.db, table)
+                size_mb = f"{size / 1024 / 1024:9.1f}" if size is not None else f"{'?':>9}"
+                print(f"{name:<10} {args.rows / seconds:>10,.0f} {size_mb} {duplicates:>10}")
+        finally:
+            if not args.keep:
+                cur.execute(f"DROP DATABASE IF EXISTS `{args.db}`")
+            admin.close()
+
+
+if __name__ == '__main__':
+    main()
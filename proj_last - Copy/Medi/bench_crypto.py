@@ -0,0 +1,60 @@
+"""Throughput benchmark for stream_crypto (MB/s).
+
+Encrypts and decrypts a temporary file of random data in chunks and
+reports MB/s and peak RSS, which should stay near one chunk no matter how
+large the file is.
+
+    python bench_crypto.py                   # 256 MB, default chunk size
+    python bench_crypto.py --size-mb 1024 --chunk-kb 4096
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+import stream_crypto
+
+
+def _write_random(path, size, block=4 * 1024 * 1024):
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining:
+            n = min(block, remaining)
+            f.write(os.urandom(n))
+            remaining -= n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--chunk-kb', type=int, default=stream_crypto.DEFAULT_CHUNK_SIZE // 1024)
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    chunk_size = args.chunk_kb * 1024
+    key = stream_crypto.generate_key()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain, sealed, opened = (os.path.join(tmp, name) for name in ('plain', 'sealed', 'opened'))
+        _write_random(plain, size)
+
+        start = time.perf_counter()
+        stream_crypto.encrypt_file(plain, sealed, key, chunk_size)
+        encrypt_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        stream_crypto.decrypt_file(sealed, opened, key)
+        decrypt_s = time.perf_counter() - start
+
+        overhead = os.path.getsize(sealed) - size
+
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{args.size_mb} MB, {args.chunk_kb} KB chunks, container overhead {overhead} bytes")
+    print(f"encrypt {args.size_mb / encrypt_s:8.1f} MB/s")
+    print(f"decrypt {args.size_mb / decrypt_s:8.1f} MB/s")
+    print(f"max RSS {rss_mb:8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
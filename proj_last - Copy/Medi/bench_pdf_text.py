@@ -0,0 +1,55 @@
+"""Text-layer fast path vs full OCR on sample PDFs.
+
+For each PDF, times ``text_extraction.extract_text`` (text layer first,
+OCR only where needed) against ``pdf_pipeline.extract_pdf_text`` (every
+page rendered and OCR'd) and prints the page kinds and the speedup. The
+OCR side needs the inference server running.
+
+    python bench_pdf_text.py                      # every PDF in static/uploads
+    python bench_pdf_text.py report.pdf --no-baseline
+"""
+import argparse
+import glob
+import os
+import time
+from collections import Counter
+
+import pdf_pipeline
+import text_extraction
+
+UPLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads')
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pdfs', nargs='*')
+    parser.add_argument('--no-baseline', action='store_true', help="skip the OCR-every-page run")
+    args = parser.parse_args()
+
+    pdfs = args.pdfs or sorted(glob.glob(os.path.join(UPLOADS_DIR, '**', '*.pdf'), recursive=True))
+    total_fast = total_ocr = 0.0
+    print(f"{'file':<40} {'pages':>5} {'kinds':<24} {'fast s':>8} {'ocr s':>8} {'speedup':>8}")
+    for path in pdfs:
+        pages, fast_s = _timed(lambda p: list(text_extraction.extract_pages(p)), path)
+        kinds = Counter(page.kind for page in pages)
+        total_fast += fast_s
+        ocr_s = speedup = None
+        if not args.no_baseline:
+            _, ocr_s = _timed(pdf_pipeline.extract_pdf_text, path)
+            total_ocr += ocr_s
+            speedup = ocr_s / fast_s if fast_s else float('inf')
+        print(f"{os.path.basename(path)[:40]:<40} {len(pages):>5} "
+              f"{', '.join(f'{k}={n}' for k, n in sorted(kinds.items())):<24} {fast_s:>8.2f} "
+              + (f"{ocr_s:>8.2f} {speedup:>7.1f}x" if ocr_s is not None else f"{'-':>8} {'-':>8}"))
+    if pdfs and not args.no_baseline and total_fast:
+        print(f"total: fast {total_fast:.2f}s, full OCR {total_ocr:.2f}s, {total_ocr / total_fast:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
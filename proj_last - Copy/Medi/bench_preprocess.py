@@ -0,0 +1,99 @@
+"""OCR latency and text agreement with and without pre-processing.
+
+Runs EasyOCR in-process on each sample image, once on the decoded
+original and once after ``preprocess.preprocess``, and reports both
+latencies, the pre-processing stage timings and how closely the two texts
+agree (word-level F1 and character sequence ratio). Agreement near 1.0
+with lower latency means the smaller image lost nothing the recogniser
+needed.
+
+    python bench_preprocess.py                     # sample images in static/uploads
+    python bench_preprocess.py photo.jpg --repeat 3
+"""
+import argparse
+import glob
+import os
+import re
+import time
+from collections import Counter
+from difflib import SequenceMatcher
+
+import image_ingest
+import ocr_engine
+import preprocess
+
+UPLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads')
+IMAGE_PATTERNS = ('*.png', '*.jpg', '*.jpeg')
+
+
+def sample_images():
+    paths = []
+    for pattern in IMAGE_PATTERNS:
+        paths += glob.glob(os.path.join(UPLOADS_DIR, pattern))
+    # Annotated copies are outputs of earlier runs, not inputs
+    return sorted(p for p in paths if not p.rsplit('.', 1)[0].endswith(('_annotated', '_thumb')))
+
+
+def words(texts):
+    return re.findall(r'\w+', ' '.join(texts).lower())
+
+
+def agreement(reference, candidate):
+    """``(word F1, sequence ratio)`` of two OCR outputs."""
+    ref, cand = words(reference), words(candidate)
+    if not ref and not cand:
+        return 1.0, 1.0
+    common = sum((Counter(ref) & Counter(cand)).values())
+    f1 = 2 * common / (len(ref) + len(cand))
+    return f1, SequenceMatcher(None, ' '.join(ref), ' '.join(cand), autojunk=False).ratio()
+
+
+def best_of(repeat, fn, *args):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('images', nargs='*')
+    parser.add_argument('--repeat', type=int, default=1, help="report the best of N runs")
+    args = parser.parse_args()
+
+    pool = ocr_engine.get_pool()
+    pool.warm_up()
+    paths = args.images or sample_images()
+
+    def original_ocr(img):
+        return pool.readtext(img, detail=0)
+
+    def prepared_ocr(img):
+        prepared = preprocess.preprocess(img)
+        return prepared, pool.readtext(prepared.image, detail=0)
+
+    totals = [0.0, 0.0]
+    print(f"{'image':<36} {'pixels':>14} {'after':>12} {'orig s':>7} {'prep s':>7} {'F1':>5} {'ratio':>5}")
+    for path in paths:
+        img = image_ingest.decode_file(path)
+        orig_s, orig_text = best_of(args.repeat, original_ocr, img)
+        prep_s, (prepared, prep_text) = best_of(args.repeat, prepared_ocr, img)
+        f1, ratio = agreement(orig_text, prep_text)
+        totals[0] += orig_s
+        totals[1] += prep_s
+        h, w = img.shape[:2]
+        ph, pw = prepared.image.shape[:2]
+        print(f"{os.path.basename(path)[:36]:<36} {f'{w}x{h}':>14} {f'{pw}x{ph}':>12} "
+              f"{orig_s:>7.2f} {prep_s:>7.2f} {f1:>5.2f} {ratio:>5.2f}")
+
+    if paths:
+        print(f"total: original {totals[0]:.2f}s, pre-processed {totals[1]:.2f}s "
+              f"({totals[0] / totals[1]:.1f}x)")
+        print("pre-processing stages (avg ms):",
+              ", ".join(f"{stage} {ms:.1f}" for stage, ms in preprocess.metrics()['avg_ms'].items()))
+
+
+if __name__ == '__main__':
+    main()
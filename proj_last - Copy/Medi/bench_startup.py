@@ -0,0 +1,66 @@
+"""Measure cold import time and RSS of a web worker.
+
+Each measurement runs in a fresh interpreter so nothing is already cached
+in ``sys.modules``. ``app2`` is the module as a gunicorn worker imports it
+today; ``eager`` reproduces the old module-level imports and summarizer
+construction for comparison.
+
+    python bench_startup.py              # app2 vs eager, 3 runs each
+    python bench_startup.py app2 -n 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ['transformers', 'torch', 'easyocr', 'cv2', 'pytesseract', 'matplotlib', 'numpy', 'scipy']
+
+TARGETS = {
+    'app2': "import app2",
+    'eager': (
+        "import app2, cv2, pytesseract, easyocr\n"
+        "import matplotlib.pyplot\n"
+        "from transformers import pipeline\n"
+        "pipeline('summarization', model='facebook/bart-large-cnn')"
+    ),
+}
+
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+exec(compile({code!r}, '<bench>', 'exec'))
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy_loaded': [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure(target):
+    code = _PROBE.format(code=TARGETS[target], heavy=HEAVY_MODULES)
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.run([sys.executable, '-c', code], cwd=here, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"{target} failed to import:\n{out.stderr}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('targets', nargs='*', default=['app2', 'eager'], choices=sorted(TARGETS))
+    parser.add_argument('-n', '--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    for target in args.targets:
+        runs = [measure(target) for _ in range(args.runs)]
+        seconds = sorted(r['seconds'] for r in runs)
+        rss = max(r['max_rss_mb'] for r in runs)
+        print(f"{target:6s} import {seconds[len(seconds) // 2]:7.2f}s (median of {args.runs})  "
+              f"max RSS {rss:8.1f} MB  heavy modules: {', '.join(runs[0]['heavy_loaded']) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""EXPLAIN regression check for the dashboard queries on a seeded MariaDB.
+
+Loads ``hospital_db.sql`` into a scratch database, seeds it with enough
+appointments that the optimizer's choices are realistic, then EXPLAINs the
+doctor dashboard and admin list queries. Exits non-zero if a query stops
+using its intended index, needs a filesort, or (for the doctor dashboard)
+stops being answered from the covering index.
+
+    python check_query_plans.py                      # 200k appointments
+    python check_query_plans.py --appointments 1000000 --keep
+"""
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+
+import MySQLdb
+import MySQLdb.cursors
+
+import admin_reports
+import dashboard_queries
+
+SCHEMA_PATH = 'hospital_db.sql'
+STATUSES = ('Pending', 'Approved', 'Rejected')
+
+
+def load_schema(cur, path=SCHEMA_PATH):
+    with open(path, encoding='utf-8') as f:
+        lines = [line for line in f if not line.startswith('--')]
+    for statement in ''.join(lines).split(';\n'):
+        if statement.strip():
+            cur.execute(statement)
+
+
+def seed(cur, appointments, doctors, patients, batch=5000):
+    cur.executemany("INSERT INTO doctor (name, email, specialization) VALUES (%s, %s, %s)",
+                    [(f"doctor{i}", f"doctor{i}@seed.test", 'General') for i in range(doctors)])
+    cur.executemany("INSERT INTO patient (name, email) VALUES (%s, %s)",
+                    [(f"patient{i}", f"patient{i}@seed.test") for i in range(patients)])
+    cur.execute("SELECT doctor_id FROM doctor")
+    doctor_ids = [row['doctor_id'] for row in cur.fetchall()]
+    cur.execute("SELECT patient_id FROM patient")
+    patient_ids = [row['patient_id'] for row in cur.fetchall()]
+
+    rng = random.Random(42)
+    start = datetime.now() - timedelta(days=365)
+    # A few busy doctors hold most of the appointments, as in practice
+    weights = [10 if i < 3 else 1 for i in range(len(doctor_ids))]
+    for offset in range(0, appointments, batch):
+        rows = []
+        for n in range(offset, min(offset + batch, appointments)):
+            rows.append((f"S{n:012d}", rng.choice(patient_ids), rng.choices(doctor_ids, weights)[0],
+                         start + timedelta(minutes=rng.randrange(2 * 365 * 24 * 60)),
+                         rng.choice(STATUSES), rng.choice((0, 0, 1, 2))))
+        cur.executemany("INSERT INTO appointment (consulting_id, patient_id, doctor_id, appointment_time, "
+                        "status, document_count) VALUES (%s, %s, %s, %s, %s, %s)", rows)
+    cur.execute("ANALYZE TABLE appointment, patient, doctor")
+    cur.fetchall()
+    return doctor_ids[0]
+
+
+def explain(cur, sql, params):
+    cur.execute("EXPLAIN " + sql, params)
+    return cur.fetchall()
+
+
+def check_plan(label, plan, keys, covering=False):
+    """Return a list of problems with the ``appointment`` row of an EXPLAIN."""
+    problems = []
+    row = next((r for r in plan if r['table'] in ('a', 'appointment')), None)
+    extra = (row or {}).get('Extra') or ''
+    if row is None or row['key'] not in keys:
+        problems.append(f"{label}: uses key {row and row['key']!r}, expected one of {sorted(keys)}")
+    if 'filesort' in extra:
+        problems.append(f"{label}: needs a filesort ({extra})")
+    if covering and 'Using index' not in extra.replace('Using index condition', ''):
+        problems.append(f"{label}: not answered from the covering index ({extra})")
+    for other in plan:
+        if other['table'] == 'p' and other['type'] != 'eq_ref':
+            problems.append(f"{label}: patient join is {other['type']}, expected eq_ref")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--user', default='root')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--db', default='medi_plan_check')
+    parser.add_argument('--appointments', type=int, default=200_000)
+    parser.add_argument('--doctors', type=int, default=50)
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--keep', action='store_true', help="leave the scratch database in place")
+    args = parser.parse_args()
+
+    conn = MySQLdb.connect(host=args.host, user=args.user, passwd=args.password, autocommit=True)
+    cur = conn.cursor(MySQLdb.cursors.DictCursor)
+    cur.execute(f"DROP DATABASE IF EXISTS `{args.db}`")
+    cur.execute(f"CREATE DATABASE `{args.db}`")
+    cur.execute(f"USE `{args.db}`")
+    problems = []
+    try:
+        load_schema(cur)
+        doctor_id = seed(cur, args.appointments, args.doctors, args.patients)
+        after = (datetime.now(), 10**9)
+
+        for window in dashboard_queries.WINDOWS:
+            for cursor in (None, after):
+                label = f"doctor_dashboard {window}{' +cursor' if cursor else ''}"
+                plan = explain(cur, *dashboard_queries.page_query(doctor_id, window, cursor))
+                problems += check_plan(label, plan, {'doctor_status_time'}, covering=True)
+
+        admin_cases = {
+            'admin all': ({}, {'appointment_time'}),
+            'admin status': ({'status': 'Pending'}, {'status_time'}),
+            'admin doctor': ({'doctor_id': doctor_id}, {'doctor_time', 'doctor_status_time'}),
+            'admin doctor+status': ({'doctor_id': doctor_id, 'status': 'Approved'}, {'doctor_status_time'}),
+        }
+        for label, (filters, keys) in admin_cases.items():
+            problems += check_plan(label, explain(cur, *admin_reports.page_query(filters, after)), keys)
+    finally:
+        if not args.keep:
+            cur.execute(f"DROP DATABASE IF EXISTS `{args.db}`")
+        conn.close()
+
+    for problem in problems:
+        print("FAIL", problem)
+    if problems:
+        sys.exit(1)
+    print(f"all query plans OK ({args.appointments} appointments)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Delete stored blobs that nothing references any more.
+
+An uploaded blob is referenced by its ``appointment_documents`` rows
+(``content_hash``), or through the stored path in a row written before
+content hashes existed; annotated copies and thumbnails are referenced by
+the cached pipeline results that list them. Blobs outside that set, and
+not linked within the grace period, are deleted together with their keys.
+
+    python collect_blobs.py --dry-run
+    python collect_blobs.py --grace 86400
+"""
+import argparse
+
+import db
+import document_pipeline
+import ocr_cache
+import secure_storage
+
+
+def referenced_hashes(conn, store):
+    """Content hashes the database and the result cache still point at."""
+    cur = conn.cursor()
+    cur.execute("SELECT DISTINCT content_hash FROM appointment_documents WHERE content_hash IS NOT NULL")
+    hashes = {row[0] for row in cur.fetchall()}
+    cur.execute("SELECT document_path FROM appointment_documents WHERE content_hash IS NULL "
+                "UNION SELECT document_path FROM appointment WHERE document_path IS NOT NULL")
+    paths = [row[0] for row in cur.fetchall()]
+    cur.close()
+    for path in paths:
+        info = store.info(path)
+        if info is not None:
+            hashes.add(info['sha256'])
+    for result in ocr_cache.get_cache().results():
+        hashes.update(document_pipeline.artifact_hashes(result))
+    return hashes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--user', default='root')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--db', default='hospital')
+    parser.add_argument('--grace', type=float, default=secure_storage.STORAGE_COLLECT_GRACE,
+                        help="keep blobs linked within this many seconds")
+    parser.add_argument('--dry-run', action='store_true', help="only list what would be deleted")
+    args = parser.parse_args()
+
+    pool = db.ConnectionPool({'host': args.host, 'user': args.user, 'passwd': args.password,
+                              'db': args.db, 'autocommit': False}, size=1)
+    store = secure_storage.get_store()
+    with pool.connection() as conn:
+        referenced = referenced_hashes(conn, store)
+    doomed = store.collect(referenced, grace=args.grace, dry_run=args.dry_run)
+    for sha256 in doomed:
+        print(("unreferenced: " if args.dry_run else "deleted: ") + sha256)
+    stats = store.stats()
+    print(f"{len(doomed)} blobs {'unreferenced' if args.dry_run else 'deleted'}; "
+          f"store holds {stats['blobs']} blobs ({stats['blob_bytes'] / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""Time-ordered, collision-free consulting IDs.
+
+IDs are 63-bit Snowflake-style integers -- milliseconds since
+``CONSULTING_ID_EPOCH`` (41 bits), a worker number (10 bits) and a
+per-millisecond sequence (12 bits) -- written as 13 Crockford base32
+characters plus a mod-37 check symbol, e.g. ``0A8H8N4ZR0000X``. The text is
+fixed width and Crockford's alphabet is in ASCII order, so IDs sort by
+creation time and new rows append to the right edge of the
+``consulting_id`` index instead of landing on random pages.
+
+Worker numbers make IDs unique across processes without coordinating each
+ID: the high ``CONSULTING_ID_HOST_BITS`` come from ``CONSULTING_ID_HOST``
+(give every app host its own), the rest are leased per process from a
+SQLite table, with leases of dead processes reclaimed. The lease also
+records how far ahead its holder may have issued IDs, so a successor on
+the same worker number never reuses a timestamp even if the clock stepped
+back across the restart.
+"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+CONSULTING_ID_DB_PATH = os.environ.get(
+    'CONSULTING_ID_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'consulting_ids.sqlite3'))
+CONSULTING_ID_HOST = int(os.environ.get('CONSULTING_ID_HOST', '0'))
+CONSULTING_ID_HOST_BITS = 3
+# Milliseconds of IDs a worker may issue before re-recording its high-water mark
+CONSULTING_ID_RESERVE_MS = 10_000
+
+CONSULTING_ID_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+TIME_BITS = 41
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+LOCAL_WORKERS = 1 << (WORKER_BITS - CONSULTING_ID_HOST_BITS)
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+# Crockford's extra check symbols for remainders 32..36
+CHECK_ALPHABET = ALPHABET + '*~$=U'
+BODY_LENGTH = 13
+ID_LENGTH = BODY_LENGTH + 1
+
+_EPOCH_MS = int(CONSULTING_ID_EPOCH.timestamp() * 1000)
+_DECODE = {c: i for i, c in enumerate(ALPHABET)}
+_DECODE.update({'O': 0, 'I': 1, 'L': 1})
+
+
+class InvalidConsultingId(ValueError):
+    """Not a well-formed consulting ID, or its check symbol does not match."""
+
+
+class WorkerLeaseError(RuntimeError):
+    """Every local worker number is held by a live process."""
+
+
+def _now_ms():
+    return time.time_ns() // 1_000_000 - _EPOCH_MS
+
+
+def _check(body):
+    value = 0
+    for c in body:
+        value = value * 32 + _DECODE[c]
+    return value % 37
+
+
+def encode(value):
+    """The check-symbol-suffixed text form of an ID integer."""
+    chars = []
+    for _ in range(BODY_LENGTH):
+        chars.append(ALPHABET[value & 31])
+        value >>= 5
+    body = ''.join(reversed(chars))
+    return body + CHECK_ALPHABET[_check(body)]
+
+
+def normalize(text):
+    """Canonical form of a typed ID: upper case, no separators, O/I/L read as 0/1/1."""
+    text = text.strip().upper().replace('-', '').replace(' ', '')
+    if len(text) != ID_LENGTH:
+        raise InvalidConsultingId(f"consulting IDs are {ID_LENGTH} characters")
+    body, check = text[:-1], text[-1]
+    try:
+        body = ''.join(ALPHABET[_DECODE[c]] for c in body)
+    except KeyError:
+        raise InvalidConsultingId("consulting ID contains an invalid character") from None
+    check = {'O': '0', 'I': '1', 'L': '1'}.get(check, check)
+    if check not in CHECK_ALPHABET or CHECK_ALPHABET.index(check) != _check(body):
+        raise InvalidConsultingId("consulting ID check symbol does not match; check for a typo")
+    return body + check
+
+
+def decode(text):
+    """``(created_at, worker, sequence)`` of an ID."""
+    body = normalize(text)[:-1]
+    value = 0
+    for c in body:
+        value = value * 32 + _DECODE[c]
+    sequence = value & MAX_SEQUENCE
+    worker = (value >> SEQUENCE_BITS) & ((1 << WORKER_BITS) - 1)
+    ms = (value >> (SEQUENCE_BITS + WORKER_BITS)) + _EPOCH_MS
+    return datetime.fromtimestamp(ms / 1000, timezone.utc), worker, sequence
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WorkerLease:
+    """A local worker number held by this process, with its issued-ID high-water mark."""
+
+    def __init__(self, path=CONSULTING_ID_DB_PATH, host=CONSULTING_ID_HOST):
+        if not 0 <= host < 1 << CONSULTING_ID_HOST_BITS:
+            raise ValueError(f"CONSULTING_ID_HOST must be below {1 << CONSULTING_ID_HOST_BITS}")
+        self.path = path
+        self.host = host
+        self.pid = os.getpid()
+        self.owner = f"{socket.gethostname()}:{self.pid}"
+        with self._transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS id_leases (worker INTEGER PRIMARY KEY, owner TEXT, "
+                         "pid INTEGER, reserved_until INTEGER NOT NULL DEFAULT 0)")
+            self.local, self.reserved_until = self._claim(conn)
+        self.worker = (host << (WORKER_BITS - CONSULTING_ID_HOST_BITS)) | self.local
+
+    @contextmanager
+    def _transaction(self):
+        """``BEGIN IMMEDIATE`` transaction, so two processes never claim the same worker."""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _claim(self, conn):
+        leases = {worker: (pid, reserved) for worker, pid, reserved
+                  in conn.execute("SELECT worker, pid, reserved_until FROM id_leases")}
+        for worker in range(LOCAL_WORKERS):
+            pid, reserved = leases.get(worker, (None, 0))
+            if pid is None or not _pid_alive(pid):
+                conn.execute("INSERT OR REPLACE INTO id_leases (worker, owner, pid, reserved_until) "
+                             "VALUES (?, ?, ?, ?)", (worker, self.owner, self.pid, reserved))
+                return worker, reserved
+        raise WorkerLeaseError(f"all {LOCAL_WORKERS} consulting ID workers are leased")
+
+    def reserve(self, until_ms):
+        """Record that IDs up to ``until_ms`` may have been issued under this lease."""
+        with self._transaction() as conn:
+            conn.execute("UPDATE id_leases SET reserved_until = MAX(reserved_until, ?) WHERE worker = ?",
+                         (until_ms, self.local))
+        self.reserved_until = until_ms
+
+
+class ConsultingIdGenerator:
+    """Issues IDs for one worker number; thread-safe, and re-leases after a fork."""
+
+    def __init__(self, path=CONSULTING_ID_DB_PATH, host=CONSULTING_ID_HOST, reserve_ms=CONSULTING_ID_RESERVE_MS):
+        self.path = path
+        self.host = host
+        self.reserve_ms = reserve_ms
+        self._lock = threading.Lock()
+        self._lease = None
+        self._last_ms = -1
+        self._sequence = 0
+        self._issued = 0
+        self._clock_regressions = 0
+
+    def _ensure_lease(self):
+        # A forked child inherits the parent's lease; it must not share its worker number
+        if self._lease is None or self._lease.pid != os.getpid():
+            self._lease = WorkerLease(self.path, self.host)
+            self._last_ms = self._lease.reserved_until
+            self._sequence = MAX_SEQUENCE
+
+    def next_value(self):
+        with self._lock:
+            self._ensure_lease()
+            now = _now_ms()
+            if now > self._last_ms:
+                self._last_ms, self._sequence = now, 0
+            else:
+                if now < self._last_ms:
+                    self._clock_regressions += 1
+                # Same millisecond, or the clock went back: keep counting from the last one
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    self._last_ms, self._sequence = self._last_ms + 1, 0
+            if self._last_ms >= self._lease.reserved_until:
+                self._lease.reserve(self._last_ms + self.reserve_ms)
+            if self._last_ms >> TIME_BITS:
+                raise OverflowError("consulting ID timestamp space exhausted")
+            self._issued += 1
+            return (self._last_ms << (WORKER_BITS + SEQUENCE_BITS)) | (self._lease.worker << SEQUENCE_BITS) \
+                | self._sequence
+
+    def next_id(self):
+        return encode(self.next_value())
+
+    def stats(self):
+        with self._lock:
+            return {'worker': self._lease.worker if self._lease else None,
+                    'issued': self._issued, 'clock_regressions': self._clock_regressions}
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def get_generator():
+    """Return the process-wide consulting ID generator, creating it on first use."""
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                _generator = ConsultingIdGenerator()
+    return _generator
+
+
+def new_consulting_id():
+    return get_generator().next_id()
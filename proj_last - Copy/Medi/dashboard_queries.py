@@ -0,0 +1,74 @@
+"""Date-windowed, keyset-paginated appointment lists for the doctor dashboard.
+
+Every query is one range scan of the covering
+``doctor_status_time (doctor_id, status, appointment_time, patient_id,
+consulting_id, document_count)`` index followed by a primary-key lookup
+into ``patient``. Whether an appointment has documents comes from
+``appointment.document_count``, which ``upload_document`` maintains,
+instead of a correlated subquery per row.
+"""
+from datetime import datetime, time as dt_time, timedelta
+
+import admin_reports
+
+DASHBOARD_PAGE_SIZE = 25
+WINDOWS = ('today', 'upcoming', 'past')
+
+
+def window_bounds(window, now=None):
+    """``(start, end, descending)`` for a window; ``None`` bounds are open."""
+    now = now or datetime.now()
+    midnight = datetime.combine(now.date(), dt_time.min)
+    if window == 'today':
+        return midnight, midnight + timedelta(days=1), False
+    if window == 'upcoming':
+        return now, None, False
+    if window == 'past':
+        return None, midnight, True
+    raise ValueError(f"Unknown window {window!r}")
+
+
+def page_query(doctor_id, window, after=None, limit=DASHBOARD_PAGE_SIZE, status='Approved', now=None):
+    """SQL and parameters for one page; ``after`` is a decoded ``admin_reports`` cursor."""
+    start, end, descending = window_bounds(window, now)
+    where = ["a.doctor_id = %s", "a.status = %s"]
+    params = [doctor_id, status]
+    if start is not None:
+        where.append("a.appointment_time >= %s")
+        params.append(start)
+    if end is not None:
+        where.append("a.appointment_time < %s")
+        params.append(end)
+    if after is not None:
+        op = '<' if descending else '>'
+        where.append(f"(a.appointment_time {op} %s OR (a.appointment_time = %s AND a.appointment_id {op} %s))")
+        params.extend([after[0], after[0], after[1]])
+    order = 'DESC' if descending else 'ASC'
+    sql = f"""
+        SELECT
+            a.appointment_id,
+            a.consulting_id,
+            a.appointment_time,
+            a.status,
+            a.document_count,
+            a.document_count > 0 AS has_document,
+            p.patient_id,
+            p.name AS patient_name,
+            p.contact_number,
+            p.gender
+        FROM appointment a
+        JOIN patient p ON p.patient_id = a.patient_id
+        WHERE {' AND '.join(where)}
+        ORDER BY a.appointment_time {order}, a.appointment_id {order}
+        LIMIT %s
+    """
+    params.append(limit)
+    return sql, params
+
+
+def fetch_page(cur, doctor_id, window, after=None, limit=DASHBOARD_PAGE_SIZE, now=None):
+    """Return ``(appointments, next_cursor)``; ``next_cursor`` is ``None`` on the last page."""
+    cur.execute(*page_query(doctor_id, window, after, limit + 1, now=now))
+    rows = list(cur.fetchall())
+    next_cursor = admin_reports.encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
@@ -0,0 +1,293 @@
+"""Pooled MySQL access for the Flask apps.
+
+``PooledMySQL`` is a drop-in replacement for ``flask_mysqldb.MySQL``: routes
+keep using ``mysql.connection.cursor()`` and ``mysql.connection.commit()``,
+but the connection comes from a bounded, health-checked pool (like the
+``mysql2.createPool({connectionLimit: 10})`` used by ``server.js``) and is
+held for the whole request as a unit of work. ``commit()`` commits at once,
+so a route's side effects after it (flashes, cache invalidation, queued
+jobs) only happen once the data is durable; anything a route leaves
+uncommitted, including after an exception, is rolled back at teardown.
+Commits are not deferred to the end of the request: batching is the
+route's job, by writing all its rows and then committing once (as
+``upload_document`` does with one ``executemany``).
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import MySQLdb
+import MySQLdb.cursors
+
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+# Replace connections older than this, well under MySQL's default wait_timeout
+DB_POOL_RECYCLE = float(os.environ.get('DB_POOL_RECYCLE', '3600'))
+# Ping connections that sat idle longer than this before handing them out
+DB_PING_INTERVAL = float(os.environ.get('DB_PING_INTERVAL', '30'))
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within the pool timeout."""
+
+
+class _PooledConnection:
+    __slots__ = ('raw', 'created_at', 'last_used')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """Bounded pool of MySQLdb connections.
+
+    Connections are opened lazily up to ``size``. On checkout, idle
+    connections are pinged after ``ping_interval`` seconds and replaced
+    after ``recycle`` seconds, so server-side timeouts never reach a route.
+    """
+
+    def __init__(self, connect_kwargs, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 recycle=DB_POOL_RECYCLE, ping_interval=DB_PING_INTERVAL):
+        self.connect_kwargs = dict(connect_kwargs)
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+
+        self._idle = []
+        self._created = 0
+        self._cond = threading.Condition()
+
+        # Metrics
+        self._checkouts = 0
+        self._timeouts = 0
+        self._replaced = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._queries = 0
+        self._query_total = 0.0
+        self._query_max = 0.0
+
+    def _open(self):
+        return _PooledConnection(MySQLdb.connect(**self.connect_kwargs))
+
+    def _close(self, conn):
+        try:
+            conn.raw.close()
+        except MySQLdb.Error:
+            pass
+
+    def _healthy(self, conn):
+        now = time.monotonic()
+        if now - conn.created_at > self.recycle:
+            return False
+        if now - conn.last_used > self.ping_interval:
+            try:
+                conn.raw.ping()
+            except MySQLdb.Error:
+                return False
+        return True
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        conn = None
+        with self._cond:
+            while not self._idle and self._created >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No database connection available after {timeout:.1f}s "
+                                      f"(pool size {self.size})")
+                self._cond.wait(remaining)
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                self._created += 1
+
+        try:
+            if conn is not None and not self._healthy(conn):
+                self._close(conn)
+                conn = None
+                with self._cond:
+                    self._replaced += 1
+            if conn is None:
+                conn = self._open()
+        except BaseException:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def release(self, conn, discard=False):
+        """Return a connection; ``discard`` closes it instead (e.g. after a lost link)."""
+        if discard:
+            self._close(conn)
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            return
+        conn.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection outside a request: commit on success, roll back on error."""
+        conn = self.acquire()
+        try:
+            yield conn.raw
+            conn.raw.commit()
+        except BaseException as e:
+            discard = isinstance(e, MySQLdb.OperationalError)
+            if not discard:
+                conn.raw.rollback()
+            self.release(conn, discard=discard)
+            raise
+        self.release(conn)
+
+    def record_query(self, elapsed):
+        with self._cond:
+            self._queries += 1
+            self._query_total += elapsed
+            self._query_max = max(self._query_max, elapsed)
+
+    def check(self):
+        """Round-trip a ``SELECT 1``; returns True if the database answers."""
+        try:
+            with self.connection() as raw:
+                cur = raw.cursor()
+                cur.execute("SELECT 1")
+                cur.close()
+            return True
+        except (MySQLdb.Error, PoolTimeout):
+            return False
+
+    def metrics(self):
+        with self._cond:
+            in_use = self._created - len(self._idle)
+            return {
+                'pool_size': self.size,
+                'created': self._created,
+                'idle': len(self._idle),
+                'in_use': in_use,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'replaced': self._replaced,
+                'wait_avg_ms': 1000 * self._wait_total / self._checkouts if self._checkouts else 0.0,
+                'wait_max_ms': 1000 * self._wait_max,
+                'queries': self._queries,
+                'query_avg_ms': 1000 * self._query_total / self._queries if self._queries else 0.0,
+                'query_max_ms': 1000 * self._query_max,
+            }
+
+
+class TimedCursor:
+    """Cursor proxy that records execution time in the pool metrics."""
+
+    def __init__(self, cursor, pool):
+        self._cursor = cursor
+        self._pool = pool
+
+    def execute(self, query, args=None):
+        start = time.monotonic()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            self._pool.record_query(time.monotonic() - start)
+
+    def executemany(self, query, args):
+        start = time.monotonic()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            self._pool.record_query(time.monotonic() - start)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class RequestConnection:
+    """The connection a route sees: a pooled connection with timed cursors."""
+
+    def __init__(self, pooled, pool, cursorclass):
+        self._pooled = pooled
+        self._pool = pool
+        self._cursorclass = cursorclass
+
+    def cursor(self, cursorclass=None):
+        return TimedCursor(self._pooled.raw.cursor(cursorclass or self._cursorclass), self._pool)
+
+    def __getattr__(self, name):
+        return getattr(self._pooled.raw, name)
+
+
+class PooledMySQL:
+    """Flask extension exposing a request-scoped ``connection`` from a shared pool."""
+
+    def __init__(self, app=None):
+        self.pool = None
+        self._cursorclass = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        connect_kwargs = {
+            'host': config.get('MYSQL_HOST', 'localhost'),
+            'user': config.get('MYSQL_USER', 'root'),
+            'passwd': config.get('MYSQL_PASSWORD', ''),
+            'db': config.get('MYSQL_DB'),
+            'port': config.get('MYSQL_PORT', 3306),
+            'charset': config.get('MYSQL_CHARSET', 'utf8'),
+            'autocommit': False,
+        }
+        connect_kwargs = {k: v for k, v in connect_kwargs.items() if v is not None}
+        self.pool = ConnectionPool(
+            connect_kwargs,
+            size=config.get('MYSQL_POOL_SIZE', DB_POOL_SIZE),
+            timeout=config.get('MYSQL_POOL_TIMEOUT', DB_POOL_TIMEOUT),
+            recycle=config.get('MYSQL_POOL_RECYCLE', DB_POOL_RECYCLE),
+            ping_interval=config.get('MYSQL_PING_INTERVAL', DB_PING_INTERVAL))
+        cursorclass = config.get('MYSQL_CURSORCLASS')
+        self._cursorclass = getattr(MySQLdb.cursors, cursorclass) if cursorclass else None
+
+        app.teardown_request(self._teardown)
+
+    @property
+    def connection(self):
+        from flask import g, has_request_context
+        if not has_request_context():
+            raise RuntimeError("mysql.connection is only available inside a request; "
+                               "use mysql.pool.connection() elsewhere")
+        if 'mysql_conn' not in g:
+            g.mysql_conn = RequestConnection(self.pool.acquire(), self.pool, self._cursorclass)
+        return g.mysql_conn
+
+    def _teardown(self, exc):
+        from flask import g
+        conn = g.pop('mysql_conn', None)
+        if conn is None:
+            return
+        discard = isinstance(exc, MySQLdb.OperationalError)
+        if not discard:
+            try:
+                # Drop anything left uncommitted (errors, or routes that never committed)
+                conn._pooled.raw.rollback()
+            except MySQLdb.Error:
+                discard = True
+        self.pool.release(conn._pooled, discard=discard)
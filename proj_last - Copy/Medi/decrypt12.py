@@ -3,14 +3,29 @@ from Crypto.Cipher import AES
 from Crypto.Util.Padding import unpad
 from PIL import Image
 import io
+import stream_crypto
 
 # Function to decrypt an image
-def decrypt_image(encrypted_data, key):
+def decrypt_image(encrypted_file, key):
+    prefix = encrypted_file.read(len(stream_crypto.MAGIC))
+    encrypted_file.seek(0)
+    if not stream_crypto.is_container(prefix):
+        return decrypt_legacy_image(encrypted_file.read(), key)
+
+    # Chunked AES-GCM container: verify and decrypt one chunk at a time
+    decrypted = io.BytesIO()
+    for block in stream_crypto.decrypt_iter(encrypted_file, key):
+        decrypted.write(block)
+    decrypted.seek(0)
+    return decrypted
+
+# Files encrypted before the streaming format: whole-file AES-CBC
+def decrypt_legacy_image(encrypted_data, key):
     iv = encrypted_data[:AES.block_size]
     encrypted_data = encrypted_data[AES.block_size:]
     cipher = AES.new(key, AES.MODE_CBC, iv)
     decrypted_data = unpad(cipher.decrypt(encrypted_data), AES.block_size)
-    return decrypted_data
+    return io.BytesIO(decrypted_data)
 
 # Streamlit app for decryption
 st.title("Image Decryption")
@@ -27,13 +42,10 @@ except ValueError:
 uploaded_file = st.file_uploader("Upload the encrypted image file", type=["bin"])
 
 if uploaded_file is not None and key:
-    # Read encrypted image data
-    encrypted_data = uploaded_file.read()
-
     try:
         # Decrypt image
-        decrypted_data = decrypt_image(encrypted_data, key)
-        decrypted_image = Image.open(io.BytesIO(decrypted_data))
+        decrypted_file = decrypt_image(uploaded_file, key)
+        decrypted_image = Image.open(decrypted_file)
         st.image(decrypted_image, caption="Decrypted Image", use_column_width=True)
         st.success("Image decrypted successfully!")
     except Exception as e:
@@ -0,0 +1,147 @@
+"""In-process cache of the doctor directory.
+
+The doctor list is read on every patient page but changes rarely, so each
+worker keeps a snapshot in memory. Snapshots expire after
+``DOCTOR_CACHE_TTL`` seconds and are also dropped whenever the ``doctor``
+row in ``cache_versions`` changes. Writers bump that stamp in the same
+transaction as their insert or update, so every gunicorn worker notices
+within ``DOCTOR_CACHE_VERSION_CHECK`` seconds, by way of a primary-key
+lookup rather than a full table read.
+"""
+import os
+import threading
+import time
+
+import MySQLdb
+
+DOCTOR_CACHE_TTL = float(os.environ.get('DOCTOR_CACHE_TTL', '300'))
+DOCTOR_CACHE_VERSION_CHECK = float(os.environ.get('DOCTOR_CACHE_VERSION_CHECK', '5'))
+DOCTOR_PAGE_SIZE = 20
+
+VERSION_KEY = 'doctor'
+COLUMNS = ('doctor_id', 'name', 'specialization', 'availability_status')
+
+
+def bump_version(cur):
+    """Mark the directory stale for every worker; call inside the writing transaction."""
+    cur.execute("INSERT INTO cache_versions (name, version) VALUES (%s, 1) "
+                "ON DUPLICATE KEY UPDATE version = version + 1", (VERSION_KEY,))
+
+
+class _Snapshot:
+    __slots__ = ('version', 'loaded_at', 'checked_at', 'doctors', 'by_id', 'specializations')
+
+    def __init__(self, version, doctors):
+        self.version = version
+        self.loaded_at = self.checked_at = time.monotonic()
+        self.doctors = doctors
+        self.by_id = {doctor['doctor_id']: doctor for doctor in doctors}
+        self.specializations = sorted({doctor['specialization'] for doctor in doctors if doctor['specialization']})
+
+
+class DoctorDirectory:
+    """Doctor list with TTL expiry, version-stamp invalidation and hit/miss counters."""
+
+    def __init__(self, ttl=DOCTOR_CACHE_TTL, version_check=DOCTOR_CACHE_VERSION_CHECK):
+        self.ttl = ttl
+        self.version_check = version_check
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._version_checks = 0
+
+    def _version(self, cur):
+        try:
+            cur.execute("SELECT version FROM cache_versions WHERE name = %s", (VERSION_KEY,))
+        except MySQLdb.Error:
+            # Schema without cache_versions: fall back to TTL-only expiry
+            return None
+        row = cur.fetchone()
+        if row is None:
+            return 0
+        return row['version'] if isinstance(row, dict) else row[0]
+
+    def _load(self, cur, version):
+        cur.execute(f"SELECT {', '.join(COLUMNS)} FROM doctor ORDER BY name, doctor_id")
+        rows = cur.fetchall()
+        doctors = tuple(row if isinstance(row, dict) else dict(zip(COLUMNS, row)) for row in rows)
+        return _Snapshot(version, doctors)
+
+    def _current(self, cur):
+        now = time.monotonic()
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and now - snapshot.loaded_at < self.ttl:
+                if now - snapshot.checked_at < self.version_check:
+                    self._hits += 1
+                    return snapshot
+                self._version_checks += 1
+                version = self._version(cur)
+                if version is not None and version == snapshot.version:
+                    snapshot.checked_at = now
+                    self._hits += 1
+                    return snapshot
+            else:
+                version = self._version(cur)
+            self._misses += 1
+            self._snapshot = self._load(cur, version)
+            return self._snapshot
+
+    def invalidate(self):
+        """Drop this worker's snapshot; other workers follow via ``bump_version``."""
+        with self._lock:
+            self._snapshot = None
+
+    def all(self, cur):
+        return list(self._current(cur).doctors)
+
+    def get(self, cur, doctor_id):
+        return self._current(cur).by_id.get(doctor_id)
+
+    def specializations(self, cur):
+        return list(self._current(cur).specializations)
+
+    def search(self, cur, query=None, specialization=None, page=1, per_page=DOCTOR_PAGE_SIZE):
+        """One page of doctors matching ``query`` (name or specialization) and ``specialization``.
+
+        Returns ``(doctors, total)``.
+        """
+        doctors = self._current(cur).doctors
+        if specialization:
+            specialization = specialization.lower()
+            doctors = [d for d in doctors if (d['specialization'] or '').lower() == specialization]
+        if query:
+            query = query.lower()
+            doctors = [d for d in doctors
+                       if query in d['name'].lower() or query in (d['specialization'] or '').lower()]
+        start = (max(1, page) - 1) * per_page
+        return list(doctors[start:start + per_page]), len(doctors)
+
+    def stats(self):
+        with self._lock:
+            snapshot = self._snapshot
+            lookups = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'version_checks': self._version_checks,
+                'version': snapshot.version if snapshot else None,
+                'doctors': len(snapshot.doctors) if snapshot else 0,
+                'age_seconds': time.monotonic() - snapshot.loaded_at if snapshot else None,
+            }
+
+
+_directory = None
+_directory_lock = threading.Lock()
+
+
+def get_directory():
+    """Return the process-wide doctor directory, creating it on first use."""
+    global _directory
+    if _directory is None:
+        with _directory_lock:
+            if _directory is None:
+                _directory = DoctorDirectory()
+    return _directory
@@ -0,0 +1,184 @@
+"""OCR -> clean_text -> summarize -> annotate pipeline for uploaded documents.
+
+PDFs are read through their text layer where they have one
+(``text_extraction``), so only scanned pages and embedded images are OCR'd.
+
+Kept free of Flask so it can run inside background worker processes. The
+models themselves live in the inference server; this module only talks to
+it through ``inference_client``. Documents and the annotated images and
+thumbnails derived from them are read and written through the encrypted
+``secure_storage`` layer; no plaintext copy touches the disk.
+"""
+import io
+import re
+
+import extractive_summary
+import inference_client
+import ocr_cache
+import ocr_engine
+import secure_storage
+import summary_engine
+import term_matcher
+import text_extraction
+
+# Bump when the pipeline output changes so stale cache entries are ignored
+PIPELINE_VERSION = (f"{ocr_engine.engine_version()}/{summary_engine.engine_version()}/"
+                    f"{extractive_summary.engine_version()}/7")
+
+OCR_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf'}
+# Images derived from each document; stored content-addressed and shared through the cache
+ARTIFACTS = ('annotated', 'thumbnail')
+
+
+def resolve_adaptive(document_path, adaptive=None):
+    """Whether a document is OCR'd in adaptive mode: ``None`` means ``OCR_ADAPTIVE``; PDFs never are.
+
+    Resolved once, where the request comes in, and sent to the inference
+    server as an explicit bool, so the server's own default never decides
+    a run whose result is cached under this process's version.
+    """
+    if document_path.lower().endswith('.pdf'):
+        return False
+    return bool(ocr_engine.OCR_ADAPTIVE if adaptive is None else adaptive)
+
+
+def pipeline_version(adaptive):
+    """Cache version for a run with adaptive OCR on or off (see ``resolve_adaptive``)."""
+    return PIPELINE_VERSION + ('/adaptive' if adaptive else '')
+
+
+def artifact_paths(document_path):
+    """Where a document's annotated copy and thumbnail are stored, next to the document."""
+    stem = document_path.rsplit('.', 1)[0]
+    return {'annotated_path': stem + '_annotated.png', 'thumbnail_path': stem + '_thumb.png'}
+
+
+def artifact_hashes(result):
+    """Content hashes of the stored images a cached result refers to."""
+    return [result[name + '_sha256'] for name in ARTIFACTS if result.get(name + '_sha256')]
+
+
+def clean_text(text):
+    """Basic OCR text cleanup."""
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\w\s.,;:!?()-]', '', text)
+    return text.strip()
+
+
+def _read_pdf(data):
+    """Text-layer-first extraction; the annotated copy and thumbnail show the first page."""
+    pages = list(text_extraction.extract_pages(data))
+    if not pages:
+        raise ValueError("PDF has no pages")
+    first = pages[0].lines
+    annotated = inference_client.annotate(text_extraction.render_png(data, 0),
+                                          [bbox for (bbox, _, _) in first], [text for (_, text, _) in first])
+    return {
+        'result': [line for page in pages for line in page.lines],
+        'annotated': annotated,
+        'thumbnail': text_extraction.render_png(data, 0, max_side=text_extraction.PDF_THUMBNAIL_SIZE),
+        'page_kinds': [page.kind for page in pages],
+    }
+
+
+def run_document_pipeline(appointment_id, document_path, adaptive=False):
+    """OCR, summarize and annotate a document; returns a JSON-serialisable dict.
+
+    ``adaptive`` switches two-pass adaptive-resolution OCR on or off for
+    images (see ``resolve_adaptive``).
+    """
+    store = secure_storage.get_store()
+
+    data = store.read_bytes(document_path)
+    if document_path.lower().endswith('.pdf'):
+        document = _read_pdf(data)
+    else:
+        # One decode on the server feeds OCR, the annotated copy and the thumbnail
+        document = inference_client.ocr_document(data, return_images=True, adaptive=bool(adaptive))
+    ocr_result = document['result']
+
+    paths = artifact_paths(document_path)
+    artifacts = {name: store.save(appointment_id, paths[name + '_path'], io.BytesIO(document[name]))['sha256']
+                 for name in ARTIFACTS}
+
+    lines = [text.strip() for (_, text, _) in ocr_result if len(text.strip()) > 5]
+    full_text = clean_text(" ".join(lines))
+
+    # Short documents get the near-instant extractive summary; longer ones go to BART
+    # (token-aware, batched, hierarchical for long records)
+    if len(full_text) > 20:
+        if len(full_text) <= extractive_summary.EXTRACTIVE_MAX_CHARS:
+            summary = extractive_summary.summarize(full_text)
+        else:
+            summary = inference_client.summarize(full_text)
+        overall_summary = summary.pop('summary')
+        summary_stats = summary
+    else:
+        overall_summary = "Not enough content to summarize."
+        summary_stats = None
+
+    # Take top 5 most relevant lines based on length
+    important_lines = sorted(lines, key=lambda x: len(x), reverse=True)[:5]
+
+    return {
+        'text': full_text,
+        'boxes': [bbox for (bbox, _, _) in ocr_result],
+        'texts': [text for (_, text, _) in ocr_result],
+        'confidences': [float(prob) for (_, _, prob) in ocr_result],
+        'summary': overall_summary,
+        'important_lines': important_lines,
+        'annotated_path': paths['annotated_path'],
+        'thumbnail_path': paths['thumbnail_path'],
+        # Lets another appointment with the same document link these images instead of redoing OCR
+        'annotated_sha256': artifacts['annotated'],
+        'thumbnail_sha256': artifacts['thumbnail'],
+        'summary_stats': summary_stats,
+        'page_kinds': document.get('page_kinds'),
+        'ocr_report': {key: document[key] for key in ('preprocess', 'adaptive') if key in document},
+        # Offsets index into 'text'
+        'medical_terms': term_matcher.get_matcher().extract(full_text),
+    }
+
+
+def cached_result(appointment_id, document_path, doc_hash=None, adaptive=False):
+    """Return the cached pipeline result for a document, or ``None``.
+
+    Results are shared by every appointment holding the same content: the
+    stored annotated copy and thumbnail are linked into this appointment's
+    paths (under its own key) instead of being recomputed.
+    """
+    store = secure_storage.get_store()
+    doc_hash = doc_hash or store.info(document_path)['sha256']
+    result = ocr_cache.get_cache().get(doc_hash, pipeline_version(adaptive))
+    if result is None:
+        return None
+
+    result.update(artifact_paths(document_path))
+    for name in ARTIFACTS:
+        path, sha256 = result[name + '_path'], result.get(name + '_sha256')
+        info = store.info(path)
+        if info is not None and info['appointment_id'] == appointment_id and info['sha256'] == sha256:
+            continue
+        # Entries from before images were content-addressed, or whose images were collected, are misses
+        if sha256 is None:
+            return None
+        try:
+            store.link(appointment_id, path, sha256)
+        except secure_storage.DocumentNotFound:
+            return None
+    return result
+
+
+def run_document_job(payload):
+    """Background job entry point: run the pipeline and fill the cache."""
+    appointment_id, document_path = payload['appointment_id'], payload['document_path']
+    doc_hash = payload.get('doc_hash') or secure_storage.get_store().info(document_path)['sha256']
+
+    # Payloads queued before the flag was resolved at enqueue time may still carry None
+    adaptive = resolve_adaptive(document_path, payload.get('adaptive'))
+
+    result = cached_result(appointment_id, document_path, doc_hash, adaptive)
+    if result is None:
+        result = run_document_pipeline(appointment_id, document_path, adaptive)
+        ocr_cache.get_cache().put(doc_hash, pipeline_version(adaptive), result)
+    return result
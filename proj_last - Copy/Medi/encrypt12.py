@@ -1,24 +1,21 @@
 import streamlit as st
-from Crypto.Cipher import AES
-from Crypto.Random import get_random_bytes
-from Crypto.Util.Padding import pad
-from PIL import Image
 import io
+import stream_crypto
 
-# Function to encrypt an image
-def encrypt_image(image_data, key):
-    cipher = AES.new(key, AES.MODE_CBC)
-    iv = cipher.iv
-    padded_data = pad(image_data, AES.block_size)
-    encrypted_data = cipher.encrypt(padded_data)
-    return iv + encrypted_data
+# Function to encrypt an image: stream it through chunked AES-GCM, keeping the original bytes
+def encrypt_image(image_file, key):
+    encrypted = io.BytesIO()
+    for block in stream_crypto.encrypt_iter(image_file, key):
+        encrypted.write(block)
+    encrypted.seek(0)
+    return encrypted
 
 # Streamlit app for encryption
 st.title("Image Encryption")
 
 # AES key generation
 if "key" not in st.session_state:
-    st.session_state["key"] = get_random_bytes(32)  # AES-256 key
+    st.session_state["key"] = stream_crypto.generate_key()  # AES-256 key
 
 # Display the encryption key
 st.subheader("Encryption Key")
@@ -29,17 +26,12 @@ st.code(encryption_key_hex, language="plaintext")
 uploaded_file = st.file_uploader("Upload an image for encryption", type=["jpg", "jpeg", "png"])
 
 if uploaded_file is not None:
-    # Read uploaded image
-    image = Image.open(uploaded_file)
-    st.image(image, caption="Uploaded Image", use_column_width=True)
-
-    # Convert image to bytes
-    image_bytes = io.BytesIO()
-    image.save(image_bytes, format=image.format)
-    image_data = image_bytes.getvalue()
+    # Show the uploaded image as-is (no decode/re-encode)
+    st.image(uploaded_file, caption="Uploaded Image", use_column_width=True)
 
     # Encrypt image
-    encrypted_image = encrypt_image(image_data, st.session_state["key"])
+    uploaded_file.seek(0)
+    encrypted_image = encrypt_image(uploaded_file, st.session_state["key"])
     st.success("Image encrypted successfully!")
 
     # Download encrypted image
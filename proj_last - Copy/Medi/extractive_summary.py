@@ -0,0 +1,120 @@
+"""Offline extractive summarization with sparse term-frequency scoring.
+
+A sentence's score is the sum, over its non-stopword tokens, of how often
+each token occurs in the whole document -- the scoring ``sample.py`` used
+to do with NLTK and dict loops. Here the text is tokenized once into a
+sparse sentence x term count matrix ``S``, the document's term frequencies
+are its column sums ``f``, and every score comes out of one ``S @ f``.
+``summarize_many`` stacks several documents into one block-diagonal
+matrix (a column per document and term) and scores them all with the same
+single product.
+
+No models or downloads are involved, so this is near-instant and is the
+default for documents too short to be worth a BART call. NumPy and SciPy
+are imported on first use, so importing this module (as the web app does
+through ``document_pipeline``) stays cheap.
+"""
+import os
+import re
+import time
+
+EXTRACTIVE_SENTENCES = int(os.environ.get('EXTRACTIVE_SENTENCES', '3'))
+# Documents up to this many characters skip BART (see document_pipeline)
+EXTRACTIVE_MAX_CHARS = int(os.environ.get('EXTRACTIVE_MAX_CHARS', '1000'))
+
+# NLTK's English stopword list, kept here so nothing is downloaded at run time
+STOPWORDS = frozenset("""
+a about above after again against ain all am an and any are aren aren't as at be because been before being below
+between both but by can couldn couldn't d did didn didn't do does doesn doesn't doing don don't down during each few
+for from further had hadn hadn't has hasn hasn't have haven haven't having he her here hers herself him himself his
+how i if in into is isn isn't it it's its itself just ll m ma me mightn mightn't more most mustn mustn't my myself
+needn needn't no nor not now o of off on once only or other our ours ourselves out over own re s same shan shan't she
+she's should should've shouldn shouldn't so some such t than that that'll the their theirs them themselves then there
+these they this those through to too under until up ve very was wasn wasn't we were weren weren't what when where
+which while who whom why will with won won't wouldn wouldn't y you you'd you'll you're you've your yours yourself
+yourselves
+""".split())
+
+# Sentence ends: terminal punctuation before whitespace, or a blank line
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+_WORD_RE = re.compile(r"[a-z0-9]+(?:['-][a-z0-9]+)*")
+
+
+def split_sentences(text):
+    return [s.strip() for s in _SENTENCE_END_RE.split(text) if s.strip()]
+
+
+def _term_matrix(documents):
+    """Block-diagonal sentence x (document, term) count matrix over all documents."""
+    import numpy as np
+    from scipy import sparse
+
+    tokens, lengths, owners = [], [], []
+    for doc_index, sentences in enumerate(documents):
+        for sentence in sentences:
+            words = [w for w in _WORD_RE.findall(sentence.lower()) if w not in STOPWORDS]
+            tokens.extend(words)
+            lengths.append(len(words))
+            owners.append(doc_index)
+    if not tokens:
+        return sparse.csr_matrix((len(lengths), 1))
+    # Term ids come from one sort of all tokens rather than a dict lookup per token
+    _, terms = np.unique(np.asarray(tokens), return_inverse=True)
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    # Giving each document its own copy of a term keeps documents from sharing frequencies
+    keys = np.asarray(owners, dtype=np.int64)[rows] * (terms.max() + 1) + terms.ravel()
+    _, cols = np.unique(keys, return_inverse=True)
+    counts = sparse.csr_matrix((np.ones(len(tokens)), (rows, cols.ravel())), shape=(len(lengths), cols.max() + 1))
+    # Duplicate (row, col) pairs are summed into counts
+    counts.sum_duplicates()
+    return counts
+
+
+def score_many(documents):
+    """Per-document sentence score arrays for lists of sentences."""
+    import numpy as np
+
+    counts = _term_matrix(documents)
+    # Column sums are each document's term frequencies; one product scores every sentence
+    frequencies = np.asarray(counts.sum(axis=0)).ravel()
+    scores = counts @ frequencies
+    bounds = np.cumsum([0] + [len(sentences) for sentences in documents])
+    return [scores[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _top(sentences, scores, num_sentences):
+    import numpy as np
+
+    # Highest score first, earlier sentence on ties; repeated sentences count once
+    chosen, seen = [], set()
+    for i in np.lexsort((np.arange(len(scores)), -scores)):
+        if scores[i] <= 0 or sentences[i] in seen:
+            continue
+        seen.add(sentences[i])
+        chosen.append(sentences[i])
+        if len(chosen) == num_sentences:
+            break
+    return ' '.join(chosen)
+
+
+def _summarize_documents(documents, num_sentences):
+    return [_top(sentences, scores, num_sentences)
+            for sentences, scores in zip(documents, score_many(documents))]
+
+
+def summarize_many(texts, num_sentences=EXTRACTIVE_SENTENCES):
+    """Extractive summaries of several texts, scored in one batch."""
+    return _summarize_documents([split_sentences(text) for text in texts], num_sentences)
+
+
+def summarize(text, num_sentences=EXTRACTIVE_SENTENCES):
+    """Extractive summary in the shape of ``summary_engine`` results (``summary`` plus stats)."""
+    start = time.monotonic()
+    sentences = split_sentences(text)
+    summary = _summarize_documents([sentences], num_sentences)[0]
+    return {'summary': summary, 'engine': 'extractive', 'sentences': len(sentences),
+            'seconds': time.monotonic() - start}
+
+
+def engine_version():
+    return f"extractive-{EXTRACTIVE_SENTENCES}s-{EXTRACTIVE_MAX_CHARS}c"
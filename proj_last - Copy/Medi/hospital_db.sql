@@ -34,19 +34,21 @@ CREATE TABLE `appointment` (
   `appointment_time` datetime NOT NULL,
   `document_path` varchar(255) DEFAULT NULL,
   `action` varchar(255) DEFAULT 'approve/reject',
-  `status` varchar(20) NOT NULL DEFAULT 'Pending'
+  `status` varchar(20) NOT NULL DEFAULT 'Pending',
+  `document_count` int(11) NOT NULL DEFAULT '0',
+  `slot` datetime DEFAULT NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=latin1;
 
 --
 -- Dumping data for table `appointment`
 --
 
-INSERT INTO `appointment` (`appointment_id`, `consulting_id`, `patient_id`, `doctor_id`, `appointment_time`, `document_path`, `action`, `status`) VALUES
-(1, '106bd55e', 1, 4, '2025-02-21 12:24:00', 'uploads/bg.png', 'Rejected', 'Rejected'),
-(2, 'ae03f7a5', 1, 4, '2025-10-03 13:00:00', 'uploads/project.pdf', 'Approved', 'Rejected'),
-(3, 'f965f784', 1, 4, '2222-02-01 12:22:00', 'uploads/6th_results.pdf', 'Approved', 'Pending'),
-(4, '2d2813d7', 1, 4, '1999-11-01 12:45:00', 'uploads/car.jpeg', 'Approved', 'Pending'),
-(5, '1c9f6d97', 1, 6, '1999-11-01 12:12:00', 'uploads/6th_results.pdf', 'Approved', 'Pending');
+INSERT INTO `appointment` (`appointment_id`, `consulting_id`, `patient_id`, `doctor_id`, `appointment_time`, `document_path`, `action`, `status`, `slot`) VALUES
+(1, '106bd55e', 1, 4, '2025-02-21 12:24:00', 'uploads/bg.png', 'Rejected', 'Rejected', NULL),
+(2, 'ae03f7a5', 1, 4, '2025-10-03 13:00:00', 'uploads/project.pdf', 'Approved', 'Rejected', NULL),
+(3, 'f965f784', 1, 4, '2222-02-01 12:22:00', 'uploads/6th_results.pdf', 'Approved', 'Pending', '2222-02-01 12:15:00'),
+(4, '2d2813d7', 1, 4, '1999-11-01 12:45:00', 'uploads/car.jpeg', 'Approved', 'Pending', '1999-11-01 12:45:00'),
+(5, '1c9f6d97', 1, 6, '1999-11-01 12:12:00', 'uploads/6th_results.pdf', 'Approved', 'Pending', '1999-11-01 12:00:00');
 
 -- --------------------------------------------------------
 
@@ -58,11 +60,30 @@ CREATE TABLE `appointment_documents` (
   `id` int(11) NOT NULL,
   `appointment_id` int(11) NOT NULL,
   `document_path` varchar(255) NOT NULL,
+  `content_hash` char(64) DEFAULT NULL,
   `uploaded_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
 ) ENGINE=InnoDB DEFAULT CHARSET=latin1;
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `cache_versions`
+--
+
+CREATE TABLE `cache_versions` (
+  `name` varchar(64) NOT NULL,
+  `version` bigint(20) NOT NULL DEFAULT '0'
+) ENGINE=InnoDB DEFAULT CHARSET=latin1;
+
+--
+-- Dumping data for table `cache_versions`
+--
+
+INSERT INTO `cache_versions` (`name`, `version`) VALUES
+('doctor', 1);
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `doctor`
 --
@@ -122,29 +143,42 @@ INSERT INTO `patient` (`patient_id`, `name`, `email`, `password`, `contact_numbe
 ALTER TABLE `appointment`
   ADD PRIMARY KEY (`appointment_id`),
   ADD UNIQUE KEY `consulting_id` (`consulting_id`),
+  ADD UNIQUE KEY `doctor_slot` (`doctor_id`,`slot`),
   ADD KEY `patient_id` (`patient_id`),
-  ADD KEY `doctor_id` (`doctor_id`);
+  ADD KEY `appointment_time` (`appointment_time`),
+  ADD KEY `status_time` (`status`,`appointment_time`),
+  ADD KEY `doctor_time` (`doctor_id`,`appointment_time`),
+  ADD KEY `doctor_status_time` (`doctor_id`,`status`,`appointment_time`,`patient_id`,`consulting_id`,`document_count`);
 
 --
 -- Indexes for table `appointment_documents`
 --
 ALTER TABLE `appointment_documents`
   ADD PRIMARY KEY (`id`),
-  ADD KEY `appointment_id` (`appointment_id`);
+  ADD KEY `appointment_id` (`appointment_id`),
+  ADD KEY `content_hash` (`content_hash`);
+
+--
+-- Indexes for table `cache_versions`
+--
+ALTER TABLE `cache_versions`
+  ADD PRIMARY KEY (`name`);
 
 --
 -- Indexes for table `doctor`
 --
 ALTER TABLE `doctor`
   ADD PRIMARY KEY (`doctor_id`),
-  ADD UNIQUE KEY `email` (`email`);
+  ADD UNIQUE KEY `email` (`email`),
+  ADD KEY `name` (`name`);
 
 --
 -- Indexes for table `patient`
 --
 ALTER TABLE `patient`
   ADD PRIMARY KEY (`patient_id`),
-  ADD UNIQUE KEY `email` (`email`);
+  ADD UNIQUE KEY `email` (`email`),
+  ADD KEY `name` (`name`);
 
 --
 -- AUTO_INCREMENT for dumped tables
@@ -0,0 +1,97 @@
+"""Decode-once image ingestion.
+
+A document is decoded a single time into an RGB numpy buffer, and OCR,
+annotation and thumbnails all work from that buffer. Files above
+``IMAGE_MMAP_THRESHOLD`` bytes are memory-mapped for decoding instead of
+being read into a Python ``bytes`` copy first. Nothing is written to disk
+except the artifacts the caller asks to keep.
+"""
+import mmap
+import os
+
+import cv2
+import numpy as np
+
+IMAGE_MMAP_THRESHOLD = int(os.environ.get('IMAGE_MMAP_THRESHOLD', str(8 * 1024 * 1024)))
+THUMBNAIL_SIZE = int(os.environ.get('THUMBNAIL_SIZE', '256'))
+
+BOX_COLOR = (0, 255, 0)
+TEXT_COLOR = (0, 0, 255)
+
+
+def _decode(buffer):
+    img = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Could not decode image data")
+    # cv2 decodes to BGR; convert in place so no second full-size buffer is made
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
+
+
+def decode_bytes(data):
+    """Decode encoded image bytes (PNG, JPEG, ...) into an RGB array."""
+    return _decode(np.frombuffer(data, dtype=np.uint8))
+
+
+def decode_file(path):
+    """Decode an image file into an RGB array, memory-mapping large files."""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < IMAGE_MMAP_THRESHOLD:
+            return decode_bytes(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            buffer = np.frombuffer(mapped, dtype=np.uint8)
+            try:
+                return _decode(buffer)
+            finally:
+                # The mmap cannot close while a numpy view still exports it
+                del buffer
+
+
+def load(image):
+    """Return an RGB array for a path, encoded bytes, PIL image or array."""
+    if isinstance(image, (str, os.PathLike)):
+        return decode_file(image)
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return decode_bytes(image)
+    img = np.asarray(image)
+    if img.ndim == 3 and img.shape[2] == 4:
+        img = np.ascontiguousarray(img[:, :, :3])
+    return img
+
+
+def annotate(img, boxes, texts=None, font_scale=0.6, thickness=2):
+    """Return a copy of ``img`` with OCR boxes and their text drawn on it."""
+    out = img.copy()
+    texts = texts or [''] * len(boxes)
+    for bbox, text in zip(boxes, texts):
+        top_left = tuple(int(val) for val in bbox[0])
+        bottom_right = tuple(int(val) for val in bbox[2])
+        cv2.rectangle(out, top_left, bottom_right, BOX_COLOR, 2)
+        cv2.putText(out, text, top_left, cv2.FONT_HERSHEY_SIMPLEX, font_scale, TEXT_COLOR, thickness)
+    return out
+
+
+def thumbnail(img, max_side=THUMBNAIL_SIZE):
+    """Downscale so the longer side is at most ``max_side`` pixels."""
+    height, width = img.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return img
+    return cv2.resize(img, (max(1, round(width * scale)), max(1, round(height * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def save(img, path):
+    """Write an RGB array to ``path`` (format chosen by extension)."""
+    bgr = cv2.cvtColor(img, cv2.COLOR_RGB2BGR) if img.ndim == 3 else img
+    if not cv2.imwrite(path, bgr):
+        raise ValueError(f"Could not write image to {path}")
+    return path
+
+
+def encode_png(img):
+    bgr = cv2.cvtColor(img, cv2.COLOR_RGB2BGR) if img.ndim == 3 else img
+    ok, png = cv2.imencode('.png', bgr)
+    if not ok:
+        raise ValueError("Could not encode image as PNG")
+    return png.tobytes()
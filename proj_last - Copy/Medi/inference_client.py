@@ -0,0 +1,132 @@
+"""Thin client for ``inference_server``.
+
+Callers use ``ocr``, ``summarize`` and ``annotate`` exactly as they would
+the in-process engines; the models themselves live in the server process.
+``ocr_document`` does OCR, annotation and thumbnailing from a single decode
+of the image on the server side. Files are sent as paths (the server is
+local); image bytes and arrays travel as raw binary parts (see
+``inference_wire``), never base64 inside JSON.
+"""
+import json
+import os
+import urllib.error
+import urllib.request
+
+import inference_wire
+
+INFERENCE_URL = os.environ.get('INFERENCE_URL', 'http://127.0.0.1:8765')
+INFERENCE_TIMEOUT = float(os.environ.get('INFERENCE_TIMEOUT', '300'))
+
+
+class InferenceError(Exception):
+    """The inference server rejected the request or failed while running it."""
+
+
+class InferenceUnavailable(InferenceError):
+    """The inference server could not be reached or is overloaded."""
+
+
+def _call(endpoint, body=None):
+    data, content_type = inference_wire.pack(body) if body is not None else (None, inference_wire.JSON_TYPE)
+    req = urllib.request.Request(INFERENCE_URL + endpoint, data=data, headers={'Content-Type': content_type})
+    try:
+        with urllib.request.urlopen(req, timeout=INFERENCE_TIMEOUT) as response:
+            return inference_wire.unpack(response.read(), response.headers.get('Content-Type'))
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read()).get('error', e.reason)
+        except ValueError:
+            message = e.reason
+        if e.code == 503:
+            raise InferenceUnavailable(message) from e
+        raise InferenceError(f"{endpoint} failed ({e.code}): {message}") from e
+    except (urllib.error.URLError, OSError) as e:
+        raise InferenceUnavailable(f"Inference server unreachable at {INFERENCE_URL}: {e}") from e
+
+
+def _image_fields(image):
+    """Encode a file path, encoded image bytes, PIL image or numpy array for the wire."""
+    if isinstance(image, (str, os.PathLike)):
+        return {'path': os.path.abspath(image)}
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return {'image': image}
+    import numpy as np
+    array = np.ascontiguousarray(np.asarray(image))
+    # Sent as the array's own buffer, without a copy until it is written to the socket body
+    return {'array': memoryview(array).cast('B'), 'dtype': array.dtype.str, 'shape': list(array.shape)}
+
+
+def _ocr_options(body, preprocess, adaptive):
+    # None leaves the server's OCR_PREPROCESS / OCR_ADAPTIVE setting in charge
+    if preprocess is not None:
+        body['preprocess'] = preprocess
+    if adaptive is not None:
+        body['adaptive'] = adaptive
+    return body
+
+
+def ocr(image, detail=1, preprocess=None, adaptive=None):
+    """EasyOCR ``readtext``: ``(bbox, text, confidence)`` tuples, or strings with ``detail=0``.
+
+    ``preprocess`` and ``adaptive`` override the server's ``OCR_PREPROCESS``
+    and ``OCR_ADAPTIVE`` settings for this call.
+    """
+    body = _ocr_options(_image_fields(image), preprocess, adaptive)
+    body['detail'] = detail
+    result = _call('/ocr', body)['result']
+    if not detail:
+        return result
+    return [(bbox, text, prob) for bbox, text, prob in result]
+
+
+def ocr_document(image, annotated_path=None, thumbnail_path=None, thumbnail_size=None,
+                 return_images=False, preprocess=None, adaptive=None):
+    """OCR ``image`` and optionally save its annotated copy and thumbnail.
+
+    Returns a dict with ``result`` (``(bbox, text, confidence)`` tuples),
+    the image ``shape`` and the paths that were written. With
+    ``return_images`` the annotated image and thumbnail are also returned
+    as PNG bytes under ``annotated`` and ``thumbnail``. The ``preprocess``
+    and ``adaptive`` reports are included when those stages ran.
+    """
+    body = _ocr_options(_image_fields(image), preprocess, adaptive)
+    body['return_images'] = return_images
+    if annotated_path is not None:
+        body['annotated_path'] = os.path.abspath(annotated_path)
+    if thumbnail_path is not None:
+        body['thumbnail_path'] = os.path.abspath(thumbnail_path)
+    if thumbnail_size is not None:
+        body['thumbnail_size'] = thumbnail_size
+    reply = _call('/document', body)
+    reply['result'] = [(bbox, text, prob) for bbox, text, prob in reply['result']]
+    for name in ('annotated', 'thumbnail'):
+        if name in reply:
+            reply[name] = bytes(reply[name])
+    return reply
+
+
+def summarize(text):
+    """Summarize ``text``; returns the ``summary_engine`` result dict."""
+    return _call('/summarize', {'text': text})
+
+
+def annotate(image, boxes, texts=None, output_path=None, font_scale=0.6, thickness=2):
+    """Draw OCR boxes and write them to ``output_path``.
+
+    Without ``output_path`` the annotated image is returned: a numpy array
+    when an array or PIL image was passed in, otherwise PNG bytes.
+    """
+    body = _image_fields(image)
+    body.update({'boxes': boxes, 'texts': texts, 'font_scale': font_scale, 'thickness': thickness})
+    if output_path is not None:
+        body['output_path'] = os.path.abspath(output_path)
+        return _call('/annotate', body)['output_path']
+    response = _call('/annotate', body)
+    if 'array' in response:
+        import numpy as np
+        return np.frombuffer(response['array'], dtype=response['dtype']).reshape(response['shape'])
+    return bytes(response['image'])
+
+
+def metrics():
+    return _call('/metrics')
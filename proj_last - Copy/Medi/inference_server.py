@@ -0,0 +1,302 @@
+"""Local inference server that owns the OCR and summarization models.
+
+Run one per machine (``python inference_server.py``); the Flask workers,
+job workers and Streamlit tools talk to it through ``inference_client``
+instead of loading EasyOCR and BART themselves, so model memory is paid
+once no matter how many web workers run.
+
+Summarize requests arriving within ``INFERENCE_BATCH_WAIT_MS`` of each
+other are merged and run through the summarizer together. OCR calls share
+the bounded reader pool from ``ocr_engine``, after the ``preprocess``
+stage has shrunk, levelled and cropped the image. Requests (or
+``OCR_ADAPTIVE``) can ask for the two-pass ``adaptive_ocr`` mode.
+Files named in a request are only read or written under
+``INFERENCE_FILE_ROOTS``; callers elsewhere send the image bytes instead.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import adaptive_ocr
+import image_ingest
+import inference_wire
+import ocr_engine
+import preprocess
+import summary_engine
+
+INFERENCE_HOST = os.environ.get('INFERENCE_HOST', '127.0.0.1')
+INFERENCE_PORT = int(os.environ.get('INFERENCE_PORT', '8765'))
+INFERENCE_BATCH_WAIT_MS = float(os.environ.get('INFERENCE_BATCH_WAIT_MS', '25'))
+INFERENCE_MAX_BATCH = int(os.environ.get('INFERENCE_MAX_BATCH', '8'))
+# Directories (os.pathsep-separated) that request paths may read from and write to
+INFERENCE_FILE_ROOTS = os.environ.get(
+    'INFERENCE_FILE_ROOTS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads'))
+
+_FILE_ROOTS = [os.path.realpath(root) for root in INFERENCE_FILE_ROOTS.split(os.pathsep) if root]
+
+
+def confined_path(path):
+    """Resolve a request path, refusing anything outside ``INFERENCE_FILE_ROOTS``."""
+    resolved = os.path.realpath(path)
+    if not any(os.path.commonpath([root, resolved]) == root for root in _FILE_ROOTS):
+        raise ValueError(f"Path is outside the inference file roots: {path}")
+    return resolved
+
+
+def decode_image(request):
+    """Decode the image in an OCR/annotate request body, once, into an RGB array."""
+    if 'path' in request:
+        return image_ingest.decode_file(confined_path(request['path']))
+    if 'array' in request:
+        import numpy as np
+        return image_ingest.load(np.frombuffer(request['array'], dtype=request['dtype']).reshape(request['shape']))
+    return image_ingest.decode_bytes(request['image'])
+
+
+def _encode_result(result, detail):
+    if not detail:
+        return list(result)
+    return [[[[int(x), int(y)] for (x, y) in bbox], text, float(prob)]
+            for (bbox, text, prob) in result]
+
+
+def _image_reply(img, request):
+    if 'array' in request:
+        # Hand arrays back as arrays so the caller keeps its channel order
+        import numpy as np
+        img = np.ascontiguousarray(img)
+        return {'array': memoryview(img).cast('B'), 'dtype': img.dtype.str, 'shape': list(img.shape)}
+    return {'image': image_ingest.encode_png(img)}
+
+
+def _readtext(img, request, detail=1):
+    """OCR ``img``, pre-processed unless the request opts out; boxes are in ``img`` pixels.
+
+    Returns ``(result, report)``; ``report`` describes the pre-processing
+    and adaptive passes that ran, or is ``None``.
+    """
+    report = {}
+    if request.get('preprocess', ocr_engine.OCR_PREPROCESS):
+        prepared = preprocess.preprocess(img)
+        report['preprocess'] = prepared.report()
+    else:
+        prepared = None
+    target = prepared.image if prepared is not None else img
+
+    if request.get('adaptive', ocr_engine.OCR_ADAPTIVE):
+        confidence = request.get('confidence', adaptive_ocr.ADAPTIVE_CONFIDENCE)
+        result, report['adaptive'] = adaptive_ocr.read(target, confidence)
+        _adaptive_stats.record(report['adaptive'])
+    elif prepared is not None or detail:
+        # Boxes are needed to map back even when the caller only wants text
+        result = ocr_engine.readtext(target, detail=1)
+    else:
+        return ocr_engine.readtext(target, detail=0), None
+
+    if prepared is not None:
+        result = prepared.map_boxes(result)
+    return (result if detail else [text for (_, text, _) in result]), report or None
+
+
+class AdaptiveStats:
+    """Running totals of adaptive OCR passes, for ``/metrics``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pages = 0
+        self._boxes = 0
+        self._reread = 0
+        self._improved = 0
+        self._area = 0.0
+
+    def record(self, report):
+        with self._lock:
+            self._pages += 1
+            self._boxes += report['boxes']
+            self._reread += report['reread']
+            self._improved += report['improved']
+            self._area += report['reread_area']
+
+    def metrics(self):
+        with self._lock:
+            return {'pages': self._pages, 'boxes': self._boxes, 'reread': self._reread,
+                    'improved': self._improved,
+                    'avg_reread_area': self._area / self._pages if self._pages else 0.0}
+
+
+_adaptive_stats = AdaptiveStats()
+
+
+def ocr(request):
+    detail = request.get('detail', 1)
+    result, report = _readtext(decode_image(request), request, detail)
+    reply = {'result': _encode_result(result, detail)}
+    reply.update(report or {})
+    return reply
+
+
+def annotate(request):
+    """Draw OCR boxes on an image; write it to ``output_path`` or return the result."""
+    img = image_ingest.annotate(decode_image(request), request['boxes'], request.get('texts'),
+                                request.get('font_scale', 0.6), request.get('thickness', 2))
+    if request.get('output_path'):
+        return {'output_path': image_ingest.save(img, confined_path(request['output_path']))}
+    return _image_reply(img, request)
+
+
+def document(request):
+    """OCR a document and write its annotated copy and thumbnail from one decode."""
+    img = decode_image(request)
+    result, report = _readtext(img, request)
+    reply = {'result': _encode_result(result, 1), 'shape': list(img.shape)}
+    reply.update(report or {})
+
+    if request.get('annotated_path') or request.get('return_images'):
+        annotated = image_ingest.annotate(img, [bbox for (bbox, _, _) in result],
+                                          [text for (_, text, _) in result])
+    if request.get('annotated_path'):
+        reply['annotated_path'] = image_ingest.save(annotated, confined_path(request['annotated_path']))
+    if request.get('thumbnail_path') or request.get('return_images'):
+        thumb = image_ingest.thumbnail(img, request.get('thumbnail_size', image_ingest.THUMBNAIL_SIZE))
+    if request.get('thumbnail_path'):
+        reply['thumbnail_path'] = image_ingest.save(thumb, confined_path(request['thumbnail_path']))
+    if request.get('return_images'):
+        # Caller stores the images itself (e.g. encrypted), so send them back as PNG
+        reply['annotated'] = image_ingest.encode_png(annotated)
+        reply['thumbnail'] = image_ingest.encode_png(thumb)
+    return reply
+
+
+class SummaryBatcher:
+    """Collects summarize calls from concurrent requests into shared batches."""
+
+    def __init__(self, engine, wait_ms=INFERENCE_BATCH_WAIT_MS, max_batch=INFERENCE_MAX_BATCH):
+        self.engine = engine
+        self.wait = wait_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self._queue = queue.Queue()
+        self._batches = 0
+        self._requests = 0
+        self._thread = threading.Thread(target=self._run, name='summary-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, text):
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                results = self.engine.summarize_many([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self._batches += 1
+            self._requests += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def metrics(self):
+        return {'batches': self._batches, 'requests': self._requests,
+                'avg_batch': self._requests / self._batches if self._batches else 0.0,
+                'queued': self._queue.qsize()}
+
+
+_batcher = None
+
+
+def summarize(request):
+    return _batcher.submit(request['text']).result()
+
+
+def metrics(request):
+    return {'pool': ocr_engine.get_pool().metrics(),
+            'preprocess': preprocess.metrics(),
+            'adaptive': _adaptive_stats.metrics(),
+            'summarizer': summary_engine.get_engine().metrics(),
+            'batcher': _batcher.metrics()}
+
+
+ROUTES = {
+    '/ocr': ocr,
+    '/summarize': summarize,
+    '/annotate': annotate,
+    '/document': document,
+    '/metrics': metrics,
+}
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self, status, body):
+        payload, content_type = inference_wire.pack(body)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _dispatch(self, request):
+        handler = ROUTES.get(self.path)
+        if handler is None:
+            return self._reply(404, {'error': f'Unknown endpoint {self.path}'})
+        try:
+            self._reply(200, handler(request))
+        except ocr_engine.OCRPoolTimeout as e:
+            self._reply(503, {'error': str(e)})
+        except (KeyError, ValueError) as e:
+            self._reply(400, {'error': repr(e)})
+        except Exception as e:
+            self._reply(500, {'error': repr(e)})
+
+    def do_GET(self):
+        if self.path == '/health':
+            return self._reply(200, {'status': 'ok'})
+        self._dispatch({})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            request = inference_wire.unpack(self.rfile.read(length), self.headers.get('Content-Type'))
+        except ValueError:
+            return self._reply(400, {'error': 'Invalid request body'})
+        self._dispatch(request)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host=INFERENCE_HOST, port=INFERENCE_PORT):
+    global _batcher
+    _batcher = SummaryBatcher(summary_engine.get_engine())
+    if ocr_engine.OCR_PRELOAD:
+        ocr_engine.preload_in_background()
+        threading.Thread(target=summary_engine.get_engine().load, name='summary-warmup', daemon=True).start()
+
+    server = ThreadingHTTPServer((host, port), InferenceHandler)
+    server.daemon_threads = True
+    print(f"Inference server listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    serve()
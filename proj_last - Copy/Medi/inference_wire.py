@@ -0,0 +1,47 @@
+"""Body encoding shared by ``inference_client`` and ``inference_server``.
+
+Messages are JSON objects. Values that are raw bytes (encoded images,
+numpy pixel buffers, PNG replies) are not base64'd into the JSON: they
+follow it as binary parts in an ``application/octet-stream`` body laid
+out as a 4-byte big-endian header length, the JSON header (which lists
+the parts as ``[name, length]`` pairs under ``_parts``), then the parts
+back to back. A message without binary values is sent as plain JSON.
+"""
+import json
+import struct
+
+JSON_TYPE = 'application/json'
+BINARY_TYPE = 'application/octet-stream'
+
+_BINARY = (bytes, bytearray, memoryview)
+_LENGTH = struct.Struct('>I')
+
+
+def pack(message):
+    """``(body, content_type)`` for a dict whose bytes-like values become binary parts."""
+    parts = [(name, value) for name, value in message.items() if isinstance(value, _BINARY)]
+    if not parts:
+        return json.dumps(message).encode(), JSON_TYPE
+    header = {name: value for name, value in message.items() if not isinstance(value, _BINARY)}
+    header['_parts'] = [[name, memoryview(value).nbytes] for name, value in parts]
+    header = json.dumps(header).encode()
+    # join() accepts any buffer, so arrays are copied once, straight into the body
+    return b''.join([_LENGTH.pack(len(header)), header] + [value for _, value in parts]), BINARY_TYPE
+
+
+def unpack(body, content_type):
+    """The dict ``pack`` encoded; binary parts come back as memoryviews into ``body``."""
+    if not (content_type or '').startswith(BINARY_TYPE):
+        return json.loads(body or b'{}')
+    view = memoryview(body)
+    if len(view) < _LENGTH.size:
+        raise ValueError("Binary body is too short")
+    (length,) = _LENGTH.unpack_from(view)
+    offset = _LENGTH.size + length
+    message = json.loads(bytes(view[_LENGTH.size:offset]))
+    for name, size in message.pop('_parts', []):
+        message[name] = view[offset:offset + size]
+        offset += size
+    if offset != len(view):
+        raise ValueError("Binary parts do not match the body length")
+    return message
@@ -0,0 +1,285 @@
+"""Background job queue for slow document processing.
+
+Jobs are persisted in SQLite so they survive a restart, and run on a local
+process pool (no external broker). A dispatcher thread claims queued jobs up
+to the concurrency limit; failed jobs are retried with backoff and queued or
+running jobs can be cancelled.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+JOB_DB_PATH = os.environ.get(
+    'JOB_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.sqlite3'))
+JOB_CONCURRENCY = int(os.environ.get('JOB_CONCURRENCY', '2'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_DELAY = float(os.environ.get('JOB_RETRY_DELAY', '5'))
+JOB_POLL_INTERVAL = 0.5
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """SQLite-backed job store plus a process-pool dispatcher.
+
+    ``handler`` must be a picklable top-level function taking the job
+    payload dict and returning a JSON-serialisable result. ``initializer``,
+    if given, runs once in each worker process before it takes jobs.
+    """
+
+    def __init__(self, handler, initializer=None, path=JOB_DB_PATH, concurrency=JOB_CONCURRENCY,
+                 max_attempts=JOB_MAX_ATTEMPTS, retry_delay=JOB_RETRY_DELAY):
+        self.handler = handler
+        self.initializer = initializer
+        self.path = path
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._executor = None
+        self._running = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    dedupe_key TEXT,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    owner TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    not_before REAL NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, not_before, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, status)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    # ---- client API ----
+
+    def submit(self, payload, dedupe_key=None):
+        """Queue a job and return its id.
+
+        If an active job with the same ``dedupe_key`` exists, its id is
+        returned instead of queueing a duplicate.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            if dedupe_key is not None:
+                row = conn.execute(
+                    "SELECT job_id FROM jobs WHERE dedupe_key = ? AND status IN (?, ?)",
+                    (dedupe_key, *ACTIVE_STATES)).fetchone()
+                if row:
+                    return row['job_id']
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (job_id, dedupe_key, payload, status, max_attempts, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, dedupe_key, json.dumps(payload), QUEUED, self.max_attempts, now, now))
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """Return the job as a dict, or ``None`` if unknown."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a queued job now, or flag a running one to be discarded."""
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                (CANCELLED, now, job_id, QUEUED))
+            if cur.rowcount:
+                return True
+            cur = conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE job_id = ? AND status = ?",
+                (now, job_id, RUNNING))
+        if cur.rowcount:
+            with self._lock:
+                future = self._running.get(job_id)
+            if future is not None:
+                future.cancel()
+            return True
+        return False
+
+    def retry(self, job_id):
+        """Re-queue a failed or cancelled job."""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, error = NULL, cancel_requested = 0, "
+                "not_before = 0, updated_at = ? WHERE job_id = ? AND status IN (?, ?)",
+                (QUEUED, time.time(), job_id, FAILED, CANCELLED))
+        self._wakeup.set()
+        return bool(cur.rowcount)
+
+    def stats(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        with self._lock:
+            running_here = len(self._running)
+        return {'by_status': {r['status']: r['n'] for r in rows},
+                'running_in_process': running_here,
+                'concurrency': self.concurrency}
+
+    # ---- dispatcher ----
+
+    def start(self):
+        """Recover orphaned jobs and start the dispatcher thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._executor = ProcessPoolExecutor(max_workers=self.concurrency,
+                                                 initializer=self.initializer)
+            self._thread = threading.Thread(target=self._dispatch_loop, name='job-dispatcher', daemon=True)
+        self._recover()
+        self._thread.start()
+
+    def _recover(self):
+        """Re-queue jobs left running by a process that no longer exists."""
+        host = socket.gethostname()
+        with self._connect() as conn:
+            rows = conn.execute("SELECT job_id, owner FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+            for row in rows:
+                owner_host, _, pid = (row['owner'] or '').rpartition(':')
+                if owner_host == host and pid.isdigit() and _pid_alive(int(pid)) and int(pid) != os.getpid():
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = ?, owner = NULL, updated_at = ? WHERE job_id = ? AND status = ?",
+                    (QUEUED, time.time(), row['job_id'], RUNNING))
+
+    def _claim(self):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT job_id, payload FROM jobs WHERE status = ? AND not_before <= ? "
+                "ORDER BY created_at LIMIT 1", (QUEUED, now)).fetchone()
+            if row is None:
+                return None
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, owner = ?, updated_at = ? "
+                "WHERE job_id = ? AND status = ?",
+                (RUNNING, self.owner, now, row['job_id'], QUEUED))
+            if not cur.rowcount:
+                # Another process claimed it first
+                return None
+        return row['job_id'], json.loads(row['payload'])
+
+    def _unclaim(self, job_id):
+        """Put a claimed job that never reached a worker back in the queue, uncounted."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts - 1, owner = NULL, updated_at = ? "
+                "WHERE job_id = ? AND status = ?", (QUEUED, time.time(), job_id, RUNNING))
+
+    def _restart_executor(self):
+        with self._lock:
+            broken = self._executor
+            self._executor = ProcessPoolExecutor(max_workers=self.concurrency, initializer=self.initializer)
+        broken.shutdown(wait=False)
+
+    def _dispatch_loop(self):
+        while True:
+            self._wakeup.clear()
+            while True:
+                with self._lock:
+                    if len(self._running) >= self.concurrency:
+                        break
+                claimed = self._claim()
+                if claimed is None:
+                    break
+                job_id, payload = claimed
+                try:
+                    future = self._executor.submit(self.handler, payload)
+                except BrokenProcessPool:
+                    # A worker died (e.g. OOM-killed during OCR); the jobs it had fail
+                    # through _finish, this one never started
+                    self._unclaim(job_id)
+                    self._restart_executor()
+                    continue
+                with self._lock:
+                    self._running[job_id] = future
+                future.add_done_callback(lambda f, job_id=job_id: self._finish(job_id, f))
+            self._wakeup.wait(JOB_POLL_INTERVAL)
+
+    def _finish(self, job_id, future):
+        with self._lock:
+            self._running.pop(job_id, None)
+        now = time.time()
+        with self._connect() as conn:
+            job = conn.execute(
+                "SELECT attempts, max_attempts, cancel_requested FROM jobs WHERE job_id = ?",
+                (job_id,)).fetchone()
+            if job is None:
+                return
+            if future.cancelled() or job['cancel_requested']:
+                conn.execute("UPDATE jobs SET status = ?, owner = NULL, updated_at = ? WHERE job_id = ?",
+                             (CANCELLED, now, job_id))
+            elif future.exception() is None:
+                try:
+                    result = json.dumps(future.result())
+                except (TypeError, ValueError) as e:
+                    # Retrying would produce the same result, so fail rather than strand it in RUNNING
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, owner = NULL, updated_at = ? WHERE job_id = ?",
+                        (FAILED, f"Result is not JSON-serialisable: {e!r}", now, job_id))
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, result = ?, error = NULL, owner = NULL, updated_at = ? "
+                        "WHERE job_id = ?", (DONE, result, now, job_id))
+            else:
+                error = repr(future.exception())
+                if job['attempts'] < job['max_attempts']:
+                    delay = self.retry_delay * 2 ** (job['attempts'] - 1)
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, owner = NULL, not_before = ?, updated_at = ? "
+                        "WHERE job_id = ?", (QUEUED, error, now + delay, now, job_id))
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, owner = NULL, updated_at = ? WHERE job_id = ?",
+                        (FAILED, error, now, job_id))
+        self._wakeup.set()
@@ -1,9 +1,7 @@
 import streamlit as st
-import easyocr
-import os
-from PIL import Image
-import tempfile
-import fitz  # PyMuPDF
+import inference_client
+import term_matcher
+import text_extraction
 import re
 
 st.set_page_config(page_title="Medical Document Summarizer", layout="centered")
@@ -13,35 +11,21 @@ st.write("Upload a **PDF or Image** medical record. The app will extract and sum
 
 uploaded_file = st.file_uploader("Upload PDF or Image", type=["pdf", "png", "jpg", "jpeg"])
 
-# Predefined disease/medical problems list
-disease_list = ["asthma", "seizures", "headaches", "migraine", "diabetes", "hypertension",
-                "cholesterol", "cancer", "arthritis", "covid", "tuberculosis", "anemia"]
+# Disease/medical problem vocabulary (MEDICAL_TERMS_PATH, else the built-in list), compiled once per process
+def disease_matcher():
+    return term_matcher.get_matcher()
 
-# Highlight disease names in red
+# Highlight disease names in red, in one pass over the text
 def highlight_diseases(text):
-    for disease in disease_list:
-        pattern = re.compile(rf'\b({disease})\b', flags=re.IGNORECASE)
-        text = pattern.sub(r"<span style='color:red'><b>\1</b></span>", text)
-    return text
-
-# Extract text from PDF using EasyOCR
-def extract_text_from_pdf(file_path):
-    reader = easyocr.Reader(['en'])
-    text = ""
-    with fitz.open(file_path) as pdf:
-        for page in pdf:
-            image = page.get_pixmap()
-            temp_img_path = os.path.join(tempfile.gettempdir(), "temp_page.png")
-            image.save(temp_img_path)
-            result = reader.readtext(temp_img_path, detail=0)
-            text += " ".join(result) + "\n"
-    return text.strip()
-
-# Extract text from image using EasyOCR
-def extract_text_from_image(image_file):
-    reader = easyocr.Reader(['en'])
-    image = Image.open(image_file)
-    result = reader.readtext(image, detail=0)
+    return disease_matcher().highlight(text)
+
+# Extract text from PDF: embedded text layer first, EasyOCR only for scanned pages and images
+def extract_text_from_pdf(pdf_source):
+    return text_extraction.extract_text(pdf_source).strip()
+
+# Extract text from image using EasyOCR (encoded bytes are decoded once, server-side)
+def extract_text_from_image(image_source):
+    result = inference_client.ocr(image_source, detail=0)
     return " ".join(result).strip()
 
 # Find medical problems line
@@ -55,16 +39,14 @@ def extract_medical_problem_line(text):
 # Main processing
 if uploaded_file:
     file_ext = uploaded_file.name.split(".")[-1].lower()
-    with tempfile.NamedTemporaryFile(delete=False, suffix="." + file_ext) as tmp_file:
-        tmp_file.write(uploaded_file.read())
-        tmp_path = tmp_file.name
+    file_bytes = uploaded_file.getvalue()
 
     st.success("✅ File uploaded successfully. Extracting text...")
 
     if file_ext == "pdf":
-        extracted_text = extract_text_from_pdf(tmp_path)
+        extracted_text = extract_text_from_pdf(file_bytes)
     else:
-        extracted_text = extract_text_from_image(tmp_path)
+        extracted_text = extract_text_from_image(file_bytes)
 
     if extracted_text:
         # Extract the Medical Problems line
@@ -78,6 +60,13 @@ if uploaded_file:
         st.markdown("### 🩺 Medical Problems")
         st.markdown(f"<div style='font-size:16px;'>{highlighted_line}</div>", unsafe_allow_html=True)
 
+        # Every vocabulary term found anywhere in the document, with its position
+        detected_terms = disease_matcher().extract(extracted_text)
+        if detected_terms:
+            with st.expander(f"Detected terms ({len(detected_terms)})"):
+                st.table([{'term': m['term'], 'code': m['code'] or '', 'matched': m['text'],
+                           'offset': m['start']} for m in detected_terms])
+
         # Display rest of the summary
         st.markdown("### 📋 Summary")
         st.markdown(f"<div style='font-size:15px; white-space: pre-wrap;'>{remaining_text}</div>", unsafe_allow_html=True)
@@ -0,0 +1,129 @@
+"""Import legacy ``static/uploads`` files into the content-addressed store.
+
+Hashes every file under ``static/uploads`` in parallel, stores each distinct
+content once, and re-points the ``appointment_documents`` and
+``appointment`` rows that referenced a file at its new
+``uploads/<appointment>/<hash>/<name>`` path (filling in ``content_hash``).
+Files no row references are only counted.
+
+    python migrate_uploads.py --dry-run
+    python migrate_uploads.py --workers 8 --remove-originals
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+import secure_storage
+from ocr_cache import file_sha256
+
+UPLOADS_ROOT = os.path.join(secure_storage.LEGACY_ROOT, 'uploads')
+
+
+def scan(root):
+    """``uploads/...`` document path -> absolute file path for every legacy upload."""
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            files['uploads/' + os.path.relpath(path, root).replace(os.sep, '/')] = path
+    return files
+
+
+def hash_all(files, workers):
+    # hashlib releases the GIL on large buffers, so threads hash in parallel
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(files, pool.map(file_sha256, files.values())))
+
+
+def ensure_schema(conn):
+    cur = conn.cursor()
+    cur.execute("SHOW COLUMNS FROM appointment_documents LIKE 'content_hash'")
+    if not cur.fetchall():
+        cur.execute("ALTER TABLE appointment_documents ADD COLUMN content_hash char(64) DEFAULT NULL "
+                    "AFTER document_path, ADD KEY content_hash (content_hash)")
+    cur.close()
+
+
+def referencing_rows(conn, hashes):
+    """``(table, row id, appointment_id, document_path)`` for rows pointing at legacy uploads."""
+    cur = conn.cursor()
+    cur.execute("SELECT id, appointment_id, document_path FROM appointment_documents "
+                "WHERE content_hash IS NULL")
+    rows = [('appointment_documents', r[0], r[1], r[2]) for r in cur.fetchall()]
+    cur.execute("SELECT appointment_id, appointment_id, document_path FROM appointment "
+                "WHERE document_path IS NOT NULL")
+    rows += [('appointment', r[0], r[1], r[2]) for r in cur.fetchall()]
+    cur.close()
+    return [row for row in rows if row[3] in hashes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', default=UPLOADS_ROOT)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--user', default='root')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--db', default='hospital')
+    parser.add_argument('--dry-run', action='store_true', help="only hash and report")
+    parser.add_argument('--remove-originals', action='store_true',
+                        help="delete migrated plaintext files after the database is updated")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    files = scan(args.root)
+    hashes = hash_all(files, args.workers)
+    total = sum(os.path.getsize(path) for path in files.values())
+    distinct = {}
+    for document_path, sha256 in hashes.items():
+        distinct.setdefault(sha256, os.path.getsize(files[document_path]))
+    print(f"{len(files)} files, {len(distinct)} distinct, {total / 1e6:.1f} MB -> "
+          f"{sum(distinct.values()) / 1e6:.1f} MB after dedup ({time.perf_counter() - start:.1f}s)")
+    if args.dry_run:
+        return
+
+    pool = db.ConnectionPool({'host': args.host, 'user': args.user, 'passwd': args.password,
+                              'db': args.db, 'autocommit': False}, size=1)
+    store = secure_storage.get_store()
+    with pool.connection() as conn:
+        ensure_schema(conn)
+        rows = referencing_rows(conn, hashes)
+
+        # One row per distinct content writes the blob (in parallel); the rest only link to it
+        first = {}
+        for row in rows:
+            first.setdefault(hashes[row[3]], row)
+
+        def new_path(row):
+            return secure_storage.upload_path(row[2], hashes[row[3]], os.path.basename(row[3]))
+
+        def import_blob(row):
+            with open(files[row[3]], 'rb') as f:
+                return store.save(row[2], new_path(row), f)
+
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            list(executor.map(import_blob, first.values()))
+        for row in rows:
+            if row is not first[hashes[row[3]]]:
+                store.link(row[2], new_path(row), hashes[row[3]])
+
+        cur = conn.cursor()
+        cur.executemany("UPDATE appointment_documents SET document_path = %s, content_hash = %s WHERE id = %s",
+                        [(new_path(r), hashes[r[3]], r[1]) for r in rows if r[0] == 'appointment_documents'])
+        cur.executemany("UPDATE appointment SET document_path = %s WHERE appointment_id = %s",
+                        [(new_path(r), r[1]) for r in rows if r[0] == 'appointment'])
+        cur.close()
+
+    migrated = {row[3] for row in rows}
+    if args.remove_originals:
+        for document_path in migrated:
+            os.remove(files[document_path])
+    stats = store.stats()
+    print(f"migrated {len(rows)} rows ({len(migrated)} files, {len(files) - len(migrated)} unreferenced); "
+          f"store holds {stats['blobs']} blobs, {stats['bytes_saved'] / 1e6:.1f} MB saved by dedup")
+
+
+if __name__ == '__main__':
+    main()
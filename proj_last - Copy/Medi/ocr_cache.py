@@ -0,0 +1,136 @@
+"""Content-addressed cache for OCR and summary results.
+
+Entries are keyed by the SHA-256 of the document bytes plus the engine
+version, so re-opening an unchanged upload skips OCR, annotation and
+summarization entirely. Results live in a local SQLite file and are
+evicted least-recently-used once the entry or byte budget is exceeded.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+OCR_CACHE_PATH = os.environ.get(
+    'OCR_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ocr_cache.sqlite3'))
+OCR_CACHE_MAX_ENTRIES = int(os.environ.get('OCR_CACHE_MAX_ENTRIES', '5000'))
+OCR_CACHE_MAX_BYTES = int(os.environ.get('OCR_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    """Hash a file in fixed-size chunks without loading it into memory."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OCRCache:
+    """SQLite-backed LRU store of pipeline results."""
+
+    def __init__(self, path=OCR_CACHE_PATH, max_entries=OCR_CACHE_MAX_ENTRIES,
+                 max_bytes=OCR_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ocr_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    doc_hash TEXT NOT NULL,
+                    engine_version TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ocr_cache_last_access ON ocr_cache (last_access)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @staticmethod
+    def make_key(doc_hash, engine_version):
+        return f"{doc_hash}:{engine_version}"
+
+    def get(self, doc_hash, engine_version):
+        """Return the cached result dict, or ``None`` on a miss."""
+        key = self.make_key(doc_hash, engine_version)
+        with self._connect() as conn:
+            row = conn.execute("SELECT result FROM ocr_cache WHERE cache_key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE ocr_cache SET last_access = ? WHERE cache_key = ?", (time.time(), key))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, doc_hash, engine_version, result):
+        """Store a JSON-serialisable result dict and evict if over budget."""
+        key = self.make_key(doc_hash, engine_version)
+        payload = json.dumps(result)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ocr_cache "
+                "(cache_key, doc_hash, engine_version, result, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, doc_hash, engine_version, payload, len(payload), now, now))
+            self._evict(conn)
+
+    def results(self):
+        """Yield every cached result dict."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT result FROM ocr_cache").fetchall()
+        for (payload,) in rows:
+            yield json.loads(payload)
+
+    def invalidate(self, doc_hash):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM ocr_cache WHERE doc_hash = ?", (doc_hash,))
+
+    def _evict(self, conn):
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT cache_key, size FROM ocr_cache ORDER BY last_access").fetchall()
+        doomed = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM ocr_cache WHERE cache_key = ?", doomed)
+
+    def stats(self):
+        with self._connect() as conn:
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()
+        with self._lock:
+            return {'entries': count, 'bytes': total, 'hits': self.hits, 'misses': self.misses}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide cache, opening the store on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OCRCache()
+    return _cache
@@ -0,0 +1,186 @@
+"""Shared EasyOCR engine.
+
+Building an ``easyocr.Reader`` loads the detection and recognition weights
+from disk, so readers are created once per process and handed out from a
+bounded pool instead of being constructed on every request.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# OCR pool configuration (override through the environment)
+OCR_LANGUAGES = os.environ.get('OCR_LANGUAGES', 'en').split(',')
+OCR_POOL_SIZE = int(os.environ.get('OCR_POOL_SIZE', '2'))
+OCR_ACQUIRE_TIMEOUT = float(os.environ.get('OCR_ACQUIRE_TIMEOUT', '30'))
+OCR_GPU = os.environ.get('OCR_GPU', '0') == '1'
+OCR_PRELOAD = os.environ.get('OCR_PRELOAD', '0') == '1'
+# Grayscale/downscale/deskew/crop before recognition (see preprocess.py)
+OCR_PREPROCESS = os.environ.get('OCR_PREPROCESS', '1') == '1'
+# Low-resolution pass plus high-resolution re-reads of low-confidence boxes (see adaptive_ocr.py)
+OCR_ADAPTIVE = os.environ.get('OCR_ADAPTIVE', '0') == '1'
+
+
+class OCRPoolTimeout(Exception):
+    """Raised when no reader becomes free within the acquire timeout."""
+
+
+class ReaderPool:
+    """Bounded pool of pre-warmed EasyOCR readers.
+
+    Readers are created lazily up to ``size``; callers beyond that queue
+    until a reader is returned or ``timeout`` seconds pass.
+    """
+
+    def __init__(self, size=OCR_POOL_SIZE, languages=OCR_LANGUAGES, gpu=OCR_GPU,
+                 acquire_timeout=OCR_ACQUIRE_TIMEOUT):
+        self.size = max(1, size)
+        self.languages = list(languages)
+        self.gpu = gpu
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = []
+        self._created = 0
+        self._cond = threading.Condition()
+
+        # Metrics
+        self._waiting = 0
+        self._acquired = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _create_reader(self):
+        import easyocr
+        return easyocr.Reader(self.languages, gpu=self.gpu)
+
+    def warm_up(self):
+        """Create every reader in the pool up front."""
+        while True:
+            with self._cond:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            try:
+                reader = self._create_reader()
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                raise
+            self._release(reader)
+
+    def _acquire(self, timeout):
+        start = time.monotonic()
+        deadline = start + timeout
+        create = False
+
+        with self._cond:
+            self._waiting += 1
+            try:
+                while not self._idle:
+                    if self._created < self.size:
+                        self._created += 1
+                        create = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise OCRPoolTimeout(
+                            f"No OCR reader available after {timeout:.1f}s "
+                            f"(pool size {self.size})")
+                    self._cond.wait(remaining)
+                reader = None if create else self._idle.pop()
+            finally:
+                self._waiting -= 1
+
+        if create:
+            try:
+                reader = self._create_reader()
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._acquired += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return reader
+
+    def _release(self, reader):
+        with self._cond:
+            self._idle.append(reader)
+            self._cond.notify()
+
+    @contextmanager
+    def reader(self, timeout=None):
+        """Borrow a reader for the duration of the ``with`` block."""
+        reader = self._acquire(self.acquire_timeout if timeout is None else timeout)
+        try:
+            yield reader
+        finally:
+            self._release(reader)
+
+    def readtext(self, image, timeout=None, **kwargs):
+        """Run ``Reader.readtext`` on a pooled reader."""
+        with self.reader(timeout) as reader:
+            return reader.readtext(image, **kwargs)
+
+    def recognize(self, gray, boxes, timeout=None, **kwargs):
+        """Run ``Reader.recognize`` (no detection) on axis-aligned ``[x0, x1, y0, y1]`` boxes of a gray image."""
+        with self.reader(timeout) as reader:
+            return reader.recognize(gray, horizontal_list=boxes, free_list=[], **kwargs)
+
+    def metrics(self):
+        with self._cond:
+            in_use = self._created - len(self._idle)
+            return {
+                'pool_size': self.size,
+                'created': self._created,
+                'idle': len(self._idle),
+                'in_use': in_use,
+                'occupancy': in_use / self.size,
+                'waiting': self._waiting,
+                'acquired': self._acquired,
+                'timeouts': self._timeouts,
+                'wait_avg_ms': 1000 * self._wait_total / self._acquired if self._acquired else 0.0,
+                'wait_max_ms': 1000 * self._wait_max,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide reader pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ReaderPool()
+    return _pool
+
+
+def engine_version():
+    """Identify the OCR engine so cached results are dropped on upgrades."""
+    try:
+        from importlib.metadata import version
+        easyocr_version = version('easyocr')
+    except Exception:
+        easyocr_version = 'unknown'
+    return f"easyocr-{easyocr_version}-{'+'.join(OCR_LANGUAGES)}{'-pre1' if OCR_PREPROCESS else ''}"
+
+
+def readtext(image, **kwargs):
+    """Convenience wrapper around ``get_pool().readtext``."""
+    return get_pool().readtext(image, **kwargs)
+
+
+def preload_in_background():
+    """Warm the pool on a daemon thread so the first request does not pay for it."""
+    thread = threading.Thread(target=get_pool().warm_up, name='ocr-warmup', daemon=True)
+    thread.start()
+    return thread
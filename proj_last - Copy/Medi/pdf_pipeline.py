@@ -0,0 +1,98 @@
+"""Streaming per-page OCR for PDFs.
+
+Pages are rendered lazily with PyMuPDF straight into numpy arrays (no temp
+PNGs) and sent to the inference server from a bounded process pool. At most
+``PDF_MAX_IN_FLIGHT`` pages are rendered or being recognised at once, and
+results are yielded in page order as soon as each is ready, so memory stays
+flat even for very long discharge summaries.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import inference_client
+
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', '2'))
+PDF_MAX_IN_FLIGHT = int(os.environ.get('PDF_MAX_IN_FLIGHT', '4'))
+PDF_RENDER_DPI = int(os.environ.get('PDF_RENDER_DPI', '72'))
+
+# Per worker process: the PDF opened once by the pool initializer
+_document = None
+
+
+def _open_document(source):
+    global _document
+    import fitz  # PyMuPDF
+    if isinstance(source, (bytes, bytearray)):
+        _document = fitz.open(stream=bytes(source), filetype="pdf")
+    else:
+        _document = fitz.open(source)
+
+
+def render_page(document, page_number, dpi=PDF_RENDER_DPI, clip=None):
+    """Render one page, or the ``clip`` rectangle of it in PDF points, to an ``(h, w, 3)`` RGB uint8 array."""
+    import fitz
+    import numpy as np
+
+    zoom = dpi / 72
+    pix = document.load_page(page_number).get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False,
+                                                     clip=fitz.Rect(clip) if clip else None)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+
+
+def _ocr_page(page_number, dpi, detail, with_image, clip=None):
+    image = render_page(_document, page_number, dpi, clip)
+    result = inference_client.ocr(image, detail=detail)
+    return page_number, result, image if with_image else None
+
+
+def page_count(source):
+    import fitz
+    if isinstance(source, (bytes, bytearray)):
+        with fitz.open(stream=bytes(source), filetype="pdf") as pdf:
+            return len(pdf)
+    with fitz.open(source) as pdf:
+        return len(pdf)
+
+
+def ocr_pdf_regions(source, regions, detail=0, dpi=PDF_RENDER_DPI, with_images=False,
+                    workers=PDF_WORKERS, max_in_flight=PDF_MAX_IN_FLIGHT):
+    """Yield ``(page_number, ocr_result, image)`` for each ``(page_number, clip)`` region, in order.
+
+    ``clip`` is an ``(x0, y0, x1, y1)`` rectangle in PDF points, or ``None``
+    for the whole page. The worker pool is only started once the first
+    result is requested.
+    """
+    regions = list(regions)
+    max_in_flight = max(1, max_in_flight)
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(regions) or 1)),
+                             initializer=_open_document, initargs=(source,)) as pool:
+        pending = deque()
+        next_region = 0
+        try:
+            while next_region < len(regions) or pending:
+                while next_region < len(regions) and len(pending) < max_in_flight:
+                    page_number, clip = regions[next_region]
+                    pending.append(pool.submit(_ocr_page, page_number, dpi, detail, with_images, clip))
+                    next_region += 1
+                yield pending.popleft().result()
+        finally:
+            # Caller stopped early: don't render pages nobody will read
+            for future in pending:
+                future.cancel()
+
+
+def ocr_pdf_pages(source, detail=0, dpi=PDF_RENDER_DPI, with_images=False,
+                  workers=PDF_WORKERS, max_in_flight=PDF_MAX_IN_FLIGHT):
+    """Yield ``(page_number, ocr_result, image)`` for each page of a PDF, in order.
+
+    ``source`` is a file path or the PDF bytes. ``image`` is the rendered
+    page array when ``with_images`` is set, otherwise ``None``.
+    """
+    regions = [(page_number, None) for page_number in range(page_count(source))]
+    yield from ocr_pdf_regions(source, regions, detail, dpi, with_images, workers, max_in_flight)
+
+
+def extract_pdf_text(source, separator="\n", **kwargs):
+    """OCR every page and join the text, one page per ``separator``."""
+    return separator.join(" ".join(result) for _, result, _ in ocr_pdf_pages(source, detail=0, **kwargs))
@@ -0,0 +1,225 @@
+"""Adaptive image pre-processing ahead of OCR.
+
+OCR time grows with pixel count, and phone photos of prescriptions arrive
+at 12+ megapixels with text far larger than the recogniser needs. Before
+``readtext`` each image is:
+
+1. converted to grayscale;
+2. measured: the median height of text-sized connected components gives
+   the effective DPI, assuming body text of ``PREPROCESS_TEXT_PT`` points;
+3. downscaled (never upscaled) to ``PREPROCESS_TARGET_DPI``;
+4. deskewed by the median angle of the text lines;
+5. cropped to the inked area plus ``PREPROCESS_MARGIN`` pixels.
+
+The analysis runs on a small probe copy, and scaling, rotation and crop
+are applied as one resize plus at most one affine warp. The combined
+transform is kept so OCR boxes can be mapped back onto the original image
+for annotation. Every stage is timed.
+"""
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+PREPROCESS_TARGET_DPI = float(os.environ.get('PREPROCESS_TARGET_DPI', '200'))
+PREPROCESS_TEXT_PT = float(os.environ.get('PREPROCESS_TEXT_PT', '7'))
+PREPROCESS_MAX_SKEW = float(os.environ.get('PREPROCESS_MAX_SKEW', '15'))
+# Smaller angles are more often noise (screenshots, tables) than real skew
+PREPROCESS_MIN_SKEW = 1.0
+PREPROCESS_MARGIN = int(os.environ.get('PREPROCESS_MARGIN', '16'))
+PREPROCESS_DESKEW = os.environ.get('PREPROCESS_DESKEW', '1') == '1'
+PREPROCESS_CROP = os.environ.get('PREPROCESS_CROP', '1') == '1'
+# Longest side of the copy used for measuring text size, skew and margins
+PREPROCESS_PROBE_SIDE = 1600
+
+STAGES = ('grayscale', 'measure', 'downscale', 'deskew_crop')
+
+
+class Preprocessed:
+    """A pre-processed image, the transform that produced it, and stage timings."""
+
+    __slots__ = ('image', 'matrix', 'scale', 'angle', 'crop', 'text_height', 'timings')
+
+    def __init__(self, image, matrix, scale, angle, crop, text_height, timings):
+        self.image = image
+        self.matrix = matrix
+        self.scale = scale
+        self.angle = angle
+        self.crop = crop
+        self.text_height = text_height
+        self.timings = timings
+
+    def map_boxes(self, result):
+        """Return EasyOCR ``(bbox, text, confidence)`` tuples with boxes in original-image pixels."""
+        if not result:
+            return result
+        inverse = cv2.invertAffineTransform(self.matrix)
+        points = np.array([bbox for bbox, _, _ in result], dtype=np.float64).reshape(-1, 2)
+        mapped = points @ inverse[:, :2].T + inverse[:, 2]
+        mapped = np.rint(mapped).astype(int).reshape(len(result), -1, 2).tolist()
+        return [(bbox, text, prob) for bbox, (_, text, prob) in zip(mapped, result)]
+
+    def report(self):
+        return {'shape': list(self.image.shape), 'scale': round(self.scale, 4), 'angle': round(self.angle, 2),
+                'crop': self.crop, 'text_height': self.text_height,
+                'timings_ms': {stage: round(ms, 2) for stage, ms in self.timings.items()}}
+
+
+def _binarize(gray):
+    """Ink as 255 on 0, whatever the page polarity."""
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    # Dark backgrounds (screenshots in dark mode) come out mostly "ink"
+    if cv2.countNonZero(binary) > binary.size // 2:
+        binary = cv2.bitwise_not(binary)
+    return binary
+
+
+def text_height(binary):
+    """Median height in pixels of character-sized components, or ``None``."""
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights, widths, areas = stats[1:, cv2.CC_STAT_HEIGHT], stats[1:, cv2.CC_STAT_WIDTH], stats[1:, cv2.CC_STAT_AREA]
+    # Drop specks, rules, table borders and photos: keep roughly glyph-shaped blobs
+    glyphs = (heights >= 4) & (heights <= binary.shape[0] // 8) & (widths <= 4 * heights) \
+        & (areas >= 0.1 * heights * widths)
+    if np.count_nonzero(glyphs) < 10:
+        return None
+    return float(np.median(heights[glyphs]))
+
+
+def skew_angle(binary, height):
+    """Rotation in degrees that levels the text lines (counter-clockwise positive, as OpenCV), or 0."""
+    # Smear characters into line blobs, then take each blob's principal axis from its moments
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, int(height * 2)), 1))
+    lines = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+    contours, _ = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    angles, lengths = [], []
+    for contour in contours:
+        m = cv2.moments(contour)
+        if m['m00'] <= 0:
+            continue
+        mu20, mu02, mu11 = m['mu20'] / m['m00'], m['mu02'] / m['m00'], m['mu11'] / m['m00']
+        spread = np.hypot((mu20 - mu02) / 2, mu11)
+        # Side lengths of the rectangle with the same second moments
+        length = np.sqrt(12 * ((mu20 + mu02) / 2 + spread))
+        thickness = np.sqrt(12 * max((mu20 + mu02) / 2 - spread, 1e-6))
+        if length < 5 * thickness or length < 4 * height:
+            continue
+        # With y pointing down, a positive angle is a line falling to the right
+        angle = np.degrees(0.5 * np.arctan2(2 * mu11, mu20 - mu02))
+        if abs(angle) <= PREPROCESS_MAX_SKEW:
+            angles.append(angle)
+            lengths.append(length)
+    if len(angles) < 5:
+        return 0.0
+    order = np.argsort(angles)
+    cumulative = np.cumsum(np.asarray(lengths)[order])
+    # Length-weighted median, so long lines outvote stray fragments
+    angle = float(np.asarray(angles)[order][np.searchsorted(cumulative, cumulative[-1] / 2)])
+    return angle if abs(angle) >= PREPROCESS_MIN_SKEW else 0.0
+
+
+def _ink_bounds(binary, margin):
+    rows = np.flatnonzero(binary.any(axis=1))
+    cols = np.flatnonzero(binary.any(axis=0))
+    if not rows.size:
+        return 0, 0, binary.shape[1], binary.shape[0]
+    return (max(0, cols[0] - margin), max(0, rows[0] - margin),
+            min(binary.shape[1], cols[-1] + 1 + margin), min(binary.shape[0], rows[-1] + 1 + margin))
+
+
+def preprocess(image, target_dpi=PREPROCESS_TARGET_DPI, deskew=PREPROCESS_DESKEW, crop=PREPROCESS_CROP):
+    """Grayscale, downscale, deskew and crop an RGB (or gray) array for OCR."""
+    timings = {}
+    start = time.perf_counter()
+
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+    now = time.perf_counter()
+    timings['grayscale'], start = 1000 * (now - start), now
+
+    height, width = gray.shape
+    probe_scale = min(1.0, PREPROCESS_PROBE_SIDE / max(height, width))
+    probe = cv2.resize(gray, None, fx=probe_scale, fy=probe_scale, interpolation=cv2.INTER_AREA) \
+        if probe_scale < 1 else gray
+    binary = _binarize(probe)
+    probe_height = text_height(binary)
+    glyph_height = probe_height / probe_scale if probe_height else None
+    now = time.perf_counter()
+    timings['measure'], start = 1000 * (now - start), now
+
+    # Never upscale, and leave images with no measurable text alone
+    target_height = target_dpi * PREPROCESS_TEXT_PT / 72
+    scale = min(1.0, target_height / glyph_height) if glyph_height else 1.0
+    if scale < 0.95:
+        out = cv2.resize(gray, (max(1, round(width * scale)), max(1, round(height * scale))),
+                         interpolation=cv2.INTER_AREA)
+    else:
+        scale, out = 1.0, gray
+    matrix = np.array([[scale, 0, 0], [0, scale, 0]], dtype=np.float64)
+    now = time.perf_counter()
+    timings['downscale'], start = 1000 * (now - start), now
+
+    angle = skew_angle(binary, probe_height) if deskew and probe_height else 0.0
+    bounds = None
+    if angle or crop:
+        out_h, out_w = out.shape
+        # Rotate about the centre into a canvas large enough to keep the corners
+        rotation = cv2.getRotationMatrix2D((out_w / 2, out_h / 2), angle, 1.0)
+        cos, sin = abs(rotation[0, 0]), abs(rotation[0, 1])
+        canvas_w, canvas_h = int(out_h * sin + out_w * cos + 0.5), int(out_h * cos + out_w * sin + 0.5)
+        rotation[:, 2] += ((canvas_w - out_w) / 2, (canvas_h - out_h) / 2)
+
+        if crop:
+            # Find the inked area on the probe, rotated the same way, then scale it up
+            ratio = probe_scale / scale
+            probe_rotation = rotation.copy()
+            probe_rotation[:, 2] *= ratio
+            ink = cv2.warpAffine(binary, probe_rotation, (round(canvas_w * ratio), round(canvas_h * ratio)),
+                                 flags=cv2.INTER_NEAREST) if angle else binary
+            x0, y0, x1, y1 = _ink_bounds(ink, max(1, round(PREPROCESS_MARGIN * ratio)))
+            bounds = [int(x0 / ratio), int(y0 / ratio), min(canvas_w, int(np.ceil(x1 / ratio))),
+                      min(canvas_h, int(np.ceil(y1 / ratio)))]
+        else:
+            bounds = [0, 0, canvas_w, canvas_h]
+
+        rotation[:, 2] -= bounds[:2]
+        size = (bounds[2] - bounds[0], bounds[3] - bounds[1])
+        if angle:
+            background = int(np.median(out[::16, ::16]))
+            out = cv2.warpAffine(out, rotation, size, flags=cv2.INTER_LINEAR,
+                                 borderMode=cv2.BORDER_CONSTANT, borderValue=background)
+        else:
+            out = out[bounds[1]:bounds[3], bounds[0]:bounds[2]]
+        matrix = np.vstack([rotation, [0, 0, 1]])[:2] @ np.vstack([matrix, [0, 0, 1]])
+    timings['deskew_crop'] = 1000 * (time.perf_counter() - start)
+
+    _stats.record(timings)
+    return Preprocessed(np.ascontiguousarray(out), matrix, scale, angle, bounds,
+                        glyph_height and round(glyph_height, 1), timings)
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._count = 0
+        self._totals = dict.fromkeys(STAGES, 0.0)
+
+    def record(self, timings):
+        with self._lock:
+            self._count += 1
+            for stage, ms in timings.items():
+                self._totals[stage] += ms
+
+    def metrics(self):
+        with self._lock:
+            return {'images': self._count,
+                    'avg_ms': {stage: total / self._count if self._count else 0.0
+                               for stage, total in self._totals.items()}}
+
+
+_stats = _Stats()
+
+
+def metrics():
+    return _stats.metrics()
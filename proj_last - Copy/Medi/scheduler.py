@@ -0,0 +1,243 @@
+"""Per-doctor appointment slot calendars.
+
+Appointments occupy fixed ``SCHEDULE_SLOT_MINUTES`` slots within working
+hours. The database is the source of truth: ``appointment.slot`` carries a
+``UNIQUE (doctor_id, slot)`` key, so two bookings for the same slot can
+never both commit, whichever worker they arrive on. Each worker also keeps
+a sorted in-memory index of every doctor's booked slots, rebuilt from
+``appointment`` after ``SCHEDULE_INDEX_TTL`` seconds or on a detected
+conflict. That index answers conflict checks in O(log n) and finds the next
+free slots without scanning appointments.
+"""
+import bisect
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import MySQLdb
+
+SCHEDULE_SLOT_MINUTES = int(os.environ.get('SCHEDULE_SLOT_MINUTES', '15'))
+SCHEDULE_DAY_START = int(os.environ.get('SCHEDULE_DAY_START', '9'))
+SCHEDULE_DAY_END = int(os.environ.get('SCHEDULE_DAY_END', '17'))
+# Monday=0 ... Sunday=6
+SCHEDULE_WORKDAYS = frozenset(int(d) for d in os.environ.get('SCHEDULE_WORKDAYS', '0,1,2,3,4,5').split(','))
+SCHEDULE_INDEX_TTL = float(os.environ.get('SCHEDULE_INDEX_TTL', '60'))
+SCHEDULE_MAX_SUGGESTIONS = 50
+SCHEDULE_HORIZON_DAYS = 90
+
+# Appointments in these states no longer hold their slot
+RELEASED_STATUSES = ('Rejected', 'Cancelled')
+
+_EPOCH = datetime(2000, 1, 1)
+
+
+class SchedulingError(Exception):
+    """The requested time cannot be booked."""
+
+
+class SlotTaken(SchedulingError):
+    """The slot is already booked; ``suggestions`` lists the next free slots."""
+
+    def __init__(self, slot, suggestions):
+        super().__init__(f"{slot:%Y-%m-%d %H:%M} is already booked")
+        self.slot = slot
+        self.suggestions = suggestions
+
+
+def slot_start(moment, minutes=SCHEDULE_SLOT_MINUTES):
+    """The start of the slot containing ``moment``."""
+    moment = moment.replace(second=0, microsecond=0)
+    offset = (moment - _EPOCH) // timedelta(minutes=1) % minutes
+    return moment - timedelta(minutes=offset)
+
+
+def in_working_hours(slot, minutes=SCHEDULE_SLOT_MINUTES):
+    end = slot + timedelta(minutes=minutes)
+    day_end = slot.replace(hour=0, minute=0) + timedelta(hours=SCHEDULE_DAY_END)
+    return slot.weekday() in SCHEDULE_WORKDAYS and slot.hour >= SCHEDULE_DAY_START and end <= day_end
+
+
+def _is_duplicate_slot(error):
+    return error.args and error.args[0] == 1062 and 'doctor_slot' in str(error.args[-1])
+
+
+class _Calendar:
+    __slots__ = ('booked', 'loaded_at')
+
+    def __init__(self, booked):
+        self.booked = booked
+        self.loaded_at = time.monotonic()
+
+
+class SlotScheduler:
+    """Booked-slot index per doctor, backed by the ``doctor_slot`` unique key."""
+
+    def __init__(self, slot_minutes=SCHEDULE_SLOT_MINUTES, ttl=SCHEDULE_INDEX_TTL):
+        self.slot_minutes = slot_minutes
+        self.ttl = ttl
+        self._calendars = {}
+        self._lock = threading.Lock()
+        self._rebuilds = 0
+        self._conflicts = 0
+
+    def _load(self, cur, doctor_id):
+        cur.execute("SELECT slot FROM appointment WHERE doctor_id = %s AND slot >= %s ORDER BY slot",
+                    (doctor_id, slot_start(datetime.now(), self.slot_minutes)))
+        rows = cur.fetchall()
+        return [row['slot'] if isinstance(row, dict) else row[0] for row in rows]
+
+    def _calendar(self, cur, doctor_id, refresh=False):
+        with self._lock:
+            calendar = self._calendars.get(doctor_id)
+            if calendar is not None and not refresh and time.monotonic() - calendar.loaded_at < self.ttl:
+                return calendar
+        booked = self._load(cur, doctor_id)
+        with self._lock:
+            calendar = self._calendars[doctor_id] = _Calendar(booked)
+            self._rebuilds += 1
+        return calendar
+
+    def _count_conflict(self):
+        with self._lock:
+            self._conflicts += 1
+
+    def invalidate(self, doctor_id=None):
+        with self._lock:
+            if doctor_id is None:
+                self._calendars.clear()
+            else:
+                self._calendars.pop(doctor_id, None)
+
+    def is_free(self, cur, doctor_id, slot):
+        booked = self._calendar(cur, doctor_id).booked
+        i = bisect.bisect_left(booked, slot)
+        return i == len(booked) or booked[i] != slot
+
+    def free_slots(self, cur, doctor_id, after=None, n=5):
+        """The next ``n`` free slots for a doctor starting at or after ``after``."""
+        n = max(0, min(n, SCHEDULE_MAX_SUGGESTIONS))
+        now = datetime.now()
+        after = max(after or now, now)
+        slot = slot_start(after, self.slot_minutes)
+        if slot < after:
+            slot += timedelta(minutes=self.slot_minutes)
+        booked = self._calendar(cur, doctor_id).booked
+        i = bisect.bisect_left(booked, slot)
+        step = timedelta(minutes=self.slot_minutes)
+        horizon = slot + timedelta(days=SCHEDULE_HORIZON_DAYS)
+        free = []
+        while len(free) < n and slot < horizon:
+            if not in_working_hours(slot, self.slot_minutes):
+                # Jump to the start of the next working period
+                next_day = slot.replace(hour=SCHEDULE_DAY_START, minute=0)
+                slot = next_day if slot < next_day else next_day + timedelta(days=1)
+                continue
+            # Booked slots are sorted, so one pointer walks them alongside the candidates
+            while i < len(booked) and booked[i] < slot:
+                i += 1
+            if i == len(booked) or booked[i] != slot:
+                free.append(slot)
+            slot += step
+        return free
+
+    def book(self, cur, doctor_id, patient_id, appointment_time, consulting_id, status='Pending'):
+        """Insert an appointment into its slot; returns ``(appointment_id, slot)``.
+
+        Raises ``SlotTaken`` if the slot is booked, ``SchedulingError`` if it is
+        in the past or outside working hours.
+        """
+        slot = slot_start(appointment_time, self.slot_minutes)
+        if slot < slot_start(datetime.now(), self.slot_minutes):
+            raise SchedulingError("Appointments cannot be booked in the past")
+        if not in_working_hours(slot, self.slot_minutes):
+            raise SchedulingError(f"{slot:%Y-%m-%d %H:%M} is outside working hours")
+        if not self.is_free(cur, doctor_id, slot):
+            self._count_conflict()
+            raise SlotTaken(slot, self.free_slots(cur, doctor_id, slot))
+        try:
+            cur.execute("INSERT INTO appointment (consulting_id, patient_id, doctor_id, appointment_time, slot, status) "
+                        "VALUES (%s, %s, %s, %s, %s, %s)",
+                        (consulting_id, patient_id, doctor_id, appointment_time, slot, status))
+        except MySQLdb.IntegrityError as e:
+            if not _is_duplicate_slot(e):
+                raise
+            # Booked by another worker since our index was built
+            self._count_conflict()
+            self._calendar(cur, doctor_id, refresh=True)
+            raise SlotTaken(slot, self.free_slots(cur, doctor_id, slot)) from None
+        with self._lock:
+            calendar = self._calendars.get(doctor_id)
+            if calendar is not None:
+                bisect.insort(calendar.booked, slot)
+        return cur.lastrowid, slot
+
+    def acquire(self, cur, appointment_id):
+        """Take back the slot of an appointment that is becoming active again.
+
+        A no-op if it still holds its slot. Raises ``SlotTaken`` if the slot
+        was booked by someone else after it was released.
+        """
+        cur.execute("SELECT doctor_id, appointment_time, slot FROM appointment WHERE appointment_id = %s",
+                    (appointment_id,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        doctor_id, appointment_time, held = \
+            (row['doctor_id'], row['appointment_time'], row['slot']) if isinstance(row, dict) else row
+        if held is not None:
+            return held
+        slot = slot_start(appointment_time, self.slot_minutes)
+        try:
+            cur.execute("UPDATE appointment SET slot = %s WHERE appointment_id = %s", (slot, appointment_id))
+        except MySQLdb.IntegrityError as e:
+            if not _is_duplicate_slot(e):
+                raise
+            self._count_conflict()
+            self._calendar(cur, doctor_id, refresh=True)
+            raise SlotTaken(slot, self.free_slots(cur, doctor_id, slot)) from None
+        with self._lock:
+            calendar = self._calendars.get(doctor_id)
+            if calendar is not None:
+                i = bisect.bisect_left(calendar.booked, slot)
+                if i == len(calendar.booked) or calendar.booked[i] != slot:
+                    calendar.booked.insert(i, slot)
+        return slot
+
+    def release(self, cur, appointment_id):
+        """Free the slot held by an appointment (after it is rejected or cancelled)."""
+        cur.execute("SELECT doctor_id, slot FROM appointment WHERE appointment_id = %s", (appointment_id,))
+        row = cur.fetchone()
+        if row is None:
+            return
+        doctor_id, slot = (row['doctor_id'], row['slot']) if isinstance(row, dict) else row
+        cur.execute("UPDATE appointment SET slot = NULL WHERE appointment_id = %s", (appointment_id,))
+        if slot is None:
+            return
+        with self._lock:
+            calendar = self._calendars.get(doctor_id)
+            if calendar is not None:
+                i = bisect.bisect_left(calendar.booked, slot)
+                if i < len(calendar.booked) and calendar.booked[i] == slot:
+                    del calendar.booked[i]
+
+    def stats(self):
+        with self._lock:
+            return {'doctors_indexed': len(self._calendars),
+                    'booked_slots': sum(len(c.booked) for c in self._calendars.values()),
+                    'rebuilds': self._rebuilds, 'conflicts': self._conflicts,
+                    'slot_minutes': self.slot_minutes}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide slot scheduler, creating it on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = SlotScheduler()
+    return _scheduler
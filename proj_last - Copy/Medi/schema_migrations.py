@@ -0,0 +1,160 @@
+"""Bring an existing hospital database up to ``hospital_db.sql``.
+
+``hospital_db.sql`` describes a fresh install; databases created from an
+older dump get the same tables and indexes from here. Every step checks
+``information_schema`` first, so the script is safe to run repeatedly.
+
+    python schema_migrations.py                # apply
+    python schema_migrations.py --dry-run      # list pending steps
+"""
+import argparse
+
+import db
+import scheduler
+
+# (table, column, definition, backfill statement/callable or None)
+COLUMNS = [
+    ('appointment', 'document_count', "int(11) NOT NULL DEFAULT '0'",
+     "UPDATE appointment a SET document_count = "
+     "(SELECT COUNT(*) FROM appointment_documents d WHERE d.appointment_id = a.appointment_id)"),
+    ('appointment', 'slot', "datetime DEFAULT NULL", lambda cur: backfill_slots(cur)),
+]
+
+# (table, index name, columns) -- see the ALTER TABLE sections of hospital_db.sql
+INDEXES = [
+    ('appointment', 'appointment_time', ('appointment_time',)),
+    ('appointment', 'status_time', ('status', 'appointment_time')),
+    ('appointment', 'doctor_time', ('doctor_id', 'appointment_time')),
+    ('appointment', 'doctor_status_time',
+     ('doctor_id', 'status', 'appointment_time', 'patient_id', 'consulting_id', 'document_count')),
+    ('doctor', 'name', ('name',)),
+    ('patient', 'name', ('name',)),
+]
+
+UNIQUE_INDEXES = [
+    ('appointment', 'doctor_slot', ('doctor_id', 'slot')),
+    ('doctor', 'email', ('email',)),
+    ('patient', 'email', ('email',)),
+]
+
+TABLES = {
+    'cache_versions': """
+        CREATE TABLE `cache_versions` (
+          `name` varchar(64) NOT NULL,
+          `version` bigint(20) NOT NULL DEFAULT '0',
+          PRIMARY KEY (`name`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=latin1
+    """,
+}
+
+
+def _exists(cur, sql, params):
+    cur.execute(sql, params)
+    return cur.fetchone() is not None
+
+
+def _index_columns(cur, table, name):
+    cur.execute("SELECT column_name FROM information_schema.statistics WHERE table_schema = DATABASE() "
+                "AND table_name = %s AND index_name = %s ORDER BY seq_in_index", (table, name))
+    return tuple(row[0] for row in cur.fetchall())
+
+
+def pending(cur):
+    """``(description, statements)`` for every step this database still needs."""
+    steps = []
+    for table, ddl in TABLES.items():
+        if not _exists(cur, "SELECT 1 FROM information_schema.tables "
+                            "WHERE table_schema = DATABASE() AND table_name = %s", (table,)):
+            steps.append((f"create table {table}", [ddl]))
+    for table, column, definition, backfill in COLUMNS:
+        if not _exists(cur, "SELECT 1 FROM information_schema.columns WHERE table_schema = DATABASE() "
+                            "AND table_name = %s AND column_name = %s", (table, column)):
+            statements = [f"ALTER TABLE `{table}` ADD COLUMN `{column}` {definition}"]
+            steps.append((f"add column {table}.{column}", statements + ([backfill] if backfill else [])))
+    for unique, indexes in ((False, INDEXES), (True, UNIQUE_INDEXES)):
+        for table, name, columns in indexes:
+            kind = 'UNIQUE KEY' if unique else 'KEY'
+            add = f"ADD {kind} `{name}` ({', '.join(f'`{c}`' for c in columns)})"
+            current = _index_columns(cur, table, name)
+            if not current:
+                steps.append((f"add {kind.lower()} {table}.{name}", [f"ALTER TABLE `{table}` {add}"]))
+            elif current != columns:
+                # Rebuilt in one statement so foreign keys never lose their index
+                steps.append((f"rebuild {kind.lower()} {table}.{name}",
+                              [f"ALTER TABLE `{table}` DROP KEY `{name}`, {add}"]))
+    return steps
+
+
+def backfill_slots(cur):
+    """Give every live appointment its slot; on double bookings the earliest keeps it."""
+    cur.execute("SELECT appointment_id, doctor_id, appointment_time FROM appointment "
+                "WHERE status NOT IN %s ORDER BY appointment_id", (scheduler.RELEASED_STATUSES,))
+    taken, updates = set(), []
+    for appointment_id, doctor_id, appointment_time in cur.fetchall():
+        slot = scheduler.slot_start(appointment_time)
+        if (doctor_id, slot) in taken:
+            print(f"appointment {appointment_id} double-books doctor {doctor_id} at {slot}; left without a slot")
+            continue
+        taken.add((doctor_id, slot))
+        updates.append((slot, appointment_id))
+    cur.executemany("UPDATE appointment SET slot = %s WHERE appointment_id = %s", updates)
+
+
+def duplicate_emails(cur, table):
+    cur.execute(f"SELECT email, COUNT(*) FROM {table} WHERE email IS NOT NULL "
+                f"GROUP BY email HAVING COUNT(*) > 1")
+    return cur.fetchall()
+
+
+def duplicate_slots(cur):
+    cur.execute("SELECT doctor_id, slot, COUNT(*) FROM appointment WHERE slot IS NOT NULL "
+                "GROUP BY doctor_id, slot HAVING COUNT(*) > 1")
+    return cur.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--user', default='root')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--db', default='hospital')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    pool = db.ConnectionPool({'host': args.host, 'user': args.user, 'passwd': args.password,
+                              'db': args.db, 'autocommit': False}, size=1)
+    with pool.connection() as conn:
+        cur = conn.cursor()
+        steps = pending(cur)
+        descriptions = [description for description, _ in steps]
+        for table, name, _ in UNIQUE_INDEXES:
+            if name != 'email' or not any(f"{table}.email" in d for d in descriptions):
+                continue
+            duplicates = duplicate_emails(cur, table)
+            if duplicates:
+                raise SystemExit(f"{table} has duplicate emails, resolve them before migrating: "
+                                 + ", ".join(email for email, _ in duplicates))
+        # A slot column added by this run is backfilled without duplicates; an existing one may have them
+        if any("appointment.doctor_slot" in d for d in descriptions) \
+                and "add column appointment.slot" not in descriptions:
+            duplicates = duplicate_slots(cur)
+            if duplicates:
+                raise SystemExit("appointment has double-booked slots, resolve them before migrating: "
+                                 + ", ".join(f"doctor {doctor_id} at {slot}" for doctor_id, slot, _ in duplicates))
+        for description, statements in steps:
+            print(("pending: " if args.dry_run else "applying: ") + description)
+            if not args.dry_run:
+                for statement in statements:
+                    if callable(statement):
+                        statement(cur)
+                    else:
+                        cur.execute(statement)
+        if not args.dry_run and not _exists(cur, "SELECT 1 FROM cache_versions WHERE name = 'doctor'", ()):
+            cur.execute("INSERT INTO cache_versions (name, version) VALUES ('doctor', 1)")
+        cur.close()
+    if not steps:
+        print("schema is up to date")
+
+
+if __name__ == '__main__':
+    main()
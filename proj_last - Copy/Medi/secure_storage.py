@@ -0,0 +1,591 @@
+"""Encrypt-at-rest, content-addressed storage for uploaded documents.
+
+Uploads are streamed through ``stream_crypto`` on write and stored outside
+``static/`` so Flask never serves them directly. Contents are deduplicated
+by SHA-256: each distinct file is one encrypted blob in a sharded
+``blobs/ab/cd/`` tree with its own data key, shared by every document path
+that references it. Keys are managed per appointment: a blob's data key is
+kept wrapped (AES-GCM) under the key of each appointment using it, and
+appointment keys are wrapped under a master key from ``STORAGE_MASTER_KEY``
+or a local key file. Reads decrypt lazily, one chunk at
+a time, and support random access so byte ranges of large PDFs can be
+served without decrypting the whole file.
+
+Documents are addressed by the paths stored in ``appointment_documents``;
+new uploads get ``uploads/<appointment>/<hash prefix>/<name>`` so equal
+names never collide. Files uploaded before this layer existed are still
+read as plaintext from ``static/`` until ``migrate_uploads.py`` imports them.
+"""
+import hashlib
+import io
+import os
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
+
+import stream_crypto
+from ocr_cache import file_sha256
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORAGE_ROOT = os.environ.get('STORAGE_ROOT', os.path.join(BASE_DIR, 'secure_uploads'))
+STORAGE_DB_PATH = os.environ.get('STORAGE_DB_PATH', os.path.join(BASE_DIR, 'storage.sqlite3'))
+STORAGE_MASTER_KEY_PATH = os.environ.get('STORAGE_MASTER_KEY_PATH', os.path.join(BASE_DIR, 'storage_master.key'))
+LEGACY_ROOT = os.path.join(BASE_DIR, 'static')
+
+RANGE_BLOCK_SIZE = 64 * 1024
+STORAGE_WRITE_WORKERS = int(os.environ.get('STORAGE_WRITE_WORKERS', '4'))
+# Hex digits of the content hash used in upload paths (uploads/<appointment>/<hash>/<name>)
+DOCUMENT_HASH_PREFIX = 16
+# Blobs linked more recently than this are never collected (their rows may not be committed yet)
+STORAGE_COLLECT_GRACE = float(os.environ.get('STORAGE_COLLECT_GRACE', '3600'))
+
+
+class StorageError(Exception):
+    """Base class for storage failures."""
+
+
+class DocumentNotFound(StorageError):
+    """No stored or legacy file exists for the requested path."""
+
+
+def _load_master_key():
+    env_key = os.environ.get('STORAGE_MASTER_KEY')
+    if env_key:
+        return bytes.fromhex(env_key)
+    try:
+        with open(STORAGE_MASTER_KEY_PATH, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    key = stream_crypto.generate_key()
+    try:
+        fd = os.open(STORAGE_MASTER_KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another worker created it first
+        with open(STORAGE_MASTER_KEY_PATH, 'rb') as f:
+            return f.read()
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+
+def upload_path(appointment_id, sha256, filename):
+    """Document path for an upload: ``uploads/<appointment>/<hash prefix>/<filename>``."""
+    return f"uploads/{appointment_id}/{sha256[:DOCUMENT_HASH_PREFIX]}/{filename}"
+
+
+def _safe_join(root, document_path):
+    path = os.path.normpath(os.path.join(root, document_path))
+    if not path.startswith(os.path.abspath(root) + os.sep):
+        raise DocumentNotFound(document_path)
+    return path
+
+
+class EncryptedReader(io.RawIOBase):
+    """Seekable, read-only view of the plaintext inside a stream container.
+
+    Only the chunk under the current position is decrypted (and verified),
+    so reads at arbitrary offsets cost at most one chunk each.
+    """
+
+    def __init__(self, path, key):
+        self._file = open(path, 'rb')
+        try:
+            self._header, self._chunk_size, self._nonce_prefix = stream_crypto.read_header(self._file)
+        except Exception:
+            self._file.close()
+            raise
+        self._key = key
+        self._frame_size = self._chunk_size + stream_crypto.FRAME_OVERHEAD
+
+        body = os.fstat(self._file.fileno()).st_size - stream_crypto.HEADER_SIZE
+        full, rest = divmod(body, self._frame_size)
+        if rest and rest < stream_crypto.FRAME_OVERHEAD:
+            self._file.close()
+            raise stream_crypto.DecryptionError("Encrypted file is truncated")
+        self.size = full * self._chunk_size + (rest - stream_crypto.FRAME_OVERHEAD if rest else 0)
+        self._last_index = full if rest else full - 1
+        self._pos = 0
+        self._cached_index = None
+        self._cached = b''
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence {whence}")
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self._pos = pos
+        return pos
+
+    def _chunk(self, index):
+        if index != self._cached_index:
+            self._file.seek(stream_crypto.HEADER_SIZE + index * self._frame_size)
+            plaintext, final = stream_crypto.decrypt_frame(
+                self._file, self._key, self._header, self._chunk_size, self._nonce_prefix, index)
+            if final != (index == self._last_index):
+                raise stream_crypto.DecryptionError("Encrypted file is truncated")
+            self._cached_index, self._cached = index, plaintext
+        return self._cached
+
+    def readinto(self, buffer):
+        if self._pos >= self.size:
+            return 0
+        index, offset = divmod(self._pos, self._chunk_size)
+        chunk = self._chunk(index)
+        n = min(len(buffer), len(chunk) - offset)
+        buffer[:n] = chunk[offset:offset + n]
+        self._pos += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+
+class _HashingReader:
+    """Wraps a file object, hashing and counting everything read through it."""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, n=-1):
+        data = self._fileobj.read(n)
+        self.sha256.update(data)
+        self.size += len(data)
+        return data
+
+
+class EncryptedStore:
+    """Content-addressed encrypted document store with a SQLite key/metadata index.
+
+    File contents live once per SHA-256 in ``blobs/ab/cd/<sha256>.enc``, each
+    under its own data key. That key is never stored in the clear or under
+    the master key: ``blob_keys`` holds one copy wrapped under the key of
+    each appointment that references the blob, and appointment keys are
+    wrapped under the master key. ``documents`` maps a document path (and
+    its owning appointment) to a blob.
+
+    The store does not count references. Uploads are referenced by their
+    ``appointment_documents`` rows in MySQL and derived images by cached
+    pipeline results; ``collect`` deletes the blobs its caller found
+    unreferenced (see ``collect_blobs.py``).
+    """
+
+    def __init__(self, root=STORAGE_ROOT, db_path=STORAGE_DB_PATH, master_key=None,
+                 legacy_root=LEGACY_ROOT):
+        self.root = os.path.abspath(root)
+        self.db_path = db_path
+        self.legacy_root = os.path.abspath(legacy_root) if legacy_root else None
+        self._master_key = master_key or _load_master_key()
+        self._keys = {}
+        self._blob_keys = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.root, 'blobs', 'tmp'), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS appointment_keys (
+                    appointment_id INTEGER PRIMARY KEY,
+                    wrapped_key BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS blobs (
+                    sha256 TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    linked_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS blob_keys (
+                    sha256 TEXT NOT NULL,
+                    appointment_id INTEGER NOT NULL,
+                    wrapped_key BLOB NOT NULL,
+                    PRIMARY KEY (sha256, appointment_id)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    document_path TEXT PRIMARY KEY,
+                    appointment_id INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS documents_appointment ON documents (appointment_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS documents_sha256 ON documents (sha256)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """``BEGIN IMMEDIATE`` transaction, serialising blob and key updates across processes."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    # ---- keys ----
+
+    def _wrap(self, associated, key, wrapping_key=None):
+        nonce = get_random_bytes(12)
+        cipher = AES.new(wrapping_key or self._master_key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(associated)
+        ciphertext, tag = cipher.encrypt_and_digest(key)
+        return nonce + ciphertext + tag
+
+    def _unwrap(self, associated, wrapped, wrapping_key=None):
+        cipher = AES.new(wrapping_key or self._master_key, AES.MODE_GCM, nonce=wrapped[:12])
+        cipher.update(associated)
+        return cipher.decrypt_and_verify(wrapped[12:-16], wrapped[-16:])
+
+    def _appointment_key(self, conn, appointment_id, create=False):
+        """Unwrapped key of an appointment, read (or created) through ``conn``; ``None`` if it has none."""
+        with self._lock:
+            if appointment_id in self._keys:
+                return self._keys[appointment_id]
+        associated = struct.pack('>q', appointment_id)
+        row = conn.execute("SELECT wrapped_key FROM appointment_keys WHERE appointment_id = ?",
+                           (appointment_id,)).fetchone()
+        if row is None:
+            if not create:
+                return None
+            conn.execute("INSERT OR IGNORE INTO appointment_keys (appointment_id, wrapped_key, created_at) "
+                         "VALUES (?, ?, ?)",
+                         (appointment_id, self._wrap(associated, stream_crypto.generate_key()), time.time()))
+            row = conn.execute("SELECT wrapped_key FROM appointment_keys WHERE appointment_id = ?",
+                               (appointment_id,)).fetchone()
+        try:
+            key = self._unwrap(associated, row['wrapped_key'])
+        except ValueError:
+            raise StorageError(f"Key for appointment {appointment_id} cannot be unwrapped") from None
+        with self._lock:
+            self._keys[appointment_id] = key
+        return key
+
+    def appointment_key(self, appointment_id):
+        """Return the key an appointment's documents are protected by, creating it on first use."""
+        with self._lock:
+            if appointment_id in self._keys:
+                return self._keys[appointment_id]
+        with self._connect() as conn:
+            return self._appointment_key(conn, appointment_id, create=True)
+
+    @staticmethod
+    def _blob_key_associated(sha256, appointment_id):
+        return bytes.fromhex(sha256) + struct.pack('>q', appointment_id)
+
+    def _wrap_blob_key(self, conn, sha256, appointment_id, key):
+        return self._wrap(self._blob_key_associated(sha256, appointment_id), key,
+                          self._appointment_key(conn, appointment_id, create=True))
+
+    def _unwrap_blob_key(self, conn, sha256, appointment_id=None):
+        """A blob's data key through ``appointment_id``'s wrapping, or any appointment's if ``None``."""
+        if appointment_id is None:
+            rows = conn.execute("SELECT appointment_id, wrapped_key FROM blob_keys WHERE sha256 = ?",
+                                (sha256,)).fetchall()
+        else:
+            rows = conn.execute("SELECT appointment_id, wrapped_key FROM blob_keys "
+                                "WHERE sha256 = ? AND appointment_id = ?", (sha256, appointment_id)).fetchall()
+        for row in rows:
+            appointment_key = self._appointment_key(conn, row['appointment_id'])
+            if appointment_key is None:
+                continue
+            try:
+                return self._unwrap(self._blob_key_associated(sha256, row['appointment_id']),
+                                    row['wrapped_key'], appointment_key)
+            except ValueError:
+                raise StorageError(f"Key for blob {sha256} cannot be unwrapped") from None
+        return None
+
+    def _blob_key(self, sha256, appointment_id):
+        """Data key of a blob as seen by one appointment; other appointments' wrappings are not used."""
+        with self._lock:
+            if (sha256, appointment_id) in self._blob_keys:
+                return self._blob_keys[sha256, appointment_id]
+        with self._connect() as conn:
+            key = self._unwrap_blob_key(conn, sha256, appointment_id)
+        if key is None:
+            raise DocumentNotFound(sha256)
+        with self._lock:
+            self._blob_keys[sha256, appointment_id] = key
+        return key
+
+    def _drop_unused_key(self, conn, sha256, appointment_id):
+        """Forget an appointment's wrapping of a blob key once none of its documents use the blob."""
+        if conn.execute("SELECT 1 FROM documents WHERE sha256 = ? AND appointment_id = ?",
+                        (sha256, appointment_id)).fetchone() is None:
+            conn.execute("DELETE FROM blob_keys WHERE sha256 = ? AND appointment_id = ?", (sha256, appointment_id))
+            with self._lock:
+                self._blob_keys.pop((sha256, appointment_id), None)
+
+    # ---- blobs ----
+
+    def _blob_path(self, sha256):
+        return os.path.join(self.root, 'blobs', sha256[:2], sha256[2:4], sha256 + '.enc')
+
+    def has_blob(self, sha256):
+        with self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        return row is not None and os.path.exists(self._blob_path(sha256))
+
+    def _attach(self, appointment_id, document_path, sha256, size, tmp_path=None, key=None):
+        """Point ``document_path`` at blob ``sha256``, adopting ``tmp_path`` if the blob is new."""
+        info = {'document_path': document_path, 'appointment_id': appointment_id,
+                'size': size, 'sha256': sha256, 'created_at': time.time(), 'deduplicated': True}
+        # Created outside the write transaction below, which would otherwise wait on itself
+        self.appointment_key(appointment_id)
+        with self._transaction() as conn:
+            stored = conn.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (sha256,)).fetchone() is not None
+            existing = self._unwrap_blob_key(conn, sha256) if stored else None
+            if existing is None:
+                # New content, or a blob whose last key was dropped before it was collected
+                if tmp_path is None:
+                    raise DocumentNotFound(sha256)
+                path = self._blob_path(sha256)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+                tmp_path = None
+                conn.execute("DELETE FROM blob_keys WHERE sha256 = ?", (sha256,))
+                conn.execute("INSERT OR REPLACE INTO blobs (sha256, size, created_at, linked_at) VALUES (?, ?, ?, ?)",
+                             (sha256, size, info['created_at'], info['created_at']))
+                info['deduplicated'] = False
+            else:
+                key = existing
+                conn.execute("UPDATE blobs SET linked_at = ? WHERE sha256 = ?", (info['created_at'], sha256))
+            conn.execute("INSERT OR IGNORE INTO blob_keys (sha256, appointment_id, wrapped_key) VALUES (?, ?, ?)",
+                         (sha256, appointment_id, self._wrap_blob_key(conn, sha256, appointment_id, key)))
+            old = conn.execute("SELECT appointment_id, sha256 FROM documents WHERE document_path = ?",
+                               (document_path,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (document_path, appointment_id, size, sha256, created_at) "
+                "VALUES (?, ?, ?, ?, ?)", (document_path, appointment_id, size, sha256, info['created_at']))
+            if old is not None:
+                self._drop_unused_key(conn, old['sha256'], old['appointment_id'])
+        # Identical content was already stored: drop the copy just written
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return info
+
+    def collect(self, referenced, grace=STORAGE_COLLECT_GRACE, dry_run=False):
+        """Delete every blob not in ``referenced`` and not linked in the last ``grace`` seconds.
+
+        ``referenced`` must be complete: every content hash the database and
+        the result cache still point at. The grace period covers uploads
+        whose rows are not committed yet. Returns the deleted (or, with
+        ``dry_run``, the deletable) hashes.
+        """
+        referenced = set(referenced)
+        cutoff = time.time() - grace
+        with self._transaction() as conn:
+            doomed = [row['sha256'] for row in conn.execute("SELECT sha256 FROM blobs WHERE linked_at < ?",
+                                                            (cutoff,))
+                      if row['sha256'] not in referenced]
+            if dry_run:
+                return doomed
+            for sha256 in doomed:
+                conn.execute("DELETE FROM documents WHERE sha256 = ?", (sha256,))
+                conn.execute("DELETE FROM blob_keys WHERE sha256 = ?", (sha256,))
+                conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+        with self._lock:
+            for cached in [k for k in self._blob_keys if k[0] in doomed]:
+                del self._blob_keys[cached]
+        for sha256 in doomed:
+            path = self._blob_path(sha256)
+            if os.path.exists(path):
+                os.remove(path)
+        return doomed
+
+    # ---- documents ----
+
+    def _write_blob(self, fileobj):
+        """Stream ``fileobj`` to a temporary blob; returns ``(sha256, size, tmp_path, key)``."""
+        key = stream_crypto.generate_key()
+        tmp_path = os.path.join(self.root, 'blobs', 'tmp', uuid.uuid4().hex)
+        source = _HashingReader(fileobj)
+        try:
+            with open(tmp_path, 'wb') as out:
+                for block in stream_crypto.encrypt_iter(source, key):
+                    out.write(block)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return source.sha256.hexdigest(), source.size, tmp_path, key
+
+    def _ingest(self, appointment_id, fileobj, document_path):
+        sha256, size, tmp_path, key = self._write_blob(fileobj)
+        try:
+            if callable(document_path):
+                document_path = document_path(sha256)
+            return self._attach(appointment_id, document_path, sha256, size, tmp_path, key)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def save(self, appointment_id, document_path, fileobj):
+        """Encrypt ``fileobj`` into the store under ``document_path``; returns its metadata.
+
+        The content is hashed while it streams to a temporary blob, which is
+        discarded if a blob with the same hash already exists.
+        """
+        _safe_join(self.root, document_path)
+        return self._ingest(appointment_id, fileobj, document_path)
+
+    def put(self, appointment_id, filename, fileobj):
+        """Save an upload under a collision-free path derived from its content hash."""
+        return self._ingest(appointment_id, fileobj,
+                           lambda sha256: upload_path(appointment_id, sha256, filename))
+
+    def put_many(self, appointment_id, items, workers=STORAGE_WRITE_WORKERS):
+        """``put`` each ``(filename, fileobj)`` pair concurrently; returns infos in input order.
+
+        Each file is still streamed and hashed chunk by chunk; the thread pool
+        overlaps encryption (which releases the GIL) with disk writes.
+        """
+        items = list(items)
+        if len(items) <= 1 or workers <= 1:
+            return [self.put(appointment_id, name, fileobj) for name, fileobj in items]
+        with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+            futures = [pool.submit(self.put, appointment_id, name, fileobj) for name, fileobj in items]
+            return [future.result() for future in futures]
+
+    def link(self, appointment_id, document_path, sha256):
+        """Point ``document_path`` at an already stored blob without rewriting it."""
+        _safe_join(self.root, document_path)
+        with self._connect() as conn:
+            row = conn.execute("SELECT size FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None:
+            raise DocumentNotFound(sha256)
+        return self._attach(appointment_id, document_path, sha256, row['size'])
+
+    def delete(self, document_path):
+        """Forget ``document_path``; its blob stays until ``collect`` finds it unreferenced."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT appointment_id, sha256 FROM documents WHERE document_path = ?",
+                               (document_path,)).fetchone()
+            if row is None:
+                return False
+            conn.execute("DELETE FROM documents WHERE document_path = ?", (document_path,))
+            self._drop_unused_key(conn, row['sha256'], row['appointment_id'])
+        return True
+
+    def _legacy_path(self, document_path):
+        if self.legacy_root is None:
+            return None
+        path = _safe_join(self.legacy_root, document_path)
+        return path if os.path.isfile(path) else None
+
+    def _stored(self, document_path):
+        """The ``documents`` row and its encrypted file, or ``(None, None)``."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM documents WHERE document_path = ?", (document_path,)).fetchone()
+        if row is None:
+            return None, None
+        path = self._blob_path(row['sha256'])
+        return (row, path) if os.path.exists(path) else (None, None)
+
+    def info(self, document_path):
+        """Metadata (``appointment_id``, ``size``, ``sha256``) for a document, or ``None``."""
+        row, _ = self._stored(document_path)
+        if row is not None:
+            return {key: row[key] for key in ('document_path', 'appointment_id', 'size', 'sha256', 'created_at')}
+        legacy = self._legacy_path(document_path)
+        if legacy is None:
+            return None
+        return {'document_path': document_path, 'appointment_id': None,
+                'size': os.path.getsize(legacy), 'sha256': file_sha256(legacy), 'created_at': None}
+
+    def exists(self, document_path):
+        try:
+            return self._stored(document_path)[0] is not None or self._legacy_path(document_path) is not None
+        except DocumentNotFound:
+            return False
+
+    def open(self, document_path):
+        """Open a document for reading; returns a seekable binary file object."""
+        row, path = self._stored(document_path)
+        if row is not None:
+            key = self._blob_key(row['sha256'], row['appointment_id'])
+            return io.BufferedReader(EncryptedReader(path, key), buffer_size=RANGE_BLOCK_SIZE)
+        legacy = self._legacy_path(document_path)
+        if legacy is None:
+            raise DocumentNotFound(document_path)
+        return open(legacy, 'rb')
+
+    def read_bytes(self, document_path):
+        with self.open(document_path) as f:
+            return f.read()
+
+    def iter_range(self, document_path, start, end, block_size=RANGE_BLOCK_SIZE):
+        """Yield plaintext bytes ``[start, end)``, decrypting only the chunks they touch."""
+        with self.open(document_path) as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                data = f.read(min(block_size, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+
+    def stats(self):
+        with self._connect() as conn:
+            blobs = conn.execute("SELECT COUNT(*) AS n, COALESCE(SUM(size), 0) AS bytes FROM blobs").fetchone()
+            docs = conn.execute("SELECT COUNT(*) AS n, COALESCE(SUM(size), 0) AS bytes "
+                                "FROM documents").fetchone()
+        return {'blobs': blobs['n'], 'blob_bytes': blobs['bytes'],
+                'documents': docs['n'], 'document_bytes': docs['bytes'],
+                'bytes_saved': docs['bytes'] - blobs['bytes']}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide document store, opening it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = EncryptedStore()
+    return _store
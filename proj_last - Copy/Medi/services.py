@@ -0,0 +1,178 @@
+"""Supervisor for the long-lived Streamlit tool services.
+
+Each tool (encrypt12, decrypt12, medicle_main) runs as one background
+Streamlit server on its own port, started without blocking the caller and
+shared by every Flask worker. Service state lives in SQLite; an ``IMMEDIATE``
+transaction acts as a cross-process lock, so concurrent clicks in different
+workers still start each service at most once. Liveness is decided by the
+service's HTTP health endpoint rather than by PIDs, which keeps this
+portable to Windows.
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DB_PATH = os.environ.get('SERVICE_DB_PATH', os.path.join(BASE_DIR, 'services.sqlite3'))
+SERVICE_LOG_DIR = os.environ.get('SERVICE_LOG_DIR', os.path.join(BASE_DIR, 'logs'))
+SERVICE_BASE_PORT = int(os.environ.get('SERVICE_BASE_PORT', '8501'))
+SERVICE_STARTUP_GRACE = float(os.environ.get('SERVICE_STARTUP_GRACE', '60'))
+SERVICE_HEALTH_TIMEOUT = 1.0
+
+
+class ServiceError(Exception):
+    """A service is unknown or could not be started."""
+
+
+def _streamlit(script):
+    def command(port):
+        return [sys.executable, '-m', 'streamlit', 'run', script,
+                '--server.port', str(port), '--server.headless', 'true']
+    return command
+
+
+# name -> (command builder, port offset, health path)
+SERVICES = {
+    'encrypt12': (_streamlit('encrypt12.py'), 0, '/_stcore/health'),
+    'decrypt12': (_streamlit('decrypt12.py'), 1, '/_stcore/health'),
+    'medicle_main': (_streamlit('medicle_main.py'), 2, '/_stcore/health'),
+}
+
+
+class ServiceManager:
+    """Starts each registered service at most once and reports its health."""
+
+    def __init__(self, path=SERVICE_DB_PATH, base_port=SERVICE_BASE_PORT,
+                 startup_grace=SERVICE_STARTUP_GRACE):
+        self.path = path
+        self.base_port = base_port
+        self.startup_grace = startup_grace
+        # Popen handles for services this process started, so they can be reaped
+        self._children = {}
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS services (
+                    name TEXT PRIMARY KEY,
+                    pid INTEGER,
+                    port INTEGER NOT NULL,
+                    started_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _spec(self, name):
+        if name not in SERVICES:
+            raise ServiceError(f"Unknown service {name!r}")
+        command, offset, health_path = SERVICES[name]
+        return command, self.base_port + offset, health_path
+
+    def _healthy(self, port, health_path):
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}{health_path}",
+                                        timeout=SERVICE_HEALTH_TIMEOUT) as response:
+                return response.status == 200
+        except (urllib.error.URLError, OSError):
+            return False
+
+    def _status(self, name, row, healthy):
+        state = 'running' if healthy else 'starting' if row else 'stopped'
+        if row and not healthy and time.time() - row['started_at'] > self.startup_grace:
+            state = 'failed'
+        return {'name': name, 'state': state, 'healthy': healthy,
+                'pid': row['pid'] if row else None,
+                'port': row['port'] if row else self._spec(name)[1],
+                'started_at': row['started_at'] if row else None}
+
+    def _reap(self, name):
+        with self._lock:
+            child = self._children.get(name)
+            if child is not None and child.poll() is not None:
+                del self._children[name]
+                return True
+        return False
+
+    def _launch(self, name, command, port):
+        os.makedirs(SERVICE_LOG_DIR, exist_ok=True)
+        log = open(os.path.join(SERVICE_LOG_DIR, f"{name}.log"), 'ab')
+        kwargs = {}
+        if os.name == 'nt':
+            kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs['start_new_session'] = True
+        try:
+            child = subprocess.Popen(command(port), cwd=BASE_DIR, stdin=subprocess.DEVNULL,
+                                     stdout=log, stderr=subprocess.STDOUT, **kwargs)
+        except OSError as e:
+            raise ServiceError(f"Could not start {name}: {e}") from e
+        finally:
+            log.close()
+        with self._lock:
+            self._children[name] = child
+        return child.pid
+
+    def ensure(self, name):
+        """Start ``name`` unless it is already running or starting; never blocks on it."""
+        command, port, health_path = self._spec(name)
+        if self._healthy(port, health_path):
+            return self.status(name)
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT * FROM services WHERE name = ?", (name,)).fetchone()
+            exited = self._reap(name)
+            starting = (row is not None and not exited
+                        and time.time() - row['started_at'] <= self.startup_grace)
+            if not starting and not self._healthy(port, health_path):
+                pid = self._launch(name, command, port)
+                conn.execute("INSERT OR REPLACE INTO services (name, pid, port, started_at) VALUES (?, ?, ?, ?)",
+                             (name, pid, port, time.time()))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return self.status(name)
+
+    def status(self, name):
+        _, port, health_path = self._spec(name)
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM services WHERE name = ?", (name,)).fetchone()
+        return self._status(name, row, self._healthy(port, health_path))
+
+    def health(self):
+        return {name: self.status(name) for name in SERVICES}
+
+    def stop(self, name):
+        """Terminate a service this process started and forget its state."""
+        with self._lock:
+            child = self._children.pop(name, None)
+        if child is not None and child.poll() is None:
+            child.terminate()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM services WHERE name = ?", (name,))
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    """Return the process-wide service manager, creating it on first use."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = ServiceManager()
+    return _manager
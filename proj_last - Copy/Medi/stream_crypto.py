@@ -0,0 +1,144 @@
+"""Chunked, authenticated streaming encryption for large medical files.
+
+Data is split into fixed-size chunks, each sealed with AES-GCM under its own
+nonce, so memory use is one chunk regardless of file size and any chunk can
+be decrypted on its own. Container layout::
+
+    header:  b"MFSE" | version (1) | chunk_size (4) | nonce_prefix (8)
+    frame*:  flags (1) | length (4) | ciphertext (length) | tag (16)
+
+Every frame but the last holds exactly ``chunk_size`` bytes. The chunk
+nonce is ``nonce_prefix || index`` and the associated data binds the header,
+the chunk index and the final-chunk flag, so frames cannot be reordered,
+spliced between files or truncated without failing verification.
+"""
+import os
+import struct
+
+from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
+
+MAGIC = b"MFSE"
+VERSION = 1
+DEFAULT_CHUNK_SIZE = int(os.environ.get('CRYPTO_CHUNK_SIZE', str(1024 * 1024)))
+KEY_SIZE = 32
+
+_HEADER = struct.Struct('>4sBI8s')
+_FRAME = struct.Struct('>BI')
+_AAD = struct.Struct('>IB')
+TAG_SIZE = 16
+HEADER_SIZE = _HEADER.size
+FRAME_OVERHEAD = _FRAME.size + TAG_SIZE
+FLAG_FINAL = 0x01
+
+
+class DecryptionError(ValueError):
+    """The container is malformed, truncated, or fails authentication."""
+
+
+def generate_key():
+    """Return a fresh random AES-256 key."""
+    return get_random_bytes(KEY_SIZE)
+
+
+def _read_exactly(fileobj, size):
+    data = fileobj.read(size)
+    while len(data) < size:
+        more = fileobj.read(size - len(data))
+        if not more:
+            break
+        data += more
+    return data
+
+
+def _cipher(key, nonce_prefix, header, index, final):
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce_prefix + struct.pack('>I', index), mac_len=TAG_SIZE)
+    cipher.update(header + _AAD.pack(index, final))
+    return cipher
+
+
+def is_container(prefix):
+    """True if ``prefix`` (the first bytes of a file) starts a stream container."""
+    return prefix[:len(MAGIC)] == MAGIC
+
+
+def encrypt_iter(fileobj, key, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the encrypted container for the plaintext read from ``fileobj``."""
+    nonce_prefix = get_random_bytes(8)
+    header = _HEADER.pack(MAGIC, VERSION, chunk_size, nonce_prefix)
+    yield header
+
+    index = 0
+    chunk = _read_exactly(fileobj, chunk_size)
+    while True:
+        # Read one chunk ahead so the last frame can be flagged as final
+        following = _read_exactly(fileobj, chunk_size) if len(chunk) == chunk_size else b''
+        final = FLAG_FINAL if not following else 0
+        ciphertext, tag = _cipher(key, nonce_prefix, header, index, final).encrypt_and_digest(chunk)
+        yield _FRAME.pack(final, len(ciphertext)) + ciphertext + tag
+        if final:
+            return
+        chunk = following
+        index += 1
+
+
+def read_header(fileobj):
+    """Parse the container header; returns ``(header_bytes, chunk_size, nonce_prefix)``."""
+    header = _read_exactly(fileobj, HEADER_SIZE)
+    if len(header) < HEADER_SIZE or not is_container(header):
+        raise DecryptionError("Not an encrypted stream container")
+    _, version, chunk_size, nonce_prefix = _HEADER.unpack(header)
+    if version != VERSION:
+        raise DecryptionError(f"Unsupported container version {version}")
+    return header, chunk_size, nonce_prefix
+
+
+def decrypt_frame(fileobj, key, header, chunk_size, nonce_prefix, index):
+    """Read and verify the next frame; returns ``(plaintext, is_final)``."""
+    frame = _read_exactly(fileobj, _FRAME.size)
+    if len(frame) < _FRAME.size:
+        raise DecryptionError("Encrypted stream is truncated")
+    final, length = _FRAME.unpack(frame)
+    if length > chunk_size or (not final and length != chunk_size):
+        raise DecryptionError(f"Invalid frame length at chunk {index}")
+    body = _read_exactly(fileobj, length + TAG_SIZE)
+    if len(body) < length + TAG_SIZE:
+        raise DecryptionError("Encrypted stream is truncated")
+    try:
+        plaintext = _cipher(key, nonce_prefix, header, index, final).decrypt_and_verify(
+            body[:length], body[length:])
+    except ValueError:
+        raise DecryptionError(f"Authentication failed at chunk {index}") from None
+    return plaintext, bool(final)
+
+
+def decrypt_iter(fileobj, key):
+    """Yield verified plaintext chunks from an encrypted container."""
+    header, chunk_size, nonce_prefix = read_header(fileobj)
+    index = 0
+    while True:
+        plaintext, final = decrypt_frame(fileobj, key, header, chunk_size, nonce_prefix, index)
+        yield plaintext
+        if final:
+            if fileobj.read(1):
+                raise DecryptionError("Unexpected data after the final chunk")
+            return
+        index += 1
+
+
+def encrypted_size(plaintext_size, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Size in bytes of the container for ``plaintext_size`` bytes of input."""
+    frames = max(1, -(-plaintext_size // chunk_size))
+    return HEADER_SIZE + plaintext_size + frames * FRAME_OVERHEAD
+
+
+def encrypt_file(src_path, dst_path, key, chunk_size=DEFAULT_CHUNK_SIZE):
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        for block in encrypt_iter(src, key, chunk_size):
+            dst.write(block)
+
+
+def decrypt_file(src_path, dst_path, key):
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        for block in decrypt_iter(src, key):
+            dst.write(block)
@@ -0,0 +1,226 @@
+"""Batched BART summarization engine.
+
+Text is split on sentence boundaries into chunks measured in model tokens
+(not characters), and chunks are packed into length-sorted batches so each
+forward pass does useful work on CPU. Very long records are reduced
+hierarchically: if the joined chunk summaries are still longer than one
+chunk, they are summarized again. A per-document chunk budget caps the
+total compute spent on any single record.
+"""
+import os
+import re
+import threading
+import time
+
+SUMMARIZER_MODEL = os.environ.get('SUMMARIZER_MODEL', 'facebook/bart-large-cnn')
+SUMMARY_CHUNK_TOKENS = int(os.environ.get('SUMMARY_CHUNK_TOKENS', '512'))
+SUMMARY_BATCH_SIZE = int(os.environ.get('SUMMARY_BATCH_SIZE', '4'))
+SUMMARY_BATCH_TOKENS = int(os.environ.get('SUMMARY_BATCH_TOKENS', '2048'))
+SUMMARY_MAX_CHUNKS = int(os.environ.get('SUMMARY_MAX_CHUNKS', '24'))
+SUMMARY_MAX_LEVELS = int(os.environ.get('SUMMARY_MAX_LEVELS', '3'))
+SUMMARY_HIERARCHICAL = os.environ.get('SUMMARY_HIERARCHICAL', '1') == '1'
+SUMMARY_MAX_LENGTH = 60
+SUMMARY_MIN_LENGTH = 30
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?;:])\s+')
+
+
+class BatchSummarizer:
+    """Token-aware, batched wrapper around a transformers summarization pipeline."""
+
+    def __init__(self, model=SUMMARIZER_MODEL, chunk_tokens=SUMMARY_CHUNK_TOKENS,
+                 batch_size=SUMMARY_BATCH_SIZE, batch_tokens=SUMMARY_BATCH_TOKENS,
+                 max_chunks=SUMMARY_MAX_CHUNKS, max_levels=SUMMARY_MAX_LEVELS,
+                 hierarchical=SUMMARY_HIERARCHICAL):
+        self.model = model
+        self.chunk_tokens = max(16, chunk_tokens)
+        self.batch_size = max(1, batch_size)
+        self.batch_tokens = max(self.chunk_tokens, batch_tokens)
+        self.max_chunks = max(1, max_chunks)
+        self.max_levels = max(1, max_levels)
+        self.hierarchical = hierarchical
+
+        self._pipe = None
+        self._load_lock = threading.Lock()
+        # The pipeline is not safe to call from several threads at once
+        self._run_lock = threading.Lock()
+
+        # Metrics
+        self._metrics_lock = threading.Lock()
+        self._documents = 0
+        self._truncated = 0
+        self._batch_count = 0
+        self._chunks = 0
+        self._tokens = 0
+        self._seconds = 0.0
+
+    def load(self):
+        """Load the model now instead of on the first ``summarize`` call."""
+        if self._pipe is None:
+            with self._load_lock:
+                if self._pipe is None:
+                    from transformers import pipeline
+                    self._pipe = pipeline("summarization", model=self.model)
+        return self._pipe
+
+    def chunk(self, text):
+        """Split ``text`` into ``(chunk, n_tokens)`` pairs of at most ``chunk_tokens`` tokens."""
+        tokenizer = self.load().tokenizer
+        chunks = []
+        current, current_len = [], 0
+
+        def flush():
+            nonlocal current, current_len
+            if current:
+                chunks.append((" ".join(current), current_len))
+            current, current_len = [], 0
+
+        for sentence in _SENTENCE_RE.split(text):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            ids = tokenizer.encode(sentence, add_special_tokens=False)
+            if len(ids) > self.chunk_tokens:
+                # A single run-on "sentence" (common in OCR output): hard-split by tokens
+                flush()
+                for start in range(0, len(ids), self.chunk_tokens):
+                    piece = ids[start:start + self.chunk_tokens]
+                    chunks.append((tokenizer.decode(piece).strip(), len(piece)))
+                continue
+            if current_len + len(ids) > self.chunk_tokens:
+                flush()
+            current.append(sentence)
+            current_len += len(ids)
+        flush()
+        return chunks
+
+    def _batches(self, chunks):
+        """Yield lists of chunk indices, grouping similar lengths to limit padding."""
+        order = sorted(range(len(chunks)), key=lambda i: chunks[i][1], reverse=True)
+        batch = []
+        for i in order:
+            # Rows are padded to the longest (first) chunk in a length-sorted batch
+            longest = chunks[batch[0]][1] if batch else chunks[i][1]
+            if batch and (len(batch) >= self.batch_size or longest * (len(batch) + 1) > self.batch_tokens):
+                yield batch
+                batch = []
+            batch.append(i)
+        if batch:
+            yield batch
+
+    def _summarize_chunks(self, chunks):
+        pipe = self.load()
+        summaries = [None] * len(chunks)
+        for batch in self._batches(chunks):
+            texts = [chunks[i][0] for i in batch]
+            start = time.monotonic()
+            with self._run_lock:
+                results = pipe(texts, batch_size=len(texts), truncation=True,
+                               max_length=SUMMARY_MAX_LENGTH, min_length=SUMMARY_MIN_LENGTH,
+                               do_sample=False)
+            elapsed = time.monotonic() - start
+            for i, result in zip(batch, results):
+                summaries[i] = result['summary_text']
+            with self._metrics_lock:
+                self._batch_count += 1
+                self._chunks += len(batch)
+                self._tokens += sum(chunks[i][1] for i in batch)
+                self._seconds += elapsed
+        return summaries
+
+    def summarize(self, text):
+        """Summarize ``text``; returns a dict with the summary and per-document stats.
+
+        At most ``max_chunks`` chunks are run through the model per document,
+        across all levels, so the worst-case cost is fixed regardless of length.
+        """
+        return self.summarize_many([text])[0]
+
+    def summarize_many(self, texts):
+        """Summarize several documents, sharing batches between them level by level."""
+        start = time.monotonic()
+        docs = [{'chunks': self.chunk(text), 'budget': self.max_chunks, 'summary': '',
+                 'stats': {'chunks': 0, 'tokens': 0, 'levels': 0, 'truncated': False}}
+                for text in texts]
+        active = list(docs)
+
+        while active:
+            pending = []
+            for doc in active:
+                stats = doc['stats']
+                # Keep a quarter of the budget back on the first pass for reduce steps
+                budget = doc['budget']
+                limit = budget - budget // 4 if self.hierarchical and not stats['levels'] else budget
+                if len(doc['chunks']) > limit:
+                    doc['chunks'] = doc['chunks'][:limit]
+                    stats['truncated'] = True
+                pending.extend(doc['chunks'])
+            summaries = self._summarize_chunks(pending)
+
+            still_active = []
+            offset = 0
+            for doc in active:
+                chunks, stats = doc['chunks'], doc['stats']
+                doc_summaries = summaries[offset:offset + len(chunks)]
+                offset += len(chunks)
+                doc['budget'] -= len(chunks)
+                stats['chunks'] += len(chunks)
+                stats['tokens'] += sum(n for _, n in chunks)
+                stats['levels'] += 1
+                doc['summary'] = " ".join(doc_summaries)
+
+                if (len(doc_summaries) <= 1 or not self.hierarchical or doc['budget'] <= 0
+                        or stats['levels'] >= self.max_levels):
+                    continue
+                # Reduce step: only needed while the joined summaries exceed one chunk
+                doc['chunks'] = self.chunk(doc['summary'])
+                if len(doc['chunks']) > 1:
+                    still_active.append(doc)
+            active = still_active
+
+        elapsed = time.monotonic() - start
+        with self._metrics_lock:
+            self._documents += len(docs)
+            self._truncated += sum(doc['stats']['truncated'] for doc in docs)
+        return [dict(doc['stats'], seconds=elapsed, summary=doc['summary']) for doc in docs]
+
+    def metrics(self):
+        with self._metrics_lock:
+            return {
+                'model': self.model,
+                'loaded': self._pipe is not None,
+                'batch_size': self.batch_size,
+                'chunk_tokens': self.chunk_tokens,
+                'documents': self._documents,
+                'truncated_documents': self._truncated,
+                'batches': self._batch_count,
+                'chunks': self._chunks,
+                'tokens': self._tokens,
+                'chunks_per_sec': self._chunks / self._seconds if self._seconds else 0.0,
+                'tokens_per_sec': self._tokens / self._seconds if self._seconds else 0.0,
+            }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the process-wide summarizer, creating it on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = BatchSummarizer()
+    return _engine
+
+
+def engine_version():
+    """Identify the model and chunking settings so cached summaries are dropped when they change."""
+    mode = 'tree' if SUMMARY_HIERARCHICAL else 'flat'
+    return f"{SUMMARIZER_MODEL}-{SUMMARY_CHUNK_TOKENS}t-{SUMMARY_MAX_CHUNKS}c-{mode}{SUMMARY_MAX_LEVELS}"
+
+
+def summarize(text):
+    """Convenience wrapper around ``get_engine().summarize``."""
+    return get_engine().summarize(text)
@@ -0,0 +1,139 @@
+"""Medical term matching in a single pass over the text.
+
+The whole vocabulary (tens of thousands of terms and synonyms) is folded
+into one trie and compiled into a single regular expression, so a scan
+costs one pass in the C regex engine however many terms there are.
+Matches are whole words, case-insensitive, tolerate any run of whitespace
+(including OCR line breaks) between words, and never overlap: the
+leftmost match wins, and at a given start the longest term wins
+("heart failure" over "heart"). Matchers are cached per vocabulary file
+and rebuilt only when the file changes.
+
+Vocabulary files are UTF-8, one concept per line, ``#`` for comments::
+
+    # code <TAB> preferred term <TAB> synonyms separated by |
+    J45	asthma	bronchial asthma|asthmatic
+    I10	hypertension	high blood pressure|HTN
+
+A line with no tab is a single term with no code.
+"""
+import os
+import re
+import threading
+import time
+
+MEDICAL_TERMS_PATH = os.environ.get(
+    'MEDICAL_TERMS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'medical_terms.tsv'))
+
+# Used when no vocabulary file is present
+DEFAULT_TERMS = ["asthma", "seizures", "headaches", "migraine", "diabetes", "hypertension",
+                 "cholesterol", "cancer", "arthritis", "covid", "tuberculosis", "anemia"]
+
+HIGHLIGHT_TEMPLATE = "<span style='color:red'><b>{}</b></span>"
+
+_END = ''
+
+
+def normalize_term(term):
+    return ' '.join(term.casefold().split())
+
+
+def load_vocabulary(path):
+    """``[(term, preferred, code)]`` for every term and synonym in a vocabulary file."""
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            fields = line.split('\t')
+            if len(fields) == 1:
+                entries.append((fields[0].strip(), fields[0].strip(), None))
+                continue
+            code, preferred = fields[0].strip() or None, fields[1].strip()
+            synonyms = fields[2].split('|') if len(fields) > 2 else []
+            for term in [preferred] + synonyms:
+                if term.strip():
+                    entries.append((term.strip(), preferred, code))
+    return entries
+
+
+def _trie_pattern(node):
+    """Regex for a trie node; optional tails are greedy, so longer terms are tried first."""
+    children = sorted(char for char in node if char != _END)
+    if not children:
+        return ''
+    # Branches start with different characters, so at most one can match and order is free
+    leaves = [char for char in children if char != ' ' and list(node[char]) == [_END]]
+    if len(leaves) > 1:
+        alternatives = ['[' + ''.join(re.escape(char) for char in leaves) + ']']
+        children = [char for char in children if char not in leaves]
+    else:
+        alternatives = []
+    for char in children:
+        atom = r'\s+' if char == ' ' else re.escape(char)
+        alternatives.append(atom + _trie_pattern(node[char]))
+    if _END not in node:
+        return alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+    return '(?:' + '|'.join(alternatives) + ')?'
+
+
+class TermMatcher:
+    """A compiled vocabulary: ``extract`` finds terms with offsets, ``highlight`` marks them up."""
+
+    def __init__(self, entries):
+        start = time.perf_counter()
+        self.terms = {}
+        trie = {}
+        for term, preferred, code in entries:
+            key = normalize_term(term)
+            if not key or key in self.terms:
+                continue
+            self.terms[key] = (preferred, code)
+            node = trie
+            for char in key:
+                node = node.setdefault(char, {})
+            node[_END] = True
+        body = _trie_pattern(trie) if trie else r'(?!)'
+        # Lookarounds rather than \b so terms may start or end with punctuation
+        self.pattern = re.compile(r'(?<!\w)(?:' + body + r')(?!\w)', re.IGNORECASE)
+        self.build_ms = 1000 * (time.perf_counter() - start)
+
+    def finditer(self, text):
+        return self.pattern.finditer(text)
+
+    def extract(self, text):
+        """Matched terms in order: ``{'start', 'end', 'text', 'term', 'code'}`` per match."""
+        matches = []
+        for match in self.finditer(text):
+            preferred, code = self.terms.get(normalize_term(match.group()), (match.group(), None))
+            matches.append({'start': match.start(), 'end': match.end(), 'text': match.group(),
+                            'term': preferred, 'code': code})
+        return matches
+
+    def highlight(self, text, template=HIGHLIGHT_TEMPLATE):
+        """``text`` with every match wrapped in ``template``."""
+        return self.pattern.sub(lambda match: template.format(match.group()), text)
+
+    def stats(self):
+        return {'terms': len(self.terms), 'build_ms': round(self.build_ms, 1)}
+
+
+_matchers = {}
+_matchers_lock = threading.Lock()
+
+
+def get_matcher(path=MEDICAL_TERMS_PATH):
+    """Return the matcher for a vocabulary file, rebuilding it only when the file changes."""
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        stamp = None
+    with _matchers_lock:
+        cached = _matchers.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        entries = load_vocabulary(path) if stamp is not None else [(t, t, None) for t in DEFAULT_TERMS]
+        matcher = TermMatcher(entries)
+        _matchers[path] = (stamp, matcher)
+        return matcher
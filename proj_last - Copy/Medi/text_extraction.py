@@ -0,0 +1,132 @@
+"""Text-layer-first text extraction for PDFs.
+
+Most lab reports are generated by software and already carry a text layer,
+which PyMuPDF reads in milliseconds. Each page is classified before any
+rendering:
+
+* ``text`` -- the text layer is usable and no sizeable image lacks text, so
+  no OCR is run at all;
+* ``scanned`` -- no usable text layer (or only mojibake), so the whole page
+  is rendered and OCR'd as before;
+* ``mixed`` -- usable text plus embedded images (scanned attachments,
+  photographed results) with no text of their own; only those image
+  rectangles are rendered and OCR'd.
+
+Lines come back in EasyOCR's ``(bbox, text, confidence)`` shape, with
+boxes in pixels of the page rendered at ``dpi``, so callers can treat both
+sources alike. Text-layer lines have confidence 1.0.
+"""
+import os
+from collections import namedtuple
+
+import pdf_pipeline
+
+PDF_TEXT_MIN_CHARS = int(os.environ.get('PDF_TEXT_MIN_CHARS', '40'))
+# Images smaller than this fraction of the page (logos, signatures) are not OCR'd
+PDF_IMAGE_MIN_AREA = float(os.environ.get('PDF_IMAGE_MIN_AREA', '0.05'))
+# A text layer with more than this share of U+FFFD characters is treated as missing
+PDF_GARBLED_RATIO = 0.1
+PDF_THUMBNAIL_SIZE = int(os.environ.get('THUMBNAIL_SIZE', '256'))
+
+TEXT = 'text'
+SCANNED = 'scanned'
+MIXED = 'mixed'
+
+PageText = namedtuple('PageText', 'number kind lines ocr_regions')
+
+
+def _open(source):
+    import fitz  # PyMuPDF
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=bytes(source), filetype="pdf")
+    return fitz.open(source)
+
+
+def _quad(rect, zoom):
+    x0, y0, x1, y1 = (round(v * zoom) for v in rect)
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+def _contains(outer, inner):
+    x0, y0, x1, y1 = inner
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    return outer[0] <= cx <= outer[2] and outer[1] <= cy <= outer[3]
+
+
+def text_lines(page):
+    """``(rect, text)`` for every non-blank line of a page's text layer, rect in PDF points."""
+    lines = []
+    for block in page.get_text('dict')['blocks']:
+        if block['type'] != 0:
+            continue
+        for line in block['lines']:
+            text = ''.join(span['text'] for span in line['spans']).strip()
+            if text:
+                lines.append((tuple(line['bbox']), text))
+    return lines
+
+
+def classify_page(page):
+    """``(kind, text_lines, ocr_clips)`` for a page; a ``None`` clip means the whole page."""
+    lines = text_lines(page)
+    chars = sum(len(text) for _, text in lines)
+    garbled = sum(text.count('\ufffd') for _, text in lines)
+    if chars < PDF_TEXT_MIN_CHARS or garbled > PDF_GARBLED_RATIO * chars:
+        return SCANNED, [], [None]
+
+    bounds = page.rect
+    min_area = PDF_IMAGE_MIN_AREA * bounds.width * bounds.height
+    clips = []
+    for info in page.get_image_info():
+        x0, y0, x1, y1 = info['bbox']
+        clip = (max(x0, bounds.x0), max(y0, bounds.y0), min(x1, bounds.x1), min(y1, bounds.y1))
+        if (clip[2] - clip[0]) * (clip[3] - clip[1]) < min_area or clip in clips:
+            continue
+        # Images already covered by the text layer (e.g. searchable scans) need no OCR
+        covered = sum(len(text) for rect, text in lines if _contains(clip, rect))
+        if covered < PDF_TEXT_MIN_CHARS:
+            clips.append(clip)
+    return (MIXED if clips else TEXT), lines, clips
+
+
+def extract_pages(source, dpi=pdf_pipeline.PDF_RENDER_DPI, **ocr_kwargs):
+    """Yield a ``PageText`` per page, in order, OCR-ing only scanned pages and image regions.
+
+    ``source`` is a file path or the PDF bytes. ``ocr_kwargs`` go to
+    ``pdf_pipeline.ocr_pdf_regions``, whose worker pool is never started
+    for PDFs that are all text.
+    """
+    zoom = dpi / 72
+    with _open(source) as pdf:
+        plan = [classify_page(page) for page in pdf]
+
+    regions = [(number, clip) for number, (_, _, clips) in enumerate(plan) for clip in clips]
+    results = pdf_pipeline.ocr_pdf_regions(source, regions, detail=1, dpi=dpi, **ocr_kwargs)
+    try:
+        for number, (kind, lines, clips) in enumerate(plan):
+            page_lines = [(_quad(rect, zoom), text, 1.0) for rect, text in lines]
+            for clip in clips:
+                _, result, _ = next(results)
+                dx, dy = (round(clip[0] * zoom), round(clip[1] * zoom)) if clip else (0, 0)
+                page_lines.extend(([[x + dx, y + dy] for x, y in bbox], text, prob) for bbox, text, prob in result)
+            # Reading order: top to bottom, then left to right
+            page_lines.sort(key=lambda line: (line[0][0][1], line[0][0][0]))
+            yield PageText(number, kind, page_lines, len(clips))
+    finally:
+        results.close()
+
+
+def extract_text(source, separator="\n", **kwargs):
+    """Text of every page, one page per ``separator``."""
+    return separator.join(" ".join(text for _, text, _ in page.lines) for page in extract_pages(source, **kwargs))
+
+
+def render_png(source, page_number=0, dpi=pdf_pipeline.PDF_RENDER_DPI, max_side=None):
+    """PNG bytes of one page, scaled down to ``max_side`` pixels if given."""
+    import fitz
+    with _open(source) as pdf:
+        page = pdf.load_page(page_number)
+        zoom = dpi / 72
+        if max_side:
+            zoom = min(zoom, max_side / max(page.rect.width, page.rect.height))
+        return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False).tobytes('png')